@@ -54,6 +54,7 @@ try:
     from parsing import *
     from gui.gameboard import Gameboard
     from interfaces.game import SnakeGame
+    from interfaces.runner import run_games, default_settings
 except YAMLError as err:
     logging.critical("Failed to read yaml file.")
     logging.exception(err)
@@ -92,6 +93,22 @@ def computer_game(*args,**kwargs):
     debug("Finished starting")
     return 
 
+def self_play_games(games=64, processes=None, seed=0):
+    """
+    Play many headless games of Snake for a computer, using every core.
+    """
+    data = dict(default_settings(), **{
+        "height": 160,
+        "width": 160,
+        "size": 10,
+        "auto_tick": False,
+        "testing": False,
+    })
+    # keep the settings self-play records quickly with
+    results = run_games(games=games, processes=processes, seed=seed, settings=data)
+    info(f"Played {len(results)} games, best score {max([r['score'] for r in results], default=None)}")
+    return results
+
 def human_game(*args,**kwargs):
     """
     Start a game of Snake for a human to play.
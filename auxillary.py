@@ -24,6 +24,8 @@ import time
 import traceback
 from yaml import safe_load as yaml_safe_load
 from yaml import YAMLError
+from interfaces.scribe import SQLITE_PROFILES, SQLITE_SETTINGS, sqlite_profile
+# the same named sets of PRAGMAs as the games' own SQLiteInterface
 
 aux_log = logging.log
 aux_crit = logging.critical
@@ -818,8 +820,10 @@ class SQLiteInterface(object):
     """docstring for SQLiteInterface"""
     # schema = "./SCHEMA_email_data.sql"
     # fixtures = "./FIXTURES_email_data.sql"
-    def __init__(self, database, schema=None, fixtures=None, row_factory=None):
+    def __init__(self, database, schema=None, fixtures=None, row_factory=None, profile="default"):
         super(SQLiteInterface, self).__init__()
+        self.profile = sqlite_profile(profile)
+        # the PRAGMAs applied to every connection, see SQLITE_PROFILES
         # self._row_factory = getattr(row_factories,"default")
         self._row_factory = row_factories("dict")
         try:
@@ -991,9 +995,20 @@ class SQLiteInterface(object):
     def create_lock(self):
         self.lock = threading.RLock()
 
+    def connect(self, **kwargs):
+        """
+        Open a new connection to the database, with the settings of the profile;
+        kwargs are passed on to sqlite3.connect.
+        """
+        settings = dict(self.profile)
+        connection = sqlite3.connect(self.database, cached_statements=settings.pop("cached_statements", 128), **kwargs)
+        for pragma, value in settings.items():
+            connection.execute(f"PRAGMA {pragma}={value}")
+        return connection
+
     def acquire(self):
         self.lock.acquire()
-        self._connection = sqlite3.connect(self.database)
+        self._connection = self.connect()
         # get and store the sqlite3 connection in the hidden attribute
 
     def release(self):
@@ -13,6 +13,7 @@ import json
 # import imageio
 import tempfile
 from interfaces.game import SnakeGame
+from objects.rects import render_all
 
 try:
     if "logr" not in globals():
@@ -120,6 +121,9 @@ class Gameboard(object):
             # set value for the attribute
         self.app_surface = None
         self.game = game
+        self._wall_rects = []
+        self._fruit_rects = []
+        # Rects reused by every frame, instead of creating new ones
         # self._init_gui()
         for name,font in self.fonts.items():
             self.fonts[name]["size"] = min(32, max(10,round(self.width/640*font.get("size"))))
@@ -435,11 +439,12 @@ class Gameboard(object):
             self.game.update()
             debug("UPDATED GAME")
             self.app_surface.fill(self.background)
-            for wall in self.game.obstacles:
-                pg.draw.rect(self.app_surface, self.obstacle_color, wall.render())
+            for rect in render_all(self.game.obstacles, self._wall_rects):
+                pg.draw.rect(self.app_surface, self.obstacle_color, rect)
             if self.game.snake.is_alive:
-                for fruit in self.game.rewards:
-                    pg.draw.rect(self.app_surface, fruit.color, fruit.render())
+                render_all(self.game.rewards, self._fruit_rects)
+                for fruit,rect in zip(self.game.rewards, self._fruit_rects):
+                    pg.draw.rect(self.app_surface, fruit.color, rect)
             self.game.snake.draw(self.app_surface,None)
             # debug(f"rewards = {self.game.rewards}")
             # debug(f"snake = {self.game.snake.segments}")
@@ -90,6 +90,8 @@ class TestGuiObjectKeySequencing(unittest.TestCase):
         self.game = SnakeGame(**data)
         self.game.snake = None
         self.game.snake = ourboros
+        self.game._init_grid()
+        # the grid has to be told about the new snake
         self.board = Gameboard(self.game)
         debug("TestGuiObjectKeySequencing.setUp complete")
     def quitGame(self):
@@ -4,12 +4,16 @@ from keras.optimizers import Adam
 from keras.models import Sequential
 from keras.layers.core import Dense, Dropout
 import random
+import time
 import numpy as np
 import pandas as pd
 from operator import add
 import copy
+from interfaces.memory import ReplayMemory, PrioritizedReplayMemory, td_targets
+from interfaces.network import DenseNetwork
 
 NUMBER_OF_INPUTS = 11
+# the length of SnakeGame.features()
 class DQN(object):
     """docstring for DQN"""
     __defaults = {
@@ -65,8 +69,23 @@ class DQN(object):
             "value":  np.array([]),
         },
         "memory":{
-            "type":  list,
-            "value":  [],
+            # ReplayMemory, made from memory_size if not given
+            "type":  ReplayMemory,
+            "value":  None,
+        },
+        "memory_size":{
+            "type":  int,
+            "value":  100000,
+        },
+        "prioritized":{
+            # whether transitions are picked by TD error, see PrioritizedReplayMemory
+            "type":  bool,
+            "value":  False,
+        },
+        "batch_size":{
+            # how many transitions are trained on at a time
+            "type":  int,
+            "value":  1000,
         },
         ###############
 
@@ -85,7 +104,7 @@ class DQN(object):
         # remove any unapproved keywords
         for k,v in self.__defaults.items():
             # for each approved keyword argument
-            setattr(self, k, kwargs.get(k,v))
+            setattr(self, k, kwargs.get(k,v["value"]))
             # set the attribute to the value that was given,
             # else use the default value
         # self.reward = 0
@@ -105,8 +124,9 @@ class DQN(object):
         self.reward = 0
         self.dataframe = pd.DataFrame()
         self.short_memory = np.array([])
-        self.memory = []
-        self._memory_limit = 1000
+        if self.memory is None:
+            memory = PrioritizedReplayMemory if self.prioritized else ReplayMemory
+            self.memory = memory(capacity=self.memory_size, features=NUMBER_OF_INPUTS)
         
     def __del__(self):
         if self.weights and self.model:
@@ -136,13 +156,33 @@ class DQN(object):
         Read and use the current weighted values in the file at 
         self.weights_file
         """
-        return self.model.load_weights(self.weights)
+        result = self.model.load_weights(self.weights)
+        self.refresh_policy()
+        return result
 
     def init_model(self):
         """
         Create a model property.
         """
         self._model = self.construct_network()
+        self.refresh_policy()
+
+    def refresh_policy(self):
+        """
+        Copy the model's current weights into the NumPy network used to pick
+        moves; called after every training step.
+        """
+        self._policy = DenseNetwork.from_keras(self.model)
+
+    @property
+    def policy(self):
+        """
+        The 'policy' property, a DenseNetwork with the model's weights as of
+        its last training step.
+        """
+        if not hasattr(self,"_policy"):
+            self.refresh_policy()
+        return self._policy
 
     @property
     def model(self):
@@ -213,7 +253,7 @@ class DQN(object):
 
 
 
-    def get_state(self, game, player, food):
+    def get_state(self, game, player=None, food=None):
         # game.game_state = [
         #     [
         #         self.playing,
@@ -256,27 +296,42 @@ class DQN(object):
         #         # how long overall the snake is
         #     ],
         # ]
-        return game.game_state
+        # return game.game_state
+        return game.features()
+        # the 11 values the network is given; the game reuses this array,
+        # so copy it before the game changes if it needs to be kept
     def choose_action(self, state):
         """
         Given the current state of the game, 
         predict the best action to take.
         """
-        prediction = self.model.predict(state.reshape((1, NUMBER_OF_INPUTS)))
-        return to_categorical(np.argmax(prediction[0]), num_classes=len(self.cmd_options))
+        prediction = self.policy(state)
+        # a NumPy forward pass, rather than a Keras predict call per move
+        return np.eye(self.policy.outputs, dtype=np.float32)[np.argmax(prediction)]
+        # one-hot over the network's outputs (straight, right, left)
+
+    def choose_actions(self, states):
+        """
+        The index of the best action (straight, right, left) for each row
+        of a (games, NUMBER_OF_INPUTS) array of states.
+        """
+        return np.argmax(self.policy(states), axis=1)
 
     def decide(self, game):
         """
         Observce the current game state, make a decision,
         execute the decision, reevaluate how good the decision was.
         """
-        old_state = copy.deepcopy(game.game_state)
+        old_state = np.copy(self.get_state(game))
+        old_score = game._score
         move = self.choose_action(old_state)
-        game.next_cmd = move
+        game.next_cmd = (game.snake.heading+[0, 1, 3][np.argmax(move)])%4
+        # the network picks straight, right, or left; turn that into a heading
         while game.next_cmd is not None:
             time.sleep(1)
-        new_state = copy.deepcopy(game.game_state)
-        self.learn(state_old, new_state, move)
+        new_state = self.get_state(game)
+        self.learn(old_state, new_state, move, game._score-old_score, game.game_over)
+        self.remember(old_state, np.argmax(move), game._score-old_score, new_state, game.game_over)
         # self.train_short_memory(state_old, final_move, reward, state_new, game.crash)
         return
     # def learn(self, old_state, new_state, decision):
@@ -297,26 +352,17 @@ class DQN(object):
     #     target_f[0][np.argmax(decision)] = target
 
     #     self.model.fit(old, target_f, epochs=1, verbose=0)
-    def learn(self, old_state, new_state, decision):
-        # old_state:
-        #     0  playing
-        #     1  crashed
-        #     2  score
-        #     3  size
-        #     4  height
-        #     5  width
-        #     6  snake_speed
-        #     7  auto_tick
-        #     8  obstacles
-        #     9  rewards
-        #     10 snake
-        old_reward = old_state[2]
-        new_reward = new_state[2]
+    def learn(self, old_state, new_state, decision, reward, done):
+        # old_state/new_state are SnakeGame.features():
+        #     0-2  danger straight, right, left
+        #     3-6  heading west, east, north, south
+        #     7-10 fruit west, east, north, south
+        new_reward = reward
         old = self._reshape_state(old_state)
         new = self._reshape_state(new_state)
         target = new_reward
-        if not new_state[1] and not new_state[0]:
-            # if the game is still ongoing (not crashed, or paused)
+        if not done:
+            # if the game is still ongoing (not crashed)
             prediction = self.model.predict(new)[0]
             # Generates output predictions for the input samples
             prediction = np.amax(prediction)
@@ -329,42 +375,46 @@ class DQN(object):
         target_f[0][np.argmax(decision)] = target
 
         self.model.fit(old, target_f, epochs=1, verbose=0)
+        self.refresh_policy()
     
     def _reshape_state(self,state):
         return state.reshape((1, NUMBER_OF_INPUTS))
 
-    def remember(self, old_state, new_state, decision):
+    def remember(self, old_state, action, reward, new_state, done):
+        """
+        Hold onto a transition; 'action' is the index of the move
+        (straight, right, left), not the one-hot decision.
+        """
+        self.memory.push(old_state, action, reward, new_state, done)
+
+    def train_from_memory(self, memory=None):
+        """
+        Train on up to batch_size transitions picked from a ReplayMemory
+        (by default the DQN's own), then give them priorities from their
+        TD errors if it is prioritized.
+        """
+        memory = self.memory if memory is None else memory
+        if len(memory) == 0:
+            return None
+        batch = memory.sample(self.batch_size)
+        errors = self.train_on_batch(batch)
+        memory.update_priorities(batch.indices, errors)
+        return errors
+
+    def train_on_batch(self, batch):
         """
-        Hold onto the state.
+        Take one training step on a whole Batch: a single predict on its
+        states and next states stacked together, and a single fit weighted
+        by the batch's importance-sampling weights, if it has any.
+        Returns the TD error of each transition.
         """
-        self.memory.append((old_state, new_state, decision, ))
-
-    def train_from_memory(self, memory):
-        if len(memory) > self._memory_limit:
-            minibatch = random.sample(memory, self._memory_limit)
-        else:
-            minibatch = memory
-
-
-        for index, (old_state, new_state, decision) in enumerate(minibatch):
-            old_reward = old_state[2]
-            new_reward = new_state[2]
-            old = self._reshape_state(old_state)
-            new = self._reshape_state(new_state)
-            target = new_reward
-            # debug(f"done {done}")
-            if not new_state[1] and not new_state[0]:
-                # if the game is still ongoing (not crashed, or paused)
-                prediction = self.model.predict(new)[0]
-                # Generates output predictions for the input samples
-                prediction = np.amax(prediction)
-                # the agent should be choosing the one with the best outcome
-                target = new_reward + self.gamma * prediction
-                # the agent should be choosing the one with the best outcome
-
-            target_f = self.model.predict(np.array([state]))
-            target_f[0][np.argmax(action)] = target
-            self.model.fit(np.array([state]), target_f, epochs=1, verbose=0)
+        size = len(batch.actions)
+        predictions = self.model.predict(np.concatenate([batch.states, batch.next_states]), batch_size=2*size)
+        # one call for both halves, since each Keras call has a fixed overhead
+        targets, errors = td_targets(predictions[:size], predictions[size:], batch, self.gamma)
+        self.model.fit(batch.states, targets, sample_weight=batch.weights, batch_size=size, epochs=1, verbose=0)
+        self.refresh_policy()
+        return errors
     # def train_short_memory(self, state, action, reward, next_state, done):
     #     target = reward
     #     if not done:
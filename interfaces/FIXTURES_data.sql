@@ -23,8 +23,4 @@ INSERT OR REPLACE INTO "obstacles" ("id", "x", "y", "w", "h") VALUES (0, 0, -10,
     (2, 0, 320, 320, 10), 
     (3, -10, 0, 10, 320);
 INSERT OR REPLACE INTO "games" ("id" ,"settings" ,"player" ,"version") VALUES (0, 0, 0, "0.0.0");
-INSERT OR REPLACE INTO "states" ("id", "game", "timestamp", "snake", "score") VALUES (0, 0, "2019-08-28 12:47:51.000", 0, 100),
-	(0, 0, "2019-08-28 12:47:52.000", 0, 110);
-INSERT OR REPLACE INTO "snakes" ("id", "belly") VALUES (0, 18);
-INSERT OR REPLACE INTO "segments" ("id", "x", "y", "w", "h", "heading", "snake", "body_index") VALUES (0, 260, 170, 60, 10, 1, 0, 0);
 COMMIT;
@@ -1,5 +1,14 @@
+PRAGMA user_version = 2;
+-- version 2: every table is keyed by an INTEGER PRIMARY KEY (its rowid),
+-- a game instance keeps a UUID only as an identifier for use outside the database;
+-- interfaces/migrate.py copies a database keyed by UUIDs into this schema
+CREATE TABLE IF NOT EXISTS "id_blocks" (
+-- each Scribe reserves a block of 2**32 ids, so rows can be given ids before they are written
+    "id"             INTEGER PRIMARY KEY AUTOINCREMENT,
+    "created"        DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
 CREATE TABLE IF NOT EXISTS "game_settings" (
-    "id"             INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"             INTEGER PRIMARY KEY,
     "height"         INTEGER NOT NULL,
     "width"          INTEGER NOT NULL,
     "size"           INTEGER NOT NULL,
@@ -7,72 +16,72 @@ CREATE TABLE IF NOT EXISTS "game_settings" (
     "frames"         INTEGER NOT NULL,
     "reward_limit"   INTEGER NOT NULL,
     "auto_tick"      BOOLEAN NOT NULL,
-    PRIMARY KEY ("height", "width", "size", "snake_speed", "frames", "reward_limit", "auto_tick")
+    "starting_length" INTEGER NOT NULL DEFAULT 3
 );
 CREATE TABLE IF NOT EXISTS "agents" (
 -- the DQN agents trained with specific settings
-    "id"             INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"             INTEGER PRIMARY KEY,
     "weights"        BLOB NOT NULL,
     "gamma"          REAL NOT NULL
 );
 CREATE TABLE IF NOT EXISTS "players" (
 -- the DQN agents and human players
-    "id"             INTEGER NOT NULL,
+    "id"             INTEGER PRIMARY KEY,
     "name"           TEXT NOT NULL UNIQUE,
     "agent"          INTEGER,
-    FOREIGN KEY("agent") REFERENCES "agents"("id"),
-    PRIMARY KEY ("id")
+    FOREIGN KEY("agent") REFERENCES "agents"("id")
 );
 CREATE TABLE IF NOT EXISTS "games" (
 -- A specific configuration of game and player to create game instances
-    "id"            INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"            INTEGER PRIMARY KEY,
     "settings"      INTEGER NOT NULL,
     "player"        INTEGER NOT NULL,
     "version"       TEXT NOT NULL,
     FOREIGN KEY("settings") REFERENCES "game_settings"("id"),
     FOREIGN KEY("player") REFERENCES "players"("id")
-    PRIMARY KEY ("settings", "player", "version")
 );
 CREATE TABLE IF NOT EXISTS "game_instances" (
 -- A single game played by someone/something
-    "id"       INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"       INTEGER PRIMARY KEY,
+    "uuid"     TEXT UNIQUE,
+    -- identifies the game outside of this database
     "game"     INTEGER NOT NULL,
     "start"    DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
     "end"      DATETIME,
+    "seed"     INTEGER,
+    -- seeds the game's random generator, so the game can be replayed from its commands
     FOREIGN KEY("game") REFERENCES "games"("id")
 );
 CREATE TABLE IF NOT EXISTS "commands" (
 -- Available commands to pass to the game
-    "id"        INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"        INTEGER PRIMARY KEY,
     "key"       INTEGER NOT NULL,
     "name"      TEXT NOT NULL
 );
 CREATE TABLE IF NOT EXISTS "commands_executed" (
 -- Commands a player passed to a game instance
-    "id"        INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"        INTEGER PRIMARY KEY,
     "timestamp" DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
     "command"   INTEGER NOT NULL,
+    -- the key of the command
     "game"      INTEGER NOT NULL,
-    FOREIGN KEY("command") REFERENCES "commands"("id"),
     FOREIGN KEY("game") REFERENCES "game_instances"("id")
 );
 CREATE TABLE IF NOT EXISTS "fruits" (
 -- the kinds of fruits available to be spawned
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "name"       TEXT NOT NULL,
     "value"      INTEGER NOT NULL,
     "frequency"  REAL NOT NULL,
-    "color"      RGB NOT NULL,
-    PRIMARY KEY ("name", "value", "frequency")
+    "color"      RGB NOT NULL
 );
 CREATE TABLE IF NOT EXISTS "obstacles" (
 -- Immovable objects that snakes should never hit
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "x"          INTEGER NOT NULL,
     "y"          INTEGER NOT NULL,
     "w"          INTEGER NOT NULL,
-    "h"          INTEGER NOT NULL,
-    PRIMARY KEY ("x", "y", "w", "h")
+    "h"          INTEGER NOT NULL
 );
 CREATE TABLE IF NOT EXISTS "segments" (
 -- Parts of a snake body
@@ -87,13 +96,12 @@ drawn onto the board in a specific location; this rectangle
 may have been drawn again later in the same game, or other games, 
 but it's size and location never changes. 
 */
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "x"          INTEGER NOT NULL,
     "y"          INTEGER NOT NULL,
     "w"          INTEGER NOT NULL,
     "h"          INTEGER NOT NULL,
-    "heading"    INTEGER NOT NULL,
-    PRIMARY KEY ("x", "y", "w", "h", "heading")
+    "heading"    INTEGER NOT NULL
 );
 CREATE TABLE IF NOT EXISTS "fruit_instances" (
 -- the fruits that were spawned
@@ -101,12 +109,11 @@ CREATE TABLE IF NOT EXISTS "fruit_instances" (
 Note, similar to segments, this entries should not change values, 
 but they can exist in multiple game instances.
 */
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "x"          INTEGER NOT NULL,
     "y"          INTEGER NOT NULL,
     "species"    INTEGER NOT NULL,
-    PRIMARY KEY ("x", "y", "species"),
-    FOREIGN KEY("species") REFERENCES "fruits"("id"),
+    FOREIGN KEY("species") REFERENCES "fruits"("id")
 );
 CREATE TABLE IF NOT EXISTS "states" (
 -- A snapshot of the state of a game instance in a particular point in time
@@ -114,7 +121,7 @@ CREATE TABLE IF NOT EXISTS "states" (
 Note that a state contains several lists of things; 
 they'll be defined in later tables.
 */
-    "id"           INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"           INTEGER PRIMARY KEY,
     "game"         INTEGER NOT NULL,
     "timestamp"    DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
     "score"        INTEGER NOT NULL,
@@ -122,29 +129,27 @@ they'll be defined in later tables.
 );
 CREATE TABLE IF NOT EXISTS "states_fruits" (
 -- create an entry showing that a state used an instance of a fruit
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "fruit"      INTEGER NOT NULL,
     "state"      INTEGER NOT NULL,
-    PRIMARY KEY ("fruit", "state"),
     FOREIGN KEY("fruit") REFERENCES "fruit_instances"("id"),
     FOREIGN KEY("state") REFERENCES "states"("id")
 );
 CREATE TABLE IF NOT EXISTS "states_obstacles" (
 -- create an entry showing that a state used an instance of an obstacle
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "obstacle"   INTEGER NOT NULL,
     "state"      INTEGER NOT NULL,
-    PRIMARY KEY ("obstacle", "state"),
     FOREIGN KEY("obstacle") REFERENCES "obstacles"("id"),
     FOREIGN KEY("state") REFERENCES "states"("id")
 );
 CREATE TABLE IF NOT EXISTS "states_snakes" (
 -- the state a snake was in at a moment in time
-    "id"         INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "state"      INTEGER NOT NULL,
     "belly"      INTEGER NOT NULL,
     "length"     INTEGER NOT NULL,
-    FOREIGN KEY("state") REFERENCES "states"("id"),
+    FOREIGN KEY("state") REFERENCES "states"("id")
 );
 CREATE TABLE IF NOT EXISTS "snake_body_parts" (
 -- entries here associate one segment to one state the snake was in
@@ -152,15 +157,62 @@ CREATE TABLE IF NOT EXISTS "snake_body_parts" (
 Note, segment entries can be reused here, across multiple snakes (and multiple states), 
 but body_index for the segment could change from snake to snake.
 */
-    "id"         INTEGER NOT NULL AUTOINCREMENT UNIQUE,
+    "id"         INTEGER PRIMARY KEY,
     "snake"      INTEGER NOT NULL,
     "segment"    INTEGER NOT NULL,
     "body_index" INTEGER NOT NULL,
     FOREIGN KEY("snake") REFERENCES "states_snakes"("id"),
-    FOREIGN KEY("segment") REFERENCES "segments"("id"),
-    PRIMARY KEY ("snake", "segment", "body_index")
+    FOREIGN KEY("segment") REFERENCES "segments"("id")
+);
+CREATE TABLE IF NOT EXISTS "snake_keyframes" (
+-- the whole snake at a state, when only what changes between states is recorded
+    "id"         INTEGER PRIMARY KEY,
+    "state"      INTEGER NOT NULL,
+    "heading"    INTEGER,
+    "belly"      INTEGER NOT NULL,
+    "cells"      BLOB NOT NULL,
+    -- the x,y of every virtual pixel in the snake from the head to the tail, as little endian int32s
+    FOREIGN KEY("state") REFERENCES "states"("id")
+);
+CREATE TABLE IF NOT EXISTS "snake_deltas" (
+-- how the snake changed since the state before, between keyframes
+    "id"         INTEGER PRIMARY KEY,
+    "state"      INTEGER NOT NULL,
+    "heading"    INTEGER,
+    "belly"      INTEGER NOT NULL,
+    "heads"      BLOB NOT NULL,
+    -- the virtual pixels added in front of the head, packed like snake_keyframes.cells
+    "retract"    INTEGER NOT NULL,
+    -- how many virtual pixels the tail retracted
+    FOREIGN KEY("state") REFERENCES "states"("id")
+);
+CREATE TABLE IF NOT EXISTS "fruit_deltas" (
+-- fruits added to or removed from the board at a state;
+-- at a keyframe every fruit on the board is added
+    "id"         INTEGER PRIMARY KEY,
+    "state"      INTEGER NOT NULL,
+    "x"          INTEGER NOT NULL,
+    "y"          INTEGER NOT NULL,
+    "species"    INTEGER NOT NULL,
+    "added"      BOOLEAN NOT NULL,
+    FOREIGN KEY("state") REFERENCES "states"("id"),
+    FOREIGN KEY("species") REFERENCES "fruits"("id")
 );
 
+CREATE INDEX IF NOT EXISTS "games_player" ON "games" ("player");
+CREATE INDEX IF NOT EXISTS "game_instances_game" ON "game_instances" ("game");
+CREATE INDEX IF NOT EXISTS "commands_executed_game" ON "commands_executed" ("game");
+CREATE INDEX IF NOT EXISTS "states_game" ON "states" ("game");
+-- every index ends with the rowid, so a game's commands and states are found
+-- in the order they were inserted, without sorting them; timestamps can collide
+CREATE INDEX IF NOT EXISTS "states_fruits_state" ON "states_fruits" ("state");
+CREATE INDEX IF NOT EXISTS "states_obstacles_state" ON "states_obstacles" ("state");
+CREATE INDEX IF NOT EXISTS "states_snakes_state" ON "states_snakes" ("state");
+CREATE INDEX IF NOT EXISTS "snake_body_parts_snake" ON "snake_body_parts" ("snake", "body_index");
+-- a snake's segments from the head to the tail
+CREATE INDEX IF NOT EXISTS "snake_keyframes_state" ON "snake_keyframes" ("state");
+CREATE INDEX IF NOT EXISTS "snake_deltas_state" ON "snake_deltas" ("state");
+CREATE INDEX IF NOT EXISTS "fruit_deltas_state" ON "fruit_deltas" ("state");
 
 DROP VIEW IF EXISTS [HIGH_SCORES];
 CREATE VIEW IF NOT EXISTS [HIGH_SCORES] AS SELECT 
@@ -1,5 +1,11 @@
 from .player import Player
 from .game import SnakeGame
-from .scribe import Scribe
+from .scribe import Scribe, AsyncScribe
+from .vec_game import VecSnakeGame
+from .runner import run_games
+from .replay import Replay
+from .memory import ReplayMemory, PrioritizedReplayMemory
+from .network import DenseNetwork
+from .inference import InferenceServer
 # from .DQN import DQN
 from .test_interfaces import *
\ No newline at end of file
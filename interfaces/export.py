@@ -0,0 +1,229 @@
+import os
+import argparse
+import numpy as np
+from interfaces.game import SnakeGame
+from interfaces.vec_game import VecSnakeGame
+from interfaces.scribe import Scribe, SCHEMA_VERSION, READ_QUERIES
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for export.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+FORMATS = ["npz", "parquet"]
+# what shards can be written as
+
+COLUMNS = ["game", "tick", "features", "action", "reward", "next_features", "done"]
+# the columns of every shard, one row per transition
+
+ACTIONS = np.array([0, 1, -1, 2], dtype=np.int8)
+# a move relative to the snake's heading (straight, right, back, left) to
+# the index of the action the DQN chose; the DQN never turns back, so
+# moves that do are left out of the transitions
+
+HEADINGS = np.array([(0, -1), (1, 0), (0, 1), (-1, 0)], dtype=np.int64)
+# the x,y step of each heading, like SnakeGame's
+
+
+def state_features(columns, width, height, size):
+    """
+    The SnakeGame.features() of every state of a game loaded by
+    Scribe.load_game, one row per state, worked out from the recorded
+    snakes and fruits rather than by replaying the game.
+    """
+    count = len(columns["state"])
+    features = np.zeros((count, SnakeGame.NUMBER_OF_FEATURES), dtype=np.float32)
+    stride, rows = width//size+2, height//size+2
+    # the board, with a one virtual pixel wall around it, like OccupancyGrid
+    def cell(state, x, y):
+        return (state*rows+y//size+1)*stride+x//size+1
+    offsets = columns["cell_offsets"]
+    counts = np.diff(offsets)
+    alive = counts > 0
+    heading = columns["heading"].astype(np.int64)
+    head = np.stack([columns["head_x"], columns["head_y"]], axis=1).astype(np.int64)
+    points = head[:, None, :]+HEADINGS[(heading[:, None]+[0, 1, 3])%4]*size
+    # straight, right and left of each head
+    x, y = points[..., 0], points[..., 1]
+    wall = (x < 0) | (y < 0) | (x >= (stride-2)*size) | (y >= (rows-2)*size)
+    owner = np.repeat(np.arange(count), counts)
+    body = np.ones(len(owner), dtype=bool)
+    body[offsets[1:][alive & (columns["belly"] <= 0)]-1] = False
+    # the tail moves out of the way, unless the snake is growing
+    cells = columns["cells"].astype(np.int64)
+    occupied = cell(owner[body], cells[body, 0], cells[body, 1])
+    states = np.arange(count)[:, None]
+    features[:, :3] = wall | np.isin(cell(states, np.where(wall, 0, x), np.where(wall, 0, y)), occupied)
+    features[np.arange(count), 3+np.array([2, 1, 3, 0])[heading]] = 1
+    fruits = columns["fruits"].astype(np.int64)
+    boards = np.repeat(np.arange(count), np.diff(columns["fruit_offsets"]))
+    distance = np.abs(fruits[:, 0]-head[boards, 0])+np.abs(fruits[:, 1]-head[boards, 1])
+    order = np.lexsort((fruits[:, 1], fruits[:, 0], distance, boards))
+    boards, first = np.unique(boards[order], return_index=True)
+    # the nearest fruit on each board, ties broken like SnakeGame.features
+    nearest, head = fruits[order[first]], head[boards]
+    features[boards, 7:] = np.stack([nearest[:, 0] < head[:, 0], nearest[:, 0] > head[:, 0],
+        nearest[:, 1] < head[:, 1], nearest[:, 1] > head[:, 1]], axis=1)
+    features[~alive] = 0
+    return features
+
+
+def game_transitions(scribe, game_id):
+    """
+    Read a recorded game back with Scribe.load_game, and return one row per
+    move it executed, as a dict of COLUMNS: the game's id, the tick the move
+    was executed at, the SnakeGame.features() of the state the move was
+    chosen from, the action (see ACTIONS), the points it earned until the
+    next state, the features of the next state and whether the game was
+    over after the move. Only moves chosen from a recorded state make
+    transitions, so not a game's first one, which no state is recorded
+    before; a move without a state after it only makes one when it ended
+    the game.
+    """
+    columns = scribe.load_game(game_id)
+    height, width, size = scribe.cur.execute(READ_QUERIES["settings"], (game_id, )).fetchone()[:3]
+    (ended, ), = scribe.cur.execute('SELECT "end" IS NOT NULL FROM game_instances WHERE id=?', (game_id, ))
+    commands = columns["commands"]
+    ticks = np.flatnonzero(commands < 4)
+    features = np.concatenate([state_features(columns, width, height, size),
+        np.zeros((1, SnakeGame.NUMBER_OF_FEATURES), dtype=np.float32)])
+    moves = columns["moves"].astype(np.int64)
+    bonus = np.concatenate([[0], np.cumsum(VecSnakeGame.still_alive_reward(np.arange(1, len(ticks)+1)))])[moves]
+    scores = bonus+(columns["score"]-np.round(bonus))
+    # states record the score rounded; the fruit eaten is a whole number of points,
+    # and every move survived earns a known fraction of one on top
+    scores = np.append(scores, scores[-1:])
+    if len(ticks) and not len(moves):
+        warn(f"Game '{game_id}' was recorded without its states, so it has no transitions")
+    chosen = np.flatnonzero(np.append(moves[1:] != moves[:-1], True))
+    # the state each move was chosen from is the last one before it,
+    # after any fruit the commands between the moves placed
+    follows = moves[chosen[1:]] == moves[chosen[:-1]]+1
+    before, after = chosen[:-1][follows], chosen[1:][follows]
+    if ended and len(moves) and moves[-1] == len(ticks)-1:
+        before, after = np.append(before, chosen[-1]), np.append(after, len(moves))
+        # the move the game ended on left no state behind
+    done = np.zeros(len(before), dtype=bool)
+    if len(before):
+        done[-1] = ended and after[-1] >= chosen[-1]
+    move = ticks[moves[before]]
+    action = ACTIONS[(commands[move].astype(np.int64)-columns["heading"][before])%4]
+    keep = action >= 0
+    before, after, move, action, done = before[keep], after[keep], move[keep], action[keep], done[keep]
+    return {
+        "game": np.full(len(before), game_id, dtype=np.int64),
+        "tick": move.astype(np.int32),
+        "features": features[before],
+        "action": action,
+        "reward": (scores[after]-scores[before]).astype(np.float32),
+        "next_features": features[after],
+        "done": done,
+    }
+
+
+def write_shard(path, columns, format="npz"):
+    """
+    Write a dict of COLUMNS to one file; npz files are compressed, parquet
+    files (which need pandas) get a column per feature, e.g. features_0.
+    """
+    if format == "npz":
+        np.savez_compressed(path, **columns)
+    elif format == "parquet":
+        import pandas as pd
+        # only needed for parquet shards
+        frame = {}
+        for name in COLUMNS:
+            if columns[name].ndim == 2:
+                for idx in range(columns[name].shape[1]):
+                    frame[f"{name}_{idx}"] = columns[name][:, idx]
+            else:
+                frame[name] = columns[name]
+        pd.DataFrame(frame).to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Expected one of {FORMATS} for a format, not {format}")
+
+
+def read_shard(path):
+    """
+    Read a shard written by write_shard back into a dict of COLUMNS.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as shard:
+            return { name: shard[name] for name in COLUMNS }
+    import pandas as pd
+    frame = pd.read_parquet(path)
+    columns = {}
+    for name in COLUMNS:
+        if name in frame:
+            columns[name] = frame[name].to_numpy()
+        else:
+            columns[name] = np.stack([ frame[f"{name}_{idx}"].to_numpy()
+                for idx in range(SnakeGame.NUMBER_OF_FEATURES) ], axis=1)
+    return columns
+
+
+def export(database, folder, format="npz", shard_size=100000, games=None):
+    """
+    Stream the transitions of every recorded game (or just 'games', a list of
+    ids) into shards of 'shard_size' rows in 'folder', game by game; only
+    one shard and one game are held in memory at a time. Returns the paths
+    of the shards, in order.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Expected one of {FORMATS} for a format, not {format}")
+    scribe = database if isinstance(database, Scribe) else Scribe(database)
+    if scribe.schema_version < SCHEMA_VERSION:
+        raise ValueError("Only databases keyed by integers can be exported, see interfaces.migrate")
+    if games is None:
+        games = [ game_id for (game_id, ) in scribe.exc(
+            "SELECT id FROM game_instances WHERE seed IS NOT NULL ORDER BY rowid", ()) ]
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    pending, rows = [], 0
+    # the transitions waiting for the next shard
+    def flush(size):
+        nonlocal pending, rows
+        columns = { name: np.concatenate([ part[name] for part in pending ]) for name in COLUMNS }
+        path = os.path.join(folder, f"transitions-{len(paths):05d}.{format}")
+        write_shard(path, { name: values[:size] for name, values in columns.items() }, format)
+        paths.append(path)
+        pending = [{ name: values[size:] for name, values in columns.items() }]
+        rows -= size
+        info(f"Wrote {size} transitions to {path}")
+    for game_id in games:
+        transitions = game_transitions(scribe, game_id)
+        pending += [transitions]
+        rows += len(transitions["game"])
+        while rows >= shard_size:
+            flush(shard_size)
+    if rows > 0:
+        flush(rows)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the transitions of recorded games to columnar shards.")
+    parser.add_argument("database", help="the database the games were recorded to")
+    parser.add_argument("folder", help="where to write the shards")
+    parser.add_argument("--format", default="npz", choices=FORMATS, help="what to write the shards as")
+    parser.add_argument("--shard-size", type=int, default=100000, help="how many transitions are in each shard")
+    args = parser.parse_args()
+    for path in export(args.database, args.folder, args.format, args.shard_size):
+        print(path)
@@ -1,18 +1,17 @@
 import contextlib
-with contextlib.redirect_stdout(None):
-    import pygame.time as gtime
-del contextlib
 import random
 from objects.snake import Snake
+from objects.cell_snake import CellSnake
 from objects.segment import Segment
 from objects.obstacle import Obstacle
 from objects.fruit import Fruit
-from interfaces.scribe import Scribe, get_timestamp
+from objects.grid import OccupancyGrid
+from interfaces.scribe import Scribe, AsyncScribe, SQLiteInterface, open_shard, get_timestamp
 import multiprocessing
 import logging
-import copy
 import math
-from collections import OrderedDict
+import numpy as np
+from collections import OrderedDict, namedtuple
 
 try:
     if "logr" not in globals():
@@ -35,6 +34,54 @@ except Exception as err:
     raise err
 
 
+def get_clock():
+    """
+    Create a pygame clock to limit how often a game can loop;
+    pygame is only imported once a clock is actually needed.
+    """
+    with contextlib.redirect_stdout(None):
+        import pygame.time as gtime
+    return gtime.Clock()
+
+
+def default_fruits():
+    """
+    The fruits a game can spawn, when it isn't given any;
+    a dict of name: function that instantiates a fruit object
+    """
+    return {
+            "apple": lambda dimensions: Fruit("apple", dimensions, 1, color=(255,0,0), frequency=0.1 ),
+            # 1 in 10 chance of an apple appearing each second, worth 1 point
+            "orange": lambda dimensions: Fruit("orange", dimensions, 10, color=(200,200,0), frequency=0.01 ),
+            # 1 in 100 chance of an orange appearing each second, worth 10 points
+            "bananna": lambda dimensions: Fruit("bananna", dimensions, 20, color=(255,255,0), frequency=0.005 ),
+            # 1 in 200 chance of an bananna appearing each second, worth 10 points
+        }
+
+
+GameSnapshot = namedtuple("GameSnapshot", [
+        "rand",
+        # the state of the game's random generator
+        "seed",
+        "grid",
+        # OccupancyGrid.snapshot()
+        "snake",
+        # Snake.snapshot(), or None
+        "rewards",
+        # a (name, dimensions, value) tuple per fruit
+        "next_fruit",
+        "next_cmd",
+        "playing",
+        "crashed",
+        "score",
+        "loop_counter",
+        "alive_counter",
+        "fruit_count",
+        # a (count, value) tuple per value of fruit eaten
+        "last_length",
+    ])
+# everything SnakeGame.restore() needs to continue a game from a SnakeGame.snapshot()
+
 
 class SnakeGame(object):
     """
@@ -70,6 +117,33 @@ class SnakeGame(object):
         "testing": False,
         # whether we're running unittests 
         "database": "data.db",
+        # path to the sqlite database (or a SQLiteInterface) the Scribe records to;
+        # None plays the game without recording it
+        "database_profile": "recording",
+        # the SQLITE_PROFILES the database is opened with, when "database" is a path;
+        # "recording" lets others read the database while the game writes to it
+        "database_shard": None,
+        # record to a shard of "database" of its own instead, e.g. one per process,
+        # so parallel games never wait on each other; see interfaces.merge
+        "record_states": True,
+        # whether to record every state, or only the seed and commands needed to replay the game
+        "record_batch": None,
+        # how many updates the Scribe queues before writing them in one transaction;
+        # None writes every row as soon as it's recorded
+        "record_deltas": None,
+        # how often the whole snake is recorded (a keyframe); between keyframes only what
+        # changed is recorded. None records the whole snake and every fruit in every state
+        "record_async": False,
+        # whether a writer thread records to the database (an AsyncScribe), instead of the game's thread
+        "record_overflow": "block",
+        # when the writer falls behind, whether to wait for it ("block") or throw away updates ("drop")
+        "seed": None,
+        # seed for the game's random generator; None picks a random seed
+        "headless": False,
+        # whether every update moves the snake once, without a pygame clock
+        "cell_body": False,
+        # whether the snake's body is a deque of cells (CellSnake), instead of a list of Segments;
+        # moving a CellSnake doesn't depend on how long it is
     }
     __valid_keys = {
             "0": 0,
@@ -88,6 +162,12 @@ class SnakeGame(object):
             # quit
         }
     __still_alive_reward_fnc = (lambda x: ((-1*math.atan((x/0.5)-1))+1.7))
+    OBSERVATION_CHANNELS = ("walls", "body", "head", "fruit")
+    # the channels of observation(), in order
+    NUMBER_OF_FEATURES = 11
+    # the length of features()
+    __headings = [(0,-1), (1,0), (0,1), (-1,0)]
+    # which way x,y change when moving north, east, south, west
     def __init__(self, *args, **kwargs):
         self.__next_cmd = None
         self.__game_state = None
@@ -100,8 +180,11 @@ class SnakeGame(object):
             setattr(self, k, kwargs.get(k,v))
             # try to get and use a keyword argument, else use default; 
             # set value for the attribute
-        self.clock = gtime.Clock()
-        # create a clock that will limit how often we can loop to update state
+        self.clock = None
+        # a clock that will limit how often we can loop to update state
+        if not self.headless:
+            # headless games move once per update, and never wait on a clock
+            self.clock = get_clock()
         # self.next_cmd = None
         # None, or an integer indicating what an instruction to perform:
         #     0 = move the snake north
@@ -120,15 +203,8 @@ class SnakeGame(object):
         # a list of Fruit objects that would feed the snake
         self.next_fruit = None
         # None, or a string to indicate the next Fruit object that should be added
-        self.fruits = kwargs.get("fruits",{
+        self.fruits = kwargs.get("fruits", default_fruits())
         # store a dict of name: function that instantiates a fruit object
-                "apple": lambda dimensions: Fruit("apple", dimensions, 1, color=(255,0,0), frequency=0.1 ),
-                # 1 in 10 chance of an apple appearing each second, worth 1 point
-                "orange": lambda dimensions: Fruit("orange", dimensions, 10, color=(200,200,0), frequency=0.01 ),
-                # 1 in 100 chance of an orange appearing each second, worth 10 points
-                "bananna": lambda dimensions: Fruit("bananna", dimensions, 20, color=(255,255,0), frequency=0.005 ),
-                # 1 in 200 chance of an bananna appearing each second, worth 10 points
-            })
         try:
             for name,fnc in self.fruits.items():
                 f = fnc([0,0,self.size])
@@ -139,9 +215,26 @@ class SnakeGame(object):
             ValueError(f"Fruits did not return a dictionary containing functions to create Fruit objects {err}")
         
         self.snake = None
+        self._snake_type = CellSnake if self.cell_body else Snake
+        # the class snakes are spawned as
+        self.grid = None
+        # an OccupancyGrid tracking what is in each virtual pixel
+        self._observation = None
+        self._features = None
+        # buffers observation() and features() write into, allocated on first use
         self._loop_counter = 0
         self.__alive_reward_counter = 0
-        self.scribe = Scribe("data.db")
+        self.scribe = None
+        if self.database is not None:
+            database = self.database
+            if isinstance(database, str) and self.database_shard is not None:
+                database = open_shard(database, self.database_shard, profile=self.database_profile)
+            elif isinstance(database, str):
+                database = SQLiteInterface(database, profile=self.database_profile)
+            if self.record_async:
+                self.scribe = AsyncScribe(database, overflow=self.record_overflow, keyframes=self.record_deltas)
+            else:
+                self.scribe = Scribe(database, batch_ticks=self.record_batch, keyframes=self.record_deltas)
         self.start()
 
     @property
@@ -352,7 +445,8 @@ class SnakeGame(object):
                 else:
                     props = list_a.__dict__.keys()
                 for k in props:
-                    if not hasattr(list_b,k) or list_b.__dict__[k] != list_a.__dict__[k]:
+                    if not hasattr(list_b,k) or getattr(list_b,k) != getattr(list_a,k):
+                        # Segment, Obstacle and Fruit use __slots__, and have no __dict__
                         result = False 
                         break
             else:
@@ -368,10 +462,14 @@ class SnakeGame(object):
         self.rand.seed(self._seed)
 
     def _init_randomizer(self, seed=None):
-        self._seed = 1
+        """
+        Seed the game's random generator; without a seed, pick one at random
+        so that it can be recorded, and the game replayed.
+        """
+        if seed is None:
+            seed = random.randrange(2**32)
         self.rand = random.Random()
-        if seed is not None:
-            self._set_seed(seed)
+        self._set_seed(seed)
 
     def _init_rewards(self):
         self.rewards = []
@@ -395,6 +493,19 @@ class SnakeGame(object):
             ]
         # self.scribe.record_obstacles(self.obstacles)
 
+    def _init_grid(self):
+        """
+        Initialize the occupancy grid from the current obstacles, rewards and snake.
+        """
+        self.grid = OccupancyGrid(self.width, self.height, self.size, edge=1)
+        # points are never picked along the north and west edges (x or y of 0)
+        for wall in self.obstacles:
+            self.grid.place_obstacle(wall)
+        for fruit in self.rewards:
+            self.grid.place_fruit(fruit)
+        if self.snake is not None:
+            self.grid.place_snake(self.snake)
+
     @property
     def can_germinate(self):
         """
@@ -421,40 +532,17 @@ class SnakeGame(object):
             self.__valid_keys[str(idx+7)] = idx+7
             # accept a key that will spawn it 
 
-    def get_point(self, depth=0):
-        """
-        Pick a point within the game boundaries and not currently occupied.
-        """
-        if depth >= 30:
-            error("Went too deep trying to generate a random point")
-            return (0,0)
-        debug(f"Getting random point depth = {depth}")
-        x = self.rand.randrange(0, self.width, self.size)
-        y = self.rand.randrange(0, self.height, self.size)
-        if x <= 0 or y <= 0:
-            self._set_seed(self._seed+10)
-            return self.get_point(depth=depth+1)
-            # try to get a new random x,y point
-        pseudo_segment = Segment([x, y, self.size, self.size],0)
-        debug(f"Checking point {depth} against obstacles")
-        for wall in self.obstacles:
-            if Snake.intersects(wall, pseudo_segment):
-                debug(f"point {pseudo_segment} intersects with wall")
-                return self.get_point(depth=depth+1)
-                # try to get a new random x,y point
-        debug(f"Checking point {depth} against fruits")
-        for fruit in self.rewards:
-            if Snake.intersects(fruit, pseudo_segment):
-                debug(f"point {pseudo_segment} intersects with fruit")
-                return self.get_point(depth=depth+1)
-                # try to get a new random x,y point
-        debug(f"Checking point {depth} against Snake segments")
-        if self.snake is not None and Snake.intersects(self.snake, pseudo_segment):
-            debug(f"point {pseudo_segment} intersects with Snake")
-            return self.get_point(depth=depth+1)
-            # try to get a new random x,y point
-        debug(f"Point {depth} approved")
-        return (x,y)
+    def get_point(self):
+        """
+        Pick a point within the game boundaries and not currently occupied,
+        or None if every point is occupied.
+        """
+        point = self.grid.random_free(self.rand)
+        # a single draw from the grid's index of free virtual pixels
+        if point is None:
+            error("No free point left to pick")
+            return None
+        return tuple(point)
 
     def get_fruit(self):
         """
@@ -482,12 +570,15 @@ class SnakeGame(object):
         """
         if self.next_fruit in self.fruits and self.can_germinate:
             point = self.get_point()
-            if point is not None and self.scribe.get_state:
+            if point is not None:
                 x,y = point
                 fruit = self.fruits.get(self.next_fruit)([x,y,self.size])
                 self.rewards += [fruit]
+                self.grid.place_fruit(fruit)
                 # debug(f"Next fruit spawned {self.next_fruit}")
-                self.scribe.record_fruits(fruit)
+                if self.scribe is not None and self.scribe.get_state and self.record_states:
+                    # fruit are recorded against the last state, once there is one
+                    self.scribe.record_fruits(fruit)
                 self.next_fruit = None
                 return fruit
 
@@ -502,9 +593,9 @@ class SnakeGame(object):
         position = self.get_point()
         if position is not None:
             try:
-                snake = Snake([position[0], position[1], self.size, self.starting_length*self.size], heading)
+                snake = self._snake_type([position[0], position[1], self.size, self.starting_length*self.size], heading)
             except Exception as err:
-                snake = Snake([position[0], position[1], self.size, self.starting_length*self.size], (heading+1)%4)
+                snake = self._snake_type([position[0], position[1], self.size, self.starting_length*self.size], (heading+1)%4)
             # safe_distance = int(round(min(self.width, self.height)/10))
             safe_distance = 5
             if self._peek(snake, snake.heading, safe_distance):
@@ -527,6 +618,8 @@ class SnakeGame(object):
         # debug("Game.spawn_snake")
         if self.snake is None:
             self.snake = self._get_snake()
+            if self.snake is not None:
+                self.grid.place_snake(self.snake)
 
     def start(self):
         self.obstacles = []
@@ -543,12 +636,14 @@ class SnakeGame(object):
         # counter to track how much to reward the player for staying alive this long
         self._fruit_count = []
         # how many fruit of which values were consumed
-        self._init_randomizer()
+        self._init_randomizer(self.seed)
         self._organize_fruit()
         self._init_rewards()
         self._init_boundaries()
+        self._init_grid()
         self.spawn_snake()
-        self.scribe.record_game_start(self)
+        if self.scribe is not None:
+            self.scribe.record_game_start(self)
 
     @property
     def alive_counter(self):
@@ -632,6 +727,18 @@ class SnakeGame(object):
         """
         Progress the state of the game forward.
         """
+        self._update()
+        if self.scribe is not None:
+            if self.crashed:
+                self.scribe.flush()
+                # the game was quit, write whatever it queued
+            else:
+                self.scribe.tick()
+
+    def _update(self):
+        """
+        Progress the state of the game forward, for a single update.
+        """
         debug("UPDATE GAME STATE")
         state_changed = False
         moved_snake = False
@@ -658,7 +765,8 @@ class SnakeGame(object):
             cmd = int(self.next_cmd)
             if cmd in [4,5,6]:
                 # if it can be immediately used
-                self.scribe.record_command(cmd)
+                if self.scribe is not None:
+                    self.scribe.record_command(cmd)
                 self.next_cmd = None
                 # remove the cached command
 
@@ -677,8 +785,8 @@ class SnakeGame(object):
                 # if we were not playing 
                 self.playing = True
                 # we are now
-                return
-                # do nothing else during this update call
+            return
+            # do nothing else during this update call
         elif cmd == 6:
             # quit
             info("recv quit command")
@@ -694,9 +802,10 @@ class SnakeGame(object):
             if cmd in [i for i in range(4)]:
                 # if the next command is to tell the snake to move in a cardinal direction
                 move = cmd
-            elif self.auto_tick and self.playing:
+            elif (self.auto_tick or self.headless) and cmd is None:
                 # if the snake was not told the direction to move AND its set to keep moving
-                # in the last heading it was given and we're still playing
+                # in the last heading it was given and we're still playing;
+                # a command to force a fruit is handled on its own, without a move
                 # debug(f"MOVING SNAKE VIA {self.snake.heading}")
                 move = self.snake.heading
             else:
@@ -704,44 +813,69 @@ class SnakeGame(object):
                 # leave the snake alone
             limit = int(self.frames/self.snake_speed)
             # if move is not None and (self.auto_tick is False or self._loop_counter >= limit or limit == 1):
-            if move is not None and (self._loop_counter >= limit or limit == 1):
+            if move is not None and (self.headless or self._loop_counter >= limit or limit == 1):
+                # headless games skip the frame limit; every update is a move
                 # if we're allowed to move during this cycle
                 debug(f"MOVING SNAKE TO {cmd} - {move}")
-                self.snake.move(move)
+                tail = self.snake.tail_origin
+                # the virtual pixel the tail will leave, if it retracts
+                assert self.grid.get(*tail) in [OccupancyGrid.BODY, OccupancyGrid.WALL], \
+                    "The snake was changed without updating the grid, see _init_grid"
+                # start, restore and spawning fruit keep the grid in step with the board;
+                # a freshly spawned snake can trail into the wall around it
+                retracts = self.snake.belly <= 0
+                # the tail only retracts when there is no food in the belly
+                self.snake.move(move, self_check=False)
+                # the grid checks for the snake running into itself below
                 state_changed = True
                 self._loop_counter = -1
                 self.get_fruit()
-                self.scribe.record_command(move)
+                if self.scribe is not None:
+                    self.scribe.record_command(move)
                 self.next_cmd = None
                 # remove the cached command now that we've used it
             # else:
             #     debug(f"no move because {move} is not None and {self._loop_counter} >= {self.frames}/{self.snake_speed}")
             #     debug(f"no move because {move} is not None and {self._loop_counter} >= {int(self.frames/self.snake_speed)}")
             #     debug(f"no move because {move is not None} and {self._loop_counter >= int(self.frames/self.snake_speed)}")
-                for wall in self.obstacles:
-                    if self.snake.is_alive:
-                        if self.snake.intersects(self.snake.head,wall):
-                            info(f"Snake hit {wall}")
-                            self.snake.interact(wall)
                 if self.snake.is_alive:
-                    for fruit in self.rewards:
-                        if self.snake.intersects(self.snake.head,fruit):
+                    if retracts:
+                        self.grid.release(*tail)
+                        # free the tail before checking the head, so the head
+                        # can follow directly behind the tail
+                    head = self.snake.head_origin
+                    hit = self.grid.get(*head)
+                    # a single lookup for whatever the head moved into
+                    if hit == OccupancyGrid.WALL:
+                        info(f"Snake hit a wall @ {head}")
+                        self.snake.die()
+                    elif hit == OccupancyGrid.BODY:
+                        debug("snake self_intersects")
+                        self.snake.die()
+                    elif hit == OccupancyGrid.FRUIT:
+                        fruit = self.grid.fruit_at(*head)
+                        self.grid.remove_fruit(fruit)
+                        if fruit in self.rewards:
                             info(f"Snake hit {fruit.name} @ {fruit.origin} worth {fruit.value}")
                             self.count_fruit(fruit.value)
-                            self.score += fruit.value
+                            self._score += fruit.value
+                            # adding to the rounded score would drop the points awarded for staying alive
                             self.snake.interact(fruit)
                             self.rewards.remove(fruit)
+                    if self.snake.is_alive:
+                        self.grid.occupy(*head)
                 if self.snake is not None and self.snake.is_alive:
                     self._last_length = self.snake.length
                     # store the snake length to be accessed when the game ends and there is no snake
                     self.get_still_alive_reward()
-                elif self.scribe.get_game_instance:
+                elif self.scribe is not None and self.scribe.get_game_instance:
                     self.scribe.record_game_end(get_timestamp())
 
             # handle the fruit 
             if cmd is not None and cmd-7 in [i for i in range(0, len(self.fruit_chances))]:
                 # we're told to spawn a specific fruit
-                self.scribe.record_command(cmd)
+                if self.scribe is not None:
+                    self.scribe.record_command(cmd)
                 cmd = cmd - 7
                 self.next_fruit = list(reversed(self.fruit_chances))[cmd][0]
                 # store the fruit name
@@ -755,7 +889,8 @@ class SnakeGame(object):
                 state_changed = self.next_fruit is not None and self.can_germinate
             self.spawn_next_fruit()
             # handle instantiating the next fruit at a random point
-            if state_changed:
+            if state_changed and self.record_states and self.scribe is not None and self.scribe.get_game_instance:
+                # once the game has ended, there is no game left to record a state for
                 self.scribe.record_state({
                         "score": self.score,
                         "fruits": self.rewards,
@@ -768,28 +903,175 @@ class SnakeGame(object):
             self.next_cmd = None
         # if self.scribe.get_game_instance is not None and (self.snake is None or not self.snake.is_alive):
         #     self.scribe.record_game_end(get_timestamp())
-        
+
+    @property
+    def game_over(self):
+        """
+        Whether the game has been quit, or the snake is no longer alive.
+        """
+        return self.crashed or self.snake is None or not self.snake.is_alive
+
+    def step(self, cmd=None):
+        """
+        Advance a headless game by exactly one command; without a command,
+        or with a move, the snake moves exactly once.
+        Return the points gained by the command, and whether the game is over.
+        """
+        if not self.headless:
+            raise RuntimeError("step() is only available to headless games; use update()")
+        score = self._score
+        self.playing = True
+        # a headless game is always playing while it is being stepped
+        self.next_cmd = cmd
+        self.update()
+        return self._score-score, self.game_over
+
+    def snapshot(self):
+        """
+        Capture everything needed to continue the game from this point, as an
+        immutable GameSnapshot; the Scribe and the clock are left out.
+        A snapshot can be restored any number of times, into any game
+        with the same settings and fruits.
+        """
+        return GameSnapshot(
+                rand=self.rand.getstate(),
+                seed=self._seed,
+                grid=self.grid.snapshot(),
+                snake=self.snake.snapshot() if self.snake is not None else None,
+                rewards=tuple([(fruit.name, tuple(fruit.dimensions), fruit.value) for fruit in self.rewards]),
+                next_fruit=self.next_fruit,
+                next_cmd=self.next_cmd,
+                playing=self.playing,
+                crashed=self.crashed,
+                score=self._score,
+                loop_counter=self._loop_counter,
+                alive_counter=self.__alive_reward_counter,
+                fruit_count=tuple([(cnt,val) for cnt,val in self._fruit_count]),
+                last_length=getattr(self, "_last_length", None),
+            )
+
+    def restore(self, snapshot):
+        """
+        Return the game to the point a snapshot was taken.
+        Nothing is recorded; a Scribe keeps recording to the same game instance.
+        """
+        self.rand.setstate(snapshot.rand)
+        self._seed = snapshot.seed
+        self.snake = self._snake_type.restore(snapshot.snake) if snapshot.snake is not None else None
+        rewards = []
+        for name,dimensions,value in snapshot.rewards:
+            fruit = self.fruits.get(name)(list(dimensions))
+            fruit.value = value
+            rewards += [fruit]
+        self.rewards = rewards
+        self.grid.restore(snapshot.grid, self.rewards)
+        self.next_fruit = snapshot.next_fruit
+        self.next_cmd = snapshot.next_cmd
+        self.playing = snapshot.playing
+        self.crashed = snapshot.crashed
+        self._score = snapshot.score
+        self._loop_counter = snapshot.loop_counter
+        self.__alive_reward_counter = snapshot.alive_counter
+        self._fruit_count = [[cnt,val] for cnt,val in snapshot.fruit_count]
+        if snapshot.last_length is not None:
+            self._last_length = snapshot.last_length
+        elif hasattr(self, "_last_length"):
+            del self._last_length
+
+    def observation(self, out=None):
+        """
+        Write the board into a float32 array shaped (4, rows+2, columns+2),
+        with one channel per OBSERVATION_CHANNELS: walls (including the border
+        around the board), the snake's body, its head, and the value of each fruit.
+        Without 'out', the game's own buffer is reused by every call.
+        """
+        grid = self.grid
+        shape = (len(SnakeGame.OBSERVATION_CHANNELS), grid.rows+2, grid.columns+2)
+        if out is None:
+            if self._observation is None or self._observation.shape != shape:
+                self._observation = np.zeros(shape, dtype=np.float32)
+            out = self._observation
+        cells = np.frombuffer(grid.cells, dtype=np.uint8).reshape(shape[1:])
+        # a view of the grid, without copying it
+        np.equal(cells, OccupancyGrid.WALL, out=out[0])
+        np.equal(cells, OccupancyGrid.BODY, out=out[1])
+        out[2] = 0
+        out[3] = 0
+        if self.snake is not None:
+            x, y = self.snake.head_origin
+            column, row = x//self.size+1, y//self.size+1
+            if 0 <= row < shape[1] and 0 <= column < shape[2]:
+                # a head that ran off the board isn't shown
+                out[2, row, column] = 1
+        fruit = out[3].reshape(-1)
+        for idx,reward in grid.fruits.items():
+            fruit[idx] = reward.value
+        return out
+
+    def features(self, out=None):
+        """
+        Write the 11 values the DQN observes into a float32 array:
+            0-2  whether moving straight, right, or left would kill the snake
+            3-6  whether the snake is heading west, east, north, or south
+            7-10 whether the nearest fruit is west, east, north, or south of the head
+        Without 'out', the game's own buffer is reused by every call.
+        """
+        if out is None:
+            if self._features is None:
+                self._features = np.zeros(SnakeGame.NUMBER_OF_FEATURES, dtype=np.float32)
+            out = self._features
+        if self.snake is None or not self.snake.is_alive:
+            out[:] = 0
+            # a dead snake has nothing left to observe
+            return out
+        heading = self.snake.heading
+        x, y = self.snake.head_origin
+        tail = self.snake.tail_origin if self.snake.belly <= 0 else None
+        # the tail moves out of the way, unless the snake is growing
+        values = [0]*SnakeGame.NUMBER_OF_FEATURES
+        # fill a list, and copy it into the array once
+        for idx,turn in enumerate([0, 1, 3]):
+            # straight, right, left
+            dx, dy = SnakeGame.__headings[(heading+turn)%4]
+            point = [x+dx*self.size, y+dy*self.size]
+            hit = self.grid.get(*point)
+            values[idx] = hit == OccupancyGrid.WALL or (hit == OccupancyGrid.BODY and point != tail)
+        values[3+[2, 1, 3, 0][heading]] = 1
+        # north, east, south, west are stored as west, east, north, south
+        if self.rewards:
+            nearest = min(self.rewards, key=(lambda fruit: (abs(fruit.x-x)+abs(fruit.y-y), fruit.x, fruit.y)))
+            # ties go to the westmost, then northmost fruit, so the features only depend on the board
+            values[7:] = [nearest.x < x, nearest.x > x, nearest.y < y, nearest.y > y]
+        out[:] = values
+        return out
+
     def _peek(self, snake, direction, distance):
         """
         Check whether moving the snake in "direction" by "distance" units,
         would result in it intersecting an object.
+        The grid is read directly; the snake is never copied or moved.
         """
         survived = True
         try:
-            astral_snake = copy.deepcopy(snake)
+            if not snake.is_alive or (direction+2)%4 == snake.heading:
+                # turning back runs the head into the body
+                survived = False
+                distance = 0
+            tail = snake.tail_origin if snake.is_alive and snake.belly <= 0 else None
+            # the tail retracts on the first move, so it may start out in a wall
+            for seg in snake.segments:
+                for y in range(seg.y, seg.y+seg.h, self.size):
+                    for x in range(seg.x, seg.x+seg.w, self.size):
+                        if [x, y] != tail and self.grid.get(x, y) == OccupancyGrid.WALL:
+                            debug(f"Astral Snake is in a wall @ {[x, y]}")
+                            survived = False
+                            distance = 0
+            dx, dy = SnakeGame.__headings[direction]
+            x, y = snake.head_origin if snake.is_alive else (0, 0)
             while distance > 0:
-                astral_snake.move(direction)
-                for wall in self.obstacles:
-                    if astral_snake.is_alive:
-                        if astral_snake.intersects(astral_snake.head,wall):
-                            debug(f"Astral Snake hit {wall}")
-                            astral_snake.interact(wall)
-                if astral_snake.is_alive:
-                    for fruit in self.rewards:
-                        if astral_snake.intersects(astral_snake.head,fruit):
-                            debug(f"Astral Snake hit {fruit}")
-                            astral_snake.interact(fruit)
-                if not astral_snake.is_alive:
+                x, y = x+dx*self.size, y+dy*self.size
+                if self.grid.get(x, y) in [OccupancyGrid.WALL, OccupancyGrid.BODY]:
+                    debug(f"Astral Snake hit something @ {[x, y]}")
                     survived = False
                     break
                 distance -= 1
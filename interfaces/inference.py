@@ -0,0 +1,240 @@
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future
+import numpy as np
+from interfaces.game import SnakeGame
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for inference.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+TURNS = [0, 1, 3]
+# how far each action (straight, right, left) turns the snake's heading, as in DQN.decide
+
+
+class InferenceServer(object):
+    """
+    Pick moves for many games at once. Games in other threads submit their
+    SnakeGame.features(), and games in other processes go through an
+    InferenceClient. A server thread gathers the waiting states into one
+    batch and runs the policy on the whole batch in a single forward pass.
+    It then hands each game the index of its best action.
+    A batch is evaluated once it holds max_batch states, or max_wait seconds
+    after its first state arrived, whichever comes first.
+    The policy maps a (batch, features) float32 array to a score per action,
+    e.g. lambda states: dqn.policy(states), which follows the DQN's training.
+    """
+    defaults = {
+        "max_batch": 64,
+        # the most states evaluated in one forward pass
+        "max_wait": 0.002,
+        # how many seconds a state waits for others to join its batch
+        "features": SnakeGame.NUMBER_OF_FEATURES,
+        # the length of each state
+    }
+    def __init__(self, policy, *args, **kwargs):
+        super(InferenceServer, self).__init__()
+        for k,v in self.defaults.items():
+            # for each item in the default configuration
+            setattr(self, k, kwargs.get(k,v))
+            # try to get and use a keyword argument, else use default;
+            # set value for the attribute
+        self.policy = policy
+        self.batches = 0
+        # how many forward passes have been run
+        self.served = 0
+        # how many states have been answered
+        self._states = np.zeros((self.max_batch, self.features), dtype=np.float32)
+        # the batch is stacked into the same array every time
+        self._requests = queue.Queue()
+        self._remote = None
+        # the queue InferenceClients send their states on, made by the first client()
+        self._responses = []
+        # the queue each InferenceClient is answered on
+        self._closed = False
+        self._lock = threading.Lock()
+        # closing and submitting take turns, so nothing is queued after the server is told to stop
+        self._server = threading.Thread(target=self._serve, name="InferenceServer", daemon=True)
+        self._server.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, state):
+        """
+        Queue a state to be evaluated, returning a Future of its action's index.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The inference server is closed")
+            return self._enqueue(state)
+
+    def _enqueue(self, state):
+        future = Future()
+        self._requests.put((np.array(state, dtype=np.float32), future, time.perf_counter()))
+        # a copy, since SnakeGame.features() reuses its array, and when it arrived
+        return future
+
+    def act(self, state, timeout=None):
+        """
+        The index of the best action for a state, once its batch has been evaluated.
+        """
+        return self.submit(state).result(timeout)
+
+    def client(self):
+        """
+        An InferenceClient for a game in another process; make it before the
+        process starts, and pass it to the process.
+        """
+        if self._closed:
+            raise RuntimeError("The inference server is closed")
+        if self._remote is None:
+            self._remote = multiprocessing.Queue()
+            self._listener = threading.Thread(target=self._listen, name="InferenceListener", daemon=True)
+            self._listener.start()
+        self._responses.append(multiprocessing.Queue())
+        return InferenceClient(self._remote, self._responses[-1], len(self._responses)-1)
+
+    def close(self):
+        """
+        Answer whatever is still waiting, then stop the server's threads.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._remote is not None:
+            self._remote.put(None)
+            self._listener.join()
+        self._requests.put(None)
+        # only the listener could still queue states, and it has stopped
+        self._server.join()
+
+    def _listen(self):
+        """
+        Pass the states InferenceClients send on to the server, and send each action back.
+        """
+        while True:
+            message = self._remote.get()
+            if message is None:
+                break
+            client, state = message
+            future = self._enqueue(state)
+            future.add_done_callback(lambda done, client=client:
+                self._responses[client].put(done.exception() or done.result()))
+        while True:
+            # clients that sent a state after the server was closed
+            try:
+                client, state = self._remote.get_nowait()
+            except queue.Empty:
+                break
+            self._responses[client].put(RuntimeError("The inference server is closed"))
+
+    def _serve(self):
+        """
+        Evaluate batches until told to stop by None.
+        """
+        running = True
+        while running:
+            request = self._requests.get()
+            if request is None:
+                break
+            pending = [request]
+            deadline = request[2]+self.max_wait
+            # counted from when the first state arrived, not from when it was taken off the queue
+            while len(pending) < self.max_batch:
+                # take whatever else arrives before the deadline
+                remaining = deadline-time.perf_counter()
+                try:
+                    request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    running = False
+                    break
+                pending.append(request)
+            self._evaluate(pending)
+        while True:
+            # anything queued behind the stop is failed rather than left waiting
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request[1].set_exception(RuntimeError("The inference server is closed"))
+
+    def _evaluate(self, pending):
+        """
+        Run the policy once on a batch of (state, future) requests, and answer each of them.
+        """
+        count = len(pending)
+        for idx, (state, future, arrived) in enumerate(pending):
+            self._states[idx] = state
+        try:
+            actions = np.argmax(self.policy(self._states[:count]), axis=1)
+        except Exception as err:
+            error(f"The inference server failed to evaluate a batch of {count} states")
+            for state, future, arrived in pending:
+                future.set_exception(err)
+            return
+        self.batches += 1
+        self.served += count
+        for (state, future, arrived), action in zip(pending, actions):
+            future.set_result(int(action))
+
+
+class InferenceClient(object):
+    """
+    A game's way to an InferenceServer in another process (see InferenceServer.client).
+    """
+    def __init__(self, requests, responses, client):
+        super(InferenceClient, self).__init__()
+        self._requests = requests
+        self._responses = responses
+        self.client = client
+
+    def act(self, state):
+        """
+        The index of the best action for a state, once its batch has been evaluated.
+        """
+        self._requests.put((self.client, np.array(state, dtype=np.float32)))
+        result = self._responses.get()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def play(game, server, max_steps=1000):
+    """
+    Step a headless game with the moves an InferenceServer (or InferenceClient)
+    picks, until it's over or has taken max_steps. Returns how many steps it took.
+    """
+    steps = 0
+    while not game.game_over and steps < max_steps:
+        action = server.act(game.features())
+        game.step((game.snake.heading+TURNS[action])%4)
+        steps += 1
+    return steps
@@ -0,0 +1,352 @@
+import os
+import numpy as np
+from collections import namedtuple
+from interfaces.game import SnakeGame
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for memory.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+Batch = namedtuple("Batch", [
+        "states",
+        # (batch, features) float32
+        "actions",
+        # the index of the action taken in each state (straight, right, left)
+        "rewards",
+        "next_states",
+        "dones",
+        # whether the game was over after the action
+        "indices",
+        # where in the memory each transition is
+        "weights",
+        # how much each transition counts towards the loss, None if they all count the same
+    ], defaults=(None, ))
+
+
+class ReplayMemory(object):
+    """
+    A fixed number of (state, action, reward, next state, done) transitions
+    in preallocated NumPy arrays, used as a ring buffer: once it is full each
+    new transition replaces the oldest one. With a folder the arrays are
+    memory-mapped .npy files in it, so a memory can outlive a training run.
+    """
+    defaults = {
+        "capacity": 100000,
+        # how many transitions are kept
+        "features": SnakeGame.NUMBER_OF_FEATURES,
+        # the length of each state
+        "folder": None,
+        # where to keep the arrays as memory-mapped files, if anywhere
+        "seed": None,
+        # seed for the random generator that samples transitions
+    }
+    FIELDS = [
+        ("states", np.float32),
+        ("actions", np.int8),
+        ("rewards", np.float32),
+        ("next_states", np.float32),
+        ("dones", np.bool_),
+    ]
+    # every array, and what it holds
+    def __init__(self, *args, **kwargs):
+        super(ReplayMemory, self).__init__()
+        for k,v in self.defaults.items():
+            # for each item in the default configuration
+            setattr(self, k, kwargs.get(k,v))
+            # try to get and use a keyword argument, else use default;
+            # set value for the attribute
+        self.rand = np.random.default_rng(self.seed)
+        self.position = 0
+        # the slot the next transition is written to
+        self.count = 0
+        # how many slots hold a transition
+        for name, dtype in self.FIELDS:
+            shape = (self.capacity, self.features) if name.endswith("states") else (self.capacity, )
+            if self.folder is None:
+                setattr(self, name, np.zeros(shape, dtype=dtype))
+            else:
+                setattr(self, name, self._open(name, shape, dtype))
+        if self.folder is not None and os.path.isfile(self._path("cursor")):
+            self.position, self.count = [ int(value) for value in np.load(self._path("cursor")) ]
+
+    def _path(self, name):
+        return os.path.join(self.folder, f"{name}.npy")
+
+    def _open(self, name, shape, dtype):
+        """
+        Memory-map one array's file in the folder, creating it if it doesn't exist.
+        """
+        path = self._path(name)
+        if not os.path.isfile(path):
+            os.makedirs(self.folder, exist_ok=True)
+            return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        array = np.lib.format.open_memmap(path, mode="r+")
+        if array.shape != shape or array.dtype != dtype:
+            raise ValueError(f"{path} holds {array.dtype} {array.shape}, not {np.dtype(dtype)} {shape}")
+        return array
+
+    @classmethod
+    def load(cls, folder, **kwargs):
+        """
+        Open a memory saved to a folder, memory-mapped, with the capacity and
+        number of features it was saved with.
+        """
+        if not os.path.isfile(os.path.join(folder, "states.npy")):
+            raise ValueError(f"{folder} does not appear to hold a saved memory.")
+        states = np.load(os.path.join(folder, "states.npy"), mmap_mode="r")
+        capacity, features = states.shape
+        del states
+        return cls(**dict(kwargs, capacity=capacity, features=features, folder=folder))
+
+    def save(self, folder=None):
+        """
+        Write the memory to a folder (by default its own), as a .npy file per
+        array plus where the ring buffer is; a memory-mapped memory saved to
+        its own folder only has to be flushed.
+        """
+        folder = self.folder if folder is None else folder
+        if folder is None:
+            raise ValueError("A folder is needed to save a memory that isn't memory-mapped")
+        os.makedirs(folder, exist_ok=True)
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            if isinstance(array, np.memmap) and folder == self.folder:
+                array.flush()
+            else:
+                np.save(os.path.join(folder, f"{name}.npy"), array)
+        np.save(os.path.join(folder, "cursor.npy"), np.array([self.position, self.count], dtype=np.int64))
+
+    def __len__(self):
+        return self.count
+
+    def push(self, state, action, reward, next_state, done):
+        """
+        Write one transition over the oldest one, in O(1).
+        """
+        slot = self.position
+        self.states[slot] = state
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.next_states[slot] = next_state
+        self.dones[slot] = done
+        self.position = (slot+1)%self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        return slot
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        """
+        Write many transitions at once, e.g. the columns of an exported shard
+        (see interfaces.export); only the last 'capacity' of them are kept.
+        Returns the slots they were written to.
+        """
+        total = len(actions)
+        start = max(total-self.capacity, 0)
+        slots = (self.position+np.arange(start, total))%self.capacity
+        # the same slots pushing them one by one would leave them in
+        self.states[slots] = states[start:]
+        self.actions[slots] = actions[start:]
+        self.rewards[slots] = rewards[start:]
+        self.next_states[slots] = next_states[start:]
+        self.dones[slots] = dones[start:]
+        self.position = int(self.position+total)%self.capacity
+        self.count = min(self.count+total-start, self.capacity)
+        return slots
+
+    def sample_indices(self, batch_size):
+        """
+        Pick 'batch_size' different transitions uniformly, or every
+        transition if there aren't more than that.
+        """
+        if batch_size >= self.count:
+            return np.arange(self.count)
+        return self.rand.choice(self.count, batch_size, replace=False)
+
+    def batch(self, indices):
+        """
+        Gather the transitions at some indices into a Batch of new arrays.
+        """
+        return Batch(
+                self.states[indices],
+                self.actions[indices],
+                self.rewards[indices],
+                self.next_states[indices],
+                self.dones[indices],
+                indices,
+            )
+
+    def sample(self, batch_size):
+        """
+        A Batch of 'batch_size' transitions picked uniformly.
+        """
+        return self.batch(self.sample_indices(batch_size))
+
+    def update_priorities(self, indices, errors):
+        """
+        Uniform memories pick every transition as often, whatever its TD error.
+        """
+        return
+
+
+class SumTree(object):
+    """
+    Priorities in the leaves of a binary tree whose every node holds the sum
+    of its two children, so both changing a priority and finding the leaf a
+    running total falls in take O(log n).
+    """
+    def __init__(self, capacity):
+        super(SumTree, self).__init__()
+        self.capacity = capacity
+        self.leaves = max(1 << (capacity-1).bit_length(), 2)
+        # a power of two, so every leaf is as deep
+        self.tree = np.zeros(2*self.leaves, dtype=np.float64)
+        # node 1 is the root, node i's children are 2i and 2i+1, and
+        # the priority of slot j is in node leaves+j
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def __getitem__(self, indices):
+        return self.tree[self.leaves+np.asarray(indices)]
+
+    def set(self, index, priority):
+        """
+        Change one priority.
+        """
+        node = self.leaves+index
+        self.tree[node] = priority
+        node //= 2
+        while node:
+            self.tree[node] = self.tree[2*node]+self.tree[2*node+1]
+            node //= 2
+
+    def update(self, indices, priorities):
+        """
+        Change many priorities at once, refreshing each level's sums in one go.
+        """
+        nodes = self.leaves+np.asarray(indices, dtype=np.int64)
+        self.tree[nodes] = priorities
+        while nodes[0] > 1:
+            nodes = np.unique(nodes//2)
+            self.tree[nodes] = self.tree[2*nodes]+self.tree[2*nodes+1]
+
+    def find(self, values):
+        """
+        The slot each running total falls in, counting leaves from the left;
+        leaves with no priority are never picked.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = 2*nodes
+            right = (values >= self.tree[left]) & (self.tree[left+1] > 0)
+            values = np.where(right, values-self.tree[left], values)
+            nodes = np.where(right, left+1, left)
+        return nodes-self.leaves
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """
+    A ReplayMemory that picks transitions in proportion to their last TD
+    error, kept in a SumTree, rather than uniformly. New transitions get the
+    highest priority seen so far, so each is trained on at least once, and
+    every Batch has importance-sampling weights that undo the bias.
+    """
+    defaults = dict(ReplayMemory.defaults)
+    defaults.update({
+        "alpha": 0.6,
+        # how much priorities count; 0 picks uniformly
+        "beta": 0.4,
+        # how much the weights make up for prioritizing; 1 makes up for all of it
+        "epsilon": 1e-3,
+        # added to every TD error, so any transition can be picked
+    })
+    def __init__(self, *args, **kwargs):
+        super(PrioritizedReplayMemory, self).__init__(*args, **kwargs)
+        self.tree = SumTree(self.capacity)
+        self.max_priority = 1.0
+        if self.folder is not None and os.path.isfile(self._path("priorities")):
+            priorities = np.load(self._path("priorities"))
+            self.tree.update(np.arange(self.capacity), priorities)
+            self.max_priority = max(float(priorities.max()), self.max_priority)
+        elif self.count:
+            # saved by a uniform ReplayMemory, so every transition starts out as likely
+            self.tree.update(np.arange(self.count), self.max_priority)
+
+    def save(self, folder=None):
+        super(PrioritizedReplayMemory, self).save(folder)
+        folder = self.folder if folder is None else folder
+        np.save(os.path.join(folder, "priorities.npy"), self.tree[np.arange(self.capacity)])
+
+    def push(self, state, action, reward, next_state, done):
+        slot = super(PrioritizedReplayMemory, self).push(state, action, reward, next_state, done)
+        self.tree.set(slot, self.max_priority)
+        return slot
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        slots = super(PrioritizedReplayMemory, self).extend(states, actions, rewards, next_states, dones)
+        if len(slots):
+            self.tree.update(slots, self.max_priority)
+        return slots
+
+    def sample_indices(self, batch_size):
+        """
+        Pick up to 'batch_size' transitions in proportion to their priority,
+        one from each of as many equal stretches of the total; a transition
+        can be picked more than once.
+        """
+        size = min(batch_size, self.count)
+        if size == 0:
+            return np.arange(0)
+        values = (np.arange(size)+self.rand.random(size))*(self.tree.total/size)
+        return np.minimum(self.tree.find(values), self.count-1)
+
+    def batch(self, indices):
+        batch = super(PrioritizedReplayMemory, self).batch(indices)
+        if len(indices) == 0:
+            return batch
+        weights = (self.count*self.tree[indices]/self.tree.total)**-self.beta
+        return batch._replace(weights=(weights/weights.max()).astype(np.float32))
+
+    def update_priorities(self, indices, errors):
+        """
+        Give the transitions at some indices a priority from their new TD errors.
+        """
+        priorities = (np.abs(errors)+self.epsilon)**self.alpha
+        self.tree.update(indices, priorities)
+        self.max_priority = max(float(priorities.max()), self.max_priority)
+
+
+def td_targets(q_values, next_q_values, batch, gamma):
+    """
+    The Q-learning targets for a Batch, from the network's predictions for
+    its states and next states: each row of q_values with the taken action's
+    value replaced by reward + gamma * the best next value (just the reward
+    once the game is over). Returns the targets and each transition's TD error.
+    """
+    rows = np.arange(len(batch.actions))
+    best = np.max(next_q_values, axis=1)
+    expected = batch.rewards+gamma*best*~batch.dones
+    targets = np.array(q_values, dtype=np.float32)
+    errors = expected-targets[rows, batch.actions]
+    targets[rows, batch.actions] = expected
+    return targets, errors
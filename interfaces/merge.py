@@ -0,0 +1,145 @@
+import os
+import argparse
+import sqlite3
+from collections import OrderedDict
+from interfaces.scribe import SCHEMA_VERSION, ID_BLOCK
+from interfaces.migrate import SCHEMA, TABLES, schema_version, columns
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for merge.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+DEDUPLICATED = ["agents", "game_settings", "commands", "fruits", "obstacles", "players", "games"]
+# tables whose rows are the same in every shard that records the same thing;
+# a row is only added when the database has no row with the same values,
+# every other row is added with its id moved into blocks of ids of its own
+
+
+def merge_shard(connection, shard):
+    """
+    Add every row of one shard to the database a connection is open to,
+    in a single transaction. Returns a dict mapping each table to how many
+    rows were added.
+    """
+    if schema_version(shard) < SCHEMA_VERSION:
+        raise ValueError(f"{shard} is keyed by UUIDs, migrate it first (see interfaces.migrate)")
+    counts = OrderedDict()
+    connection.execute("ATTACH DATABASE ? AS shard", (shard, ))
+    try:
+        connection.execute("BEGIN")
+        merged = connection.execute("""SELECT COUNT(*) FROM shard.game_instances INNER JOIN main.game_instances
+            ON shard.game_instances.uuid=main.game_instances.uuid""").fetchone()[0]
+        if merged:
+            raise ValueError(f"{merged} games of {shard} are already in the database")
+        blocks = connection.execute("SELECT COALESCE(MAX(id), 0) FROM shard.id_blocks").fetchone()[0]
+        first = None
+        for _ in range(blocks+1):
+            cursor = connection.execute("INSERT INTO main.id_blocks DEFAULT VALUES")
+            first = first if first is not None else cursor.lastrowid
+        # the shard's blocks of ids are moved to as many new blocks, with one more
+        # block for the ids of its fixtures, so no two shards' ids collide
+        moved = f"(CASE WHEN {{0}} >= {ID_BLOCK} THEN {{0}}+{(first-1)*ID_BLOCK} ELSE {{0}}+{(first+blocks)*ID_BLOCK} END)"
+        for table, references in TABLES.items():
+            names = [ name for name in columns(connection, table, "shard") if name in columns(connection, table) ]
+            values, joins = [], []
+            for name in names:
+                if name == "id":
+                    values += [moved.format('t."id"')]
+                elif references.get(name) in DEDUPLICATED:
+                    values += [f'"ref_{name}"."new"']
+                    joins += [f'LEFT JOIN "ids_{references[name]}" AS "ref_{name}" ON "ref_{name}"."old"=t."{name}"']
+                elif name in references:
+                    values += [moved.format(f't."{name}"')]
+                else:
+                    values += [f't."{name}"']
+            select = f'SELECT {", ".join(values)} FROM shard."{table}" AS t {" ".join(joins)}'
+            if table not in DEDUPLICATED:
+                cursor = connection.execute(f'''INSERT INTO main."{table}" ({", ".join(names)})
+                    {select} ORDER BY t.rowid''')
+                counts[table] = cursor.rowcount
+                continue
+            keys = [ name for name in names if name != "id" ]
+            same = " AND ".join([ f'm."{name}" IS src."{name}"' for name in keys ])
+            connection.execute('DROP TABLE IF EXISTS temp."src"')
+            aliased = [ f'{value} AS "{name}"' for name, value in zip(names, values) if name != "id" ]
+            connection.execute(f'''CREATE TEMP TABLE "src" AS SELECT t."id" AS "old", {", ".join(aliased)}
+                FROM shard."{table}" AS t {" ".join(joins)}''')
+            # the shard's rows, referring to the rows they were merged into
+            cursor = connection.execute(f'''INSERT INTO main."{table}" ({", ".join(names)})
+                SELECT {moved.format('MIN(src."old")')}, {", ".join([ f'src."{name}"' for name in keys ])}
+                FROM src WHERE NOT EXISTS (SELECT 1 FROM main."{table}" AS m WHERE {same})
+                GROUP BY {", ".join([ f'src."{name}"' for name in keys ])}''')
+            counts[table] = cursor.rowcount
+            connection.execute(f'DROP TABLE IF EXISTS temp."ids_{table}"')
+            connection.execute(f'CREATE TEMP TABLE "ids_{table}" ("old" INTEGER PRIMARY KEY, "new" INTEGER)')
+            connection.execute(f'''INSERT INTO "ids_{table}" ("old", "new")
+                SELECT src."old", (SELECT MIN(m."id") FROM main."{table}" AS m WHERE {same}) FROM src''')
+            connection.execute('DROP TABLE temp."src"')
+        connection.execute("COMMIT")
+    except Exception as err:
+        connection.execute("ROLLBACK")
+        raise err
+    finally:
+        for table in DEDUPLICATED:
+            connection.execute(f'DROP TABLE IF EXISTS temp."ids_{table}"')
+        connection.execute("DETACH DATABASE shard")
+    return counts
+
+
+def merge(destination, shards, schema=SCHEMA):
+    """
+    Fold shards recorded by parallel workers (see scribe.shard_path) into
+    one database, created with the current schema if it doesn't exist.
+    Ids are moved into blocks of their own; settings, players, agents,
+    games, fruit species, obstacles and commands that are already in the
+    database are reused. A shard whose games were already merged is refused.
+    Returns a dict mapping each table to how many rows were added.
+    """
+    if not os.path.exists(destination):
+        with open(schema, "r") as f:
+            connection = sqlite3.connect(destination)
+            connection.executescript(f.read())
+            connection.close()
+    elif schema_version(destination) < SCHEMA_VERSION:
+        raise ValueError(f"{destination} is keyed by UUIDs, migrate it first (see interfaces.migrate)")
+    totals = OrderedDict()
+    connection = sqlite3.connect(destination, isolation_level=None)
+    # transactions are begun and committed explicitly, one per shard
+    try:
+        for shard in shards:
+            if not os.path.isfile(shard):
+                raise ValueError(f"{shard} does not appear to be a proper path to a file.")
+            for table, count in merge_shard(connection, shard).items():
+                totals[table] = totals.get(table, 0)+count
+            info(f"Merged {shard} into {destination}")
+    finally:
+        connection.close()
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fold databases recorded by parallel workers into one database.")
+    parser.add_argument("destination", help="the database to merge into, created if it doesn't exist")
+    parser.add_argument("shards", nargs="+", help="the databases to merge, they are left unchanged")
+    parser.add_argument("--schema", default=SCHEMA, help="the schema to create the destination with")
+    args = parser.parse_args()
+    for table, count in merge(args.destination, args.shards, args.schema).items():
+        print(f"{table}: {count}")
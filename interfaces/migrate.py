@@ -0,0 +1,223 @@
+import os
+import re
+import argparse
+import sqlite3
+from collections import OrderedDict
+from interfaces.scribe import SCHEMA_VERSION
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for migrate.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SCHEMA_data.sql")
+# the current schema
+
+TABLES = OrderedDict([
+        ("game_settings", {}),
+        ("agents", {}),
+        ("players", {"agent": "agents"}),
+        ("games", {"settings": "game_settings", "player": "players"}),
+        ("game_instances", {"game": "games"}),
+        ("commands", {}),
+        ("commands_executed", {"game": "game_instances"}),
+        ("fruits", {}),
+        ("obstacles", {}),
+        ("segments", {}),
+        ("fruit_instances", {"species": "fruits"}),
+        ("states", {"game": "game_instances"}),
+        ("states_fruits", {"fruit": "fruit_instances", "state": "states"}),
+        ("states_obstacles", {"obstacle": "obstacles", "state": "states"}),
+        ("states_snakes", {"state": "states"}),
+        ("snake_body_parts", {"snake": "states_snakes", "segment": "segments"}),
+        ("snake_keyframes", {"state": "states"}),
+        ("snake_deltas", {"state": "states"}),
+        ("fruit_deltas", {"state": "states", "species": "fruits"}),
+    ])
+# every table that's copied, mapping the columns that refer to another
+# table's id to that table; a table comes after every table it refers to
+
+WRITTEN_AT = ["commands_executed", "states"]
+# tables whose timestamps tell when each of a game's rows was written, in the order
+# a command and the state it led to are written; the rows of tables that refer to
+# them were written right after the row they refer to
+
+
+def schema_version(database):
+    """
+    The version of the schema a database was created with (its PRAGMA user_version).
+    """
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def columns(connection, table, schema="main"):
+    """
+    The names of a table's columns, or an empty list if there is no such table.
+    """
+    return [ row[1] for row in connection.execute(f'PRAGMA {schema}.table_info("{table}")').fetchall() ]
+
+
+def indexes(schema=SCHEMA):
+    """
+    The CREATE INDEX statements in a schema.
+    """
+    with open(schema, "r") as f:
+        return re.findall(r'CREATE INDEX[^;]*;', f.read())
+
+
+def add_indexes(database, schema=SCHEMA):
+    """
+    Create the indexes of a schema that a database doesn't have yet, e.g. a
+    database created before they were added. Indexes on tables the database
+    doesn't have are left out. Returns the names of the indexes created.
+    """
+    if not os.path.isfile(database):
+        raise ValueError(f"{database} does not appear to be a proper path to a file.")
+    created = []
+    connection = sqlite3.connect(database)
+    try:
+        existing = [ row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='index'") ]
+        for statement in indexes(schema):
+            name, table = re.match(r'CREATE INDEX IF NOT EXISTS "(\w+)" ON "(\w+)"', statement).groups()
+            if name in existing or not columns(connection, table):
+                continue
+            connection.execute(statement)
+            created += [name]
+            info(f"Created index {name} on {table}")
+        connection.execute("ANALYZE")
+        # let the planner know how selective each new index is
+        connection.commit()
+    finally:
+        connection.close()
+    return created
+
+
+def migrate(source, destination, schema=SCHEMA):
+    """
+    Copy every row of a database keyed by UUIDs into a new database created
+    with the current schema. Rows are numbered from 1 in the order they were
+    written, across every table (see WRITTEN_AT), and every column referring
+    to another table is rewritten to the new numbers; a game instance keeps
+    its UUID in 'uuid'.
+    Rows referring to a row that doesn't exist are left behind.
+    Returns a dict mapping each table to how many rows were copied.
+    """
+    if not os.path.isfile(source):
+        raise ValueError(f"{source} does not appear to be a proper path to a file.")
+    if os.path.exists(destination):
+        raise FileExistsError(f"{destination} already exists, it won't be overwritten")
+    if schema_version(source) >= SCHEMA_VERSION:
+        raise ValueError(f"{source} is already at schema version {schema_version(source)}")
+    counts = OrderedDict()
+    connection = sqlite3.connect(destination)
+    try:
+        with open(schema, "r") as f:
+            connection.executescript(f.read())
+        connection.execute("ATTACH DATABASE ? AS old", (source, ))
+        copied = [ (order, table, references) for order, (table, references) in enumerate(TABLES.items())
+            if columns(connection, table, "old") and columns(connection, table) ]
+        # tables from a later version, or that were dropped, are left out
+        connection.execute('''CREATE TEMP TABLE "written" ("table" TEXT, "old" TEXT, "time" TEXT,
+            "kind" INTEGER, "order" INTEGER, "rowid" INTEGER, PRIMARY KEY ("table", "old"))''')
+        # when each row was written, as near as it can be told; ids are compared as text, since
+        # the same UUID (or fixture's number) can be stored as text in one table and as an integer in another
+        timed = []
+        for order, table, references in copied:
+            parents = [ (name, target) for name, target in references.items() if target in timed ]
+            if table in WRITTEN_AT:
+                time = 'MAX(t."timestamp") OVER (PARTITION BY t."game" ORDER BY t.rowid)'
+                # a clock set back can't put rows out of the order they were inserted in
+                kind = WRITTEN_AT.index(table)
+            elif parents:
+                name, target = parents[0]
+                time = f'''(SELECT w."time" FROM "written" AS w
+                    WHERE w."table"='{target}' AND w."old"=CAST(t."{name}" AS TEXT))'''
+                kind = len(WRITTEN_AT)
+                # right after the row it belongs to
+            else:
+                time, kind = "NULL", 0
+            connection.execute(f'''INSERT INTO "written" ("table", "old", "time", "kind", "order", "rowid")
+                SELECT '{table}', CAST(t."id" AS TEXT), {time}, {kind}, {order}, t.rowid FROM old."{table}" AS t''')
+            if time != "NULL":
+                timed += [table]
+        connection.execute('''CREATE TEMP TABLE "ids" AS SELECT "table", "old",
+            ROW_NUMBER() OVER (ORDER BY "time", "kind", "order", "rowid") AS "new" FROM "written"''')
+        # every table's ids come from one counter, so they grow in the order rows were written,
+        # as the Scribe's do; rows that aren't part of a game come first
+        for order, table, references in copied:
+            old_columns = columns(connection, table, "old")
+            new_columns = columns(connection, table)
+            connection.execute(f'CREATE TEMP TABLE "ids_{table}" ("old" TEXT PRIMARY KEY, "new" INTEGER)')
+            connection.execute(f"""INSERT INTO "ids_{table}" ("old", "new")
+                SELECT "old", "new" FROM "ids" WHERE "table"='{table}'""")
+            names, values, joins, found = [], [], [], []
+            for name in new_columns:
+                if name not in old_columns:
+                    continue
+                names += [f'"{name}"']
+                if name == "id":
+                    values += ['ids."new"']
+                elif name in references:
+                    values += [f'"ref_{name}"."new"']
+                    joins += [f'LEFT JOIN "ids_{references[name]}" AS "ref_{name}" ON "ref_{name}"."old"=CAST(t."{name}" AS TEXT)']
+                    found += [f'(t."{name}" IS NULL OR "ref_{name}"."new" IS NOT NULL)']
+                else:
+                    values += [f't."{name}"']
+            if table == "game_instances" and "uuid" in new_columns and "uuid" not in old_columns:
+                names += ['"uuid"']
+                values += ['CAST(t."id" AS TEXT)']
+            cursor = connection.execute(f'''INSERT INTO main."{table}" ({", ".join(names)})
+                SELECT {", ".join(values)} FROM old."{table}" AS t INNER JOIN "ids_{table}" AS ids
+                ON ids."old"=CAST(t."id" AS TEXT) {" ".join(joins)}
+                WHERE {" AND ".join(found) if found else "1"} ORDER BY t.rowid''')
+            skipped = connection.execute(f'SELECT COUNT(*) FROM old."{table}"').fetchone()[0]-cursor.rowcount
+            if skipped > 0:
+                warn(f"Skipped {skipped} rows of {table} that refer to rows that don't exist")
+            counts[table] = cursor.rowcount
+            info(f"Migrated {cursor.rowcount} rows of {table}")
+        connection.commit()
+        connection.execute("DETACH DATABASE old")
+    except Exception as err:
+        connection.close()
+        os.remove(destination)
+        raise err
+    connection.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Copy a database keyed by UUIDs into a new database with integer keys.")
+    parser.add_argument("source", help="the database to migrate, it is left unchanged")
+    parser.add_argument("destination", nargs="?", help="where to create the migrated database")
+    parser.add_argument("--schema", default=SCHEMA, help="the schema to create the new database with")
+    parser.add_argument("--indexes", action="store_true", help="only add the schema's missing indexes to the source")
+    args = parser.parse_args()
+    if args.indexes:
+        for name in add_indexes(args.source, args.schema):
+            print(f"created {name}")
+    elif args.destination is None:
+        parser.error("a destination is needed to migrate a database")
+    else:
+        for table, count in migrate(args.source, args.destination, args.schema).items():
+            print(f"{table}: {count}")
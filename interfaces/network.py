@@ -0,0 +1,119 @@
+import numpy as np
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for network.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+def relu(values):
+    return np.maximum(values, 0, out=values)
+
+def softmax(values):
+    values -= values.max(axis=-1, keepdims=True)
+    # keeps exp from overflowing, without changing the result
+    np.exp(values, out=values)
+    values /= values.sum(axis=-1, keepdims=True)
+    return values
+
+def linear(values):
+    return values
+
+ACTIVATIONS = {
+        "relu": relu,
+        "softmax": softmax,
+        "linear": linear,
+        "tanh": lambda values: np.tanh(values, out=values),
+        "sigmoid": lambda values: np.divide(1, 1+np.exp(-values), out=values),
+    }
+# the activations a Dense layer can use, applied in place
+
+
+class DenseNetwork(object):
+    """
+    A stack of Dense layers evaluated with NumPy, for picking moves without
+    the fixed cost of a Keras predict call. Dropout only matters while
+    training, so it is left out.
+    """
+    def __init__(self, layers):
+        super(DenseNetwork, self).__init__()
+        self.layers = []
+        # a (weights, biases, activation name) tuple per layer
+        for weights, biases, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Expected one of {list(ACTIVATIONS)} for an activation, not {activation}")
+            self.layers += [(np.asarray(weights, dtype=np.float32), np.asarray(biases, dtype=np.float32), activation)]
+
+    @classmethod
+    def from_keras(cls, model):
+        """
+        Copy the weights of every Dense layer of a Keras model, such as the
+        one DQN.construct_network builds.
+        """
+        layers = []
+        for layer in model.layers:
+            weights = layer.get_weights()
+            if not weights:
+                # e.g. Dropout
+                continue
+            layers += [(weights[0], weights[1], layer.get_config().get("activation", "linear"))]
+        return cls(layers)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a network written by save().
+        """
+        with np.load(path) as arrays:
+            count = len([ name for name in arrays.files if name.startswith("weights_") ])
+            return cls([ (arrays[f"weights_{idx}"], arrays[f"biases_{idx}"], str(arrays[f"activation_{idx}"]))
+                for idx in range(count) ])
+
+    def save(self, path):
+        """
+        Write every layer to one .npz file.
+        """
+        arrays = {}
+        for idx, (weights, biases, activation) in enumerate(self.layers):
+            arrays[f"weights_{idx}"] = weights
+            arrays[f"biases_{idx}"] = biases
+            arrays[f"activation_{idx}"] = np.array(activation)
+        np.savez(path, **arrays)
+
+    @property
+    def inputs(self):
+        return self.layers[0][0].shape[0]
+
+    @property
+    def outputs(self):
+        return self.layers[-1][0].shape[1]
+
+    def __call__(self, states):
+        """
+        The network's outputs for a (batch, inputs) array of states, or for one state.
+        """
+        values = np.asarray(states, dtype=np.float32)
+        single = values.ndim == 1
+        if single:
+            values = values[np.newaxis]
+        for weights, biases, activation in self.layers:
+            values = values @ weights
+            values += biases
+            values = ACTIVATIONS[activation](values)
+        return values[0] if single else values
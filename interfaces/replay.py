@@ -0,0 +1,108 @@
+from interfaces.game import SnakeGame, default_fruits
+from interfaces.scribe import Scribe
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for replay.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+class Replay(object):
+    """
+    Rebuild a recorded game tick by tick, from the seed and settings it was
+    played with and the commands it executed; the recorded states are never read.
+    Each tick executes one recorded command in a headless game that isn't recorded.
+    """
+    def __init__(self, scribe, game_id, fruits=None):
+        super(Replay, self).__init__()
+        if not isinstance(scribe, Scribe):
+            scribe = Scribe(scribe)
+            # accept a path to a database, or a SQLiteInterface
+        record = scribe.get_replay(game_id)
+        self.game_id = game_id
+        self.settings = record["settings"]
+        self.seed = record["seed"]
+        self.commands = record["commands"]
+        self.fruits = fruits if fruits is not None else default_fruits()
+        # fruit are not recorded with the game; they must match the ones it was played with
+        if self.seed is None:
+            raise ValueError(f"Game instance '{game_id}' was recorded without a seed, and can't be replayed")
+        if self.settings["auto_tick"]:
+            warn("Games with auto_tick roll for fruit between moves without recording a command; "
+                "unless it was played headless, the replay can diverge")
+        self.rewind()
+
+    def rewind(self):
+        """
+        Start the game over, before its first command.
+        """
+        self.game = SnakeGame(
+                **self.settings,
+                seed=self.seed,
+                fruits=self.fruits,
+                headless=True,
+                database=None,
+            )
+        self.tick = 0
+
+    def advance(self):
+        """
+        Execute the next recorded command, and return the game.
+        """
+        if self.tick >= len(self.commands):
+            raise IndexError(f"The game only executed {len(self.commands)} commands")
+        cmd = self.commands[self.tick]
+        if cmd not in [4,5,6]:
+            # the game must have been playing to execute anything but pause/restart/quit;
+            # playing can be set without a command being recorded
+            self.game.playing = True
+        self.game.next_cmd = cmd
+        self.game.update()
+        self.tick += 1
+        return self.game
+
+    def seek(self, tick):
+        """
+        Return the game after 'tick' commands have been executed;
+        seeking backwards replays the game from the start.
+        """
+        if tick < 0 or tick > len(self.commands):
+            raise IndexError(f"Tick {tick} is out of range, the game only executed {len(self.commands)} commands")
+        if tick < self.tick:
+            self.rewind()
+        while self.tick < tick:
+            self.advance()
+        return self.game
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __iter__(self):
+        """
+        Yield the game after each command, from the start of the game.
+        """
+        self.rewind()
+        while self.tick < len(self.commands):
+            yield self.advance()
+
+    def __str__(self):
+        return f"Replay({self.game_id}@{self.tick}/{len(self.commands)})"
+
+    def __repr__(self):
+        return str(self)
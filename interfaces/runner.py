@@ -0,0 +1,132 @@
+import os
+import random
+import multiprocessing
+from interfaces.game import SnakeGame
+from interfaces.scribe import get_timestamp, shard_path, open_shard
+from interfaces.merge import merge as merge_shards
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for runner.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+def default_settings():
+    """
+    The settings each self-play game is created with, when none are given.
+    """
+    return {
+        "height": 160,
+        "width": 160,
+        "size": 10,
+        "snake_speed": 10,
+        "auto_tick": False,
+        "frames": 10,
+        "testing": False,
+        "headless": True,
+        # self-play games are stepped as fast as possible, without a window
+        "cell_body": True,
+        # long snakes move as quickly as short ones
+        "record_batch": 100,
+        # write the recorded rows of every 100 updates in one transaction
+        "database_profile": "bulk",
+        # a worker's database can be played again from its seeds,
+        # so it's written without waiting for the disk
+    }
+
+
+def random_policy(game, rand):
+    """
+    Mostly keep going straight, sometimes turn left or right.
+    """
+    heading = game.snake.heading
+    return rand.choice([heading, heading, heading, (heading+1)%4, (heading+3)%4])
+
+
+def summarize(game, steps):
+    """
+    The per-game numbers gathered back to the parent process.
+    """
+    return {
+        "seed": game.seed,
+        "score": game.score,
+        "length": getattr(game, "_last_length", game.starting_length),
+        # the snake's length before the move that ended the game
+        "fruit_count": game.fruit_count,
+        "alive_bonus": game.alive_bonus,
+        "steps": steps,
+    }
+
+
+def play_games(worker, seeds, settings, database, policy, max_steps):
+    """
+    Play one headless game per seed, one after another, recording to the
+    worker's own database. Return a summary of each game.
+    """
+    db = open_shard(database, worker, profile=settings.get("database_profile", "default"))
+    results = []
+    for seed in seeds:
+        game = SnakeGame(**dict(settings, seed=seed, database=db))
+        rand = random.Random(seed)
+        # the policy gets its own generator, so it doesn't disturb the game's
+        steps = 0
+        while not game.game_over and steps < max_steps:
+            game.step(policy(game, rand))
+            steps += 1
+        if game.scribe.get_game_instance:
+            # the game was cut off by max_steps, while the snake was still alive
+            game.scribe.record_game_end(get_timestamp())
+        summary = summarize(game, steps)
+        summary["worker"] = worker
+        results += [summary]
+        game.scribe.close()
+        # release the scribe's connection before the next game opens one
+    return results
+
+
+def run_games(games=8, processes=None, seed=0, settings=None, database="data.db", policy=random_policy, max_steps=1000,
+        merge=False):
+    """
+    Play 'games' headless games of Snake across a pool of 'processes' workers
+    (one per core by default). Game i is played with seed+i, so the results
+    don't depend on how many workers there are. Return a summary of each game,
+    in the order of their seeds. Each worker records to its own shard of
+    'database'; with 'merge', the shards are folded into 'database' and removed.
+    """
+    if settings is None:
+        settings = default_settings()
+    settings = dict(settings, headless=True)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, games))
+    jobs = [
+            (worker, list(range(seed+worker, seed+games, processes)), settings, database, policy, max_steps)
+            for worker in range(processes)
+        ]
+    # deal the seeds out to the workers like cards
+    info(f"Playing {games} games across {processes} processes")
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(play_games, jobs)
+    results = [summary for worker_results in results for summary in worker_results]
+    if merge:
+        shards = [ shard_path(database, worker) for worker in range(processes) ]
+        merge_shards(database, shards)
+        for shard in shards:
+            os.remove(shard)
+    return list(sorted(results, key=lambda summary: summary["seed"]))
@@ -1,4 +1,5 @@
 import os
+import re
 import argparse
 import datetime
 import time
@@ -8,7 +9,14 @@ import threading
 import uuid
 import traceback
 import sys
+import queue
+import copy
+import functools
+from array import array
+import numpy as np
+from collections import OrderedDict, deque
 from objects.snake import Snake
+from objects.cell_snake import CellSnake
 from objects.segment import Segment
 from objects.obstacle import Obstacle
 from objects.fruit import Fruit
@@ -33,12 +41,174 @@ except Exception as err:
 # def get_timestamp(form="%Y-%m-%d %H:%M:%S.%f"):
 #     return datetime.datetime.now().strftime(form)
 
+SCHEMA_VERSION = 2
+# databases at this version (PRAGMA user_version) are keyed by integers;
+# older databases are keyed by UUIDs
+
+ID_BLOCK = 1 << 32
+# how many ids are in each block of id_blocks (see Scribe.new_id)
+
+ID_TYPES = (uuid.UUID, int)
+# what a row's id can be, depending on the version of the database
+
+SPAWNED_LATER = """ AND NOT EXISTS (SELECT 1 FROM commands_executed WHERE commands_executed.game=states.game
+            AND commands_executed.id>states.id AND commands_executed.id<states_fruits.id)"""
+# a fruit spawned during the next update is also recorded against the state
+# before it (see SnakeGame.spawn_next_fruit), after the next command; only
+# ids that grow in the order rows are written can tell them apart
+
+READ_QUERIES = {
+    "game_id": "SELECT id FROM game_instances WHERE uuid=?",
+    "settings": """SELECT game_settings.height, game_settings.width, game_settings.size,
+            game_settings.snake_speed, game_settings.frames, game_settings.reward_limit,
+            game_settings.auto_tick, game_settings.starting_length, game_instances.seed
+        FROM ((game_instances INNER JOIN games
+                ON game_instances.game=games.id
+            ) INNER JOIN game_settings
+            ON games.settings=game_settings.id
+        ) WHERE game_instances.id=?""",
+    "commands": "SELECT id, command FROM commands_executed WHERE game=? ORDER BY rowid",
+    # rows are inserted as commands are executed, so rowid keeps them in order;
+    # timestamps can collide when a game is stepped faster than the clock ticks
+    "fruit_deltas": """SELECT fruit_deltas.state, fruit_deltas.x, fruit_deltas.y, fruit_deltas.species, fruits.name, fruit_deltas.added
+        FROM ((fruit_deltas INNER JOIN states
+                ON fruit_deltas.state=states.id
+            ) INNER JOIN fruits
+            ON fruit_deltas.species=fruits.id
+        ) WHERE states.game=? AND states.rowid>? AND states.rowid<=?
+        ORDER BY states.rowid, fruit_deltas.rowid""",
+    # ordered the way both indexes are read, so the rows are never sorted
+    "states": """SELECT states.rowid, states.id, states.score,
+            snake_keyframes.heading, snake_keyframes.belly, snake_keyframes.cells,
+            snake_deltas.heading, snake_deltas.belly, snake_deltas.heads, snake_deltas.retract
+        FROM ((states LEFT JOIN snake_keyframes
+                ON snake_keyframes.state=states.id
+            ) LEFT JOIN snake_deltas
+            ON snake_deltas.state=states.id
+        ) WHERE states.game=? AND states.rowid>? ORDER BY states.rowid LIMIT ?""",
+    # a page of states after a rowid; the rest of the queries read what
+    # was recorded with the states between two rowids
+    "snakes": """SELECT states_snakes.state, states_snakes.belly, states_snakes.length,
+            segments.x, segments.y, segments.w, segments.h, segments.heading
+        FROM (((states INNER JOIN states_snakes
+                    ON states_snakes.state=states.id
+                ) INNER JOIN snake_body_parts
+                ON snake_body_parts.snake=states_snakes.id
+            ) INNER JOIN segments
+            ON snake_body_parts.segment=segments.id
+        ) WHERE states.game=? AND states.rowid>? AND states.rowid<=?
+        ORDER BY states.rowid, snake_body_parts.body_index""",
+    "fruit_states": """SELECT states_fruits.state, fruit_instances.x, fruit_instances.y, fruit_instances.species, fruits.name
+        FROM (((states INNER JOIN states_fruits
+                    ON states_fruits.state=states.id
+                ) INNER JOIN fruit_instances
+                ON states_fruits.fruit=fruit_instances.id
+            ) INNER JOIN fruits
+            ON fruit_instances.species=fruits.id
+        ) WHERE states.game=? AND states.rowid>? AND states.rowid<=?"""+SPAWNED_LATER+"""
+        ORDER BY states.rowid, states_fruits.rowid""",
+}
+# the queries the Scribe reads a game back with, each takes the game's id first;
+# see Scribe.read_query and Scribe.full_scans
+
+def rows_array(rows, width, dtype=np.int64):
+    """
+    A 2D array from a list of rows with 'width' columns each, even when there are no rows.
+    """
+    return np.array(rows, dtype=dtype).reshape(len(rows), width)
+
+def full_scans(plan):
+    """
+    The steps of an EXPLAIN QUERY PLAN that read every row of a table,
+    instead of searching an index for the rows they need. A search on a
+    range of rowids counts too: it reads every row in the range, those
+    of every other game included, and checks each one.
+    """
+    return [ detail for detail in plan if detail.startswith("SCAN")
+        or re.search(r"^SEARCH .* USING INTEGER PRIMARY KEY \(rowid[<>]", detail) ]
+
 def get_uuid():
     return uuid.uuid4()
 
 def get_timestamp():
     return datetime.datetime.now()
 
+def snake_cells(snake):
+    """
+    The top left point of each virtual pixel a Snake occupies, from the head to the tail.
+    """
+    if isinstance(snake, CellSnake):
+        return tuple(snake.cells)
+    return tuple([ cell for seg in snake.segments for cell in CellSnake._segment_cells(seg) ])
+
+def segments_cells(segments):
+    """
+    The top left point of each virtual pixel in an array of segments, one
+    x, y, w, h, heading row each, from each segment's head to its tail like
+    CellSnake._segment_cells; and how many virtual pixels are in each segment.
+    """
+    x, y, w, h, heading = segments.T
+    size = np.minimum(w, h)
+    vertical = heading%2 == 0
+    counts = -(-np.where(vertical, h, w)//size)
+    owner = np.repeat(np.arange(len(segments)), counts)
+    step = np.arange(counts.sum())-np.repeat(np.cumsum(counts)-counts, counts)
+    step = np.where(np.isin(heading, [1, 2])[owner], counts[owner]-1-step, step)*size[owner]
+    # headed east or south, the head is the right or bottom most virtual pixel
+    cells = np.stack([
+            x[owner]+np.where(vertical[owner], 0, step),
+            y[owner]+np.where(vertical[owner], step, 0),
+        ], axis=1)
+    return cells.astype(np.int32), counts
+
+def reverse_slices(starts, ends):
+    """
+    The indices that gather each slice [start, end) of an array, each slice
+    reversed, one slice after another.
+    """
+    lengths = ends-starts
+    return np.repeat(ends-1, lengths)-(np.arange(lengths.sum())-np.repeat(np.cumsum(lengths)-lengths, lengths))
+
+def unpack_blobs(blobs):
+    """
+    The x,y points of many BLOBs made by pack_cells, as one (points, 2) array
+    in the order of the BLOBs, and how many points are in each BLOB.
+    """
+    counts = np.array([ len(blob)//8 for blob in blobs ], dtype=np.int64)
+    cells = np.frombuffer(b"".join(blobs), dtype="<i4").reshape(-1, 2).astype(np.int32)
+    return cells, counts
+
+def pack_cells(cells):
+    """
+    From a sequence of x,y points to a BLOB of little endian 32 bit integers.
+    """
+    values = array("i", [ v for cell in cells for v in cell ])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def unpack_cells(blob):
+    """
+    From a BLOB made by pack_cells to a list of x,y tuples.
+    """
+    values = array("i")
+    values.frombytes(blob)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return list(zip(values[0::2], values[1::2]))
+
+def cell_delta(before, after, limit=4):
+    """
+    How the cells of a snake changed between two states: the cells added in
+    front of the head (at most 'limit' of them), and how many were retracted
+    from the tail. Returns (None, None) when the change isn't a move.
+    """
+    for added in range(0, min(limit, len(after))+1):
+        kept = len(after)-added
+        if kept <= len(before) and after[added:] == before[:kept]:
+            return after[:added], len(before)-kept
+    return None, None
+
 def row_factories(*args):
     """
     Function to wrap all factory functions, and add a parser to 
@@ -110,12 +280,89 @@ def file_path(f,suppress=False):
         raise ValueError("{} does not appear to be a proper path to a file.".format(f))
     return f
 
+SQLITE_PROFILES = {
+    "default": {},
+    # sqlite's own settings
+    "recording": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32768,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "cached_statements": 512,
+    },
+    # games keep writing while others read, e.g. the HIGH_SCORES view;
+    # a crash never corrupts the database, but can lose the last transactions
+    "bulk": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "cached_statements": 1024,
+    },
+    # ingest as fast as possible; a crash can corrupt the database,
+    # so only use it for files that can be made again
+}
+# named sets of PRAGMAs applied to every connection; "cached_statements"
+# is how many compiled statements each connection keeps for reuse
+
+SQLITE_SETTINGS = ["journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "cached_statements"]
+# what a profile can set
+
+def sqlite_profile(profile):
+    """
+    Turn the name of one of the SQLITE_PROFILES, or a dict of settings
+    applied on top of the default ones, into a dict of settings.
+    """
+    if isinstance(profile, dict):
+        unknown = [ k for k in profile if k not in SQLITE_SETTINGS ]
+        if unknown:
+            raise ValueError(f"Unknown sqlite settings {unknown}, expected some of {SQLITE_SETTINGS}")
+        return dict(SQLITE_PROFILES["default"], **profile)
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Expected one of {list(SQLITE_PROFILES)} for a sqlite profile, not {profile}")
+    return dict(SQLITE_PROFILES[profile])
+
+ADDED_COLUMNS = [
+        ("game_settings", "starting_length", "INTEGER NOT NULL DEFAULT 3"),
+        ("game_instances", "seed", "INTEGER"),
+    ]
+# columns added to tables of the schema after databases were already created
+# with them; CREATE TABLE IF NOT EXISTS leaves an existing table as it was
+
+def add_columns(database):
+    """
+    Add the ADDED_COLUMNS that a database created before them doesn't have.
+    Tables the database doesn't have are left out, and databases at
+    SCHEMA_VERSION were created with every column, so aren't checked.
+    Returns a "table.column" name for each column added.
+    """
+    added = []
+    connection = sqlite3.connect(database)
+    try:
+        if connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return added
+        for table, column, definition in ADDED_COLUMNS:
+            columns = [ row[1] for row in connection.execute(f'PRAGMA table_info("{table}")').fetchall() ]
+            if not columns or column in columns:
+                continue
+            connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+            added += [f"{table}.{column}"]
+            info(f"Added the column {column} to {table} of {database}")
+        connection.commit()
+    finally:
+        connection.close()
+    return added
+
 class SQLiteInterface(object):
     """docstring for SQLiteInterface"""
     # schema = "./SCHEMA_email_data.sql"
     # fixtures = "./FIXTURES_email_data.sql"
-    def __init__(self, database, schema=None, fixtures=None, row_factory=None):
+    def __init__(self, database, schema=None, fixtures=None, row_factory=None, profile="default"):
         super(SQLiteInterface, self).__init__()
+        self.profile = sqlite_profile(profile)
+        # the PRAGMAs applied to every connection, see SQLITE_PROFILES
         # self._row_factory = getattr(row_factories,"default")
         self._sql_functions = [ ("GET_UUID", 0, get_uuid, ) ]
         self._row_factory = row_factories("dict")
@@ -222,6 +469,9 @@ class SQLiteInterface(object):
                 result = read_sql_file_into_db(self._fixtures, self.database)
                 # aux_debug(result)
                 # execute the sql commands found in the file
+        else:
+            add_columns(self._database)
+            # a database made with an older schema gets the columns added since
 
     @property
     def _schema(self):
@@ -291,13 +541,24 @@ class SQLiteInterface(object):
     def create_lock(self):
         self.lock = threading.RLock()
 
+    def connect(self, **kwargs):
+        """
+        Open a new connection to the database, with the settings of the profile;
+        kwargs are passed on to sqlite3.connect.
+        """
+        settings = dict(self.profile)
+        connection = sqlite3.connect(self.database, cached_statements=settings.pop("cached_statements", 128), **kwargs)
+        for pragma, value in settings.items():
+            connection.execute(f"PRAGMA {pragma}={value}")
+        return connection
+
     def commit(self):
         self._connection.commit()
 
     def acquire(self):
         self.__lastrowid = None
         self.lock.acquire()
-        self._connection = sqlite3.connect(self.database)
+        self._connection = self.connect()
         self.__cursor = self.__connection.cursor()
         # get and store the sqlite3 connection in the hidden attribute
 
@@ -346,8 +607,10 @@ class SQLiteInterface(object):
             self.acquire()
             self._connection.row_factory = self.row_factory
             self.__cursor = self.__connection.cursor()
-            self.__cursor.execute(f"SELECT * FROM {table}")
-            self._columns[table] = [ row for row,val in self.__cursor.fetchone().items() ]
+            self.__cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+            self._columns[table] = [ col[0] for col in self.__cursor.description ]
+            # read the names from the cursor; a half read SELECT would keep
+            # the database locked after the connection is closed
             self.release()
         return self._columns[table]
 
@@ -383,6 +646,28 @@ class SQLiteInterface(object):
         self.row_factory = initial_factory
         return success
 
+def shard_path(database, shard):
+    """
+    The path a shard of a database is recorded to, so no two processes share
+    a sqlite file; shard 0 of 'data.db' is 'data_w0.db'. See interfaces.merge.
+    """
+    name, ext = os.path.splitext(database)
+    return f"{name}_w{shard}{ext}"
+
+def open_shard(database, shard, profile="default"):
+    """
+    Create a SQLiteInterface for a shard of a database, reusing the
+    schema and fixtures that sit next to the database.
+    """
+    folder = os.path.dirname(file_path(database, suppress=True))
+    name, ext = os.path.splitext(os.path.basename(database))
+    sql_files = []
+    for prefix in ["SCHEMA_", "FIXTURES_"]:
+        path = os.path.join(folder, prefix+name+".sql")
+        sql_files += [path if os.path.isfile(path) else None]
+    schema, fixtures = sql_files
+    return SQLiteInterface(shard_path(database, shard), schema=schema, fixtures=fixtures, profile=profile)
+
 class Scribe(object):
     """
     An object to handle recording (and retrieving) game states to a sqlite database
@@ -434,15 +719,107 @@ class Scribe(object):
         # states_snakes
         # snake_body_parts
     }
-    def __init__(self, db):
+    def __init__(self, db, batch_ticks=None, keyframes=None):
         super(Scribe, self).__init__()
+        self.__rowids = copy.deepcopy(Scribe.__rowids)
+        # each Scribe keeps its own rowids; ids cached by a Scribe for
+        # another database (or game) would point at rows that don't exist
         self.db = db
         self.db.acquire()
+        self.schema_version = self.cur.execute("PRAGMA user_version").fetchone()[0]
+        self._next_id = None
+        # the last integer id handed out, or None until this Scribe's block of
+        # ids is reserved by its first new_id(), so Scribes that only read never reserve one
+        self.batch_ticks = batch_ticks
+        # None commits every row as it's written, otherwise rows are queued
+        # and written in one transaction every 'batch_ticks' ticks
+        self._pending = OrderedDict()
+        # maps each query to the list of rows queued for it
+        self._ticks = 0
+        # how many ticks have passed since the last flush
+        self.keyframes = keyframes
+        # None records the whole snake and every fruit for each state; otherwise
+        # only what changed is recorded, with the whole snake every 'keyframes' states
+        self._last_recorded = None
+        # the cells and fruits of the last state recorded as a keyframe or delta
+        self._since_keyframe = 0
+        # how many states have been recorded since the last keyframe
 
     def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Write what's queued, and release the database, so another Scribe
+        can use it; the Scribe can't record anything after.
+        """
         if hasattr(self, "_db"):
+            self.flush()
             self.db.commit()
             self.db.release()
+            del self._db
+
+    def new_id(self):
+        """
+        The id for a new row; an integer from this Scribe's block of ids,
+        or a UUID for databases from before SCHEMA_VERSION.
+        """
+        if self.schema_version < SCHEMA_VERSION:
+            return get_uuid()
+        if self._next_id is None:
+            self.cur.execute("INSERT INTO 'id_blocks' DEFAULT VALUES")
+            self._next_id = self.cur.lastrowid*ID_BLOCK
+            self.db.commit()
+            # reserve a block of ids no other Scribe will use, so ids can be
+            # handed out before their rows are written
+        self._next_id += 1
+        return self._next_id
+
+    def write(self, query, args):
+        """
+        Insert a row now, or queue it for the next flush when batching.
+        """
+        if self.batch_ticks is None:
+            self.insert(query, args)
+            return
+        if query not in self._pending:
+            self._pending[query] = []
+        self._pending[query].append(args)
+
+    def tick(self):
+        """
+        A tick of the game has been recorded;
+        flush once 'batch_ticks' of them have been queued.
+        """
+        if self.batch_ticks is None:
+            return
+        self._ticks += 1
+        if self._ticks >= self.batch_ticks:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every queued row in a single transaction, using one executemany
+        per query, in the order the queries were first queued.
+        Returns how many rows were written.
+        """
+        self._ticks = 0
+        if not self._pending:
+            return 0
+        pending = self._pending
+        self._pending = OrderedDict()
+        count = 0
+        try:
+            for query, rows in pending.items():
+                self.cur.executemany(query, rows)
+                count += len(rows)
+            self.db.commit()
+        except Exception as err:
+            self.db._connection.rollback()
+            error(f"Failed to flush {sum(len(rows) for rows in pending.values())} queued rows, rolled them back")
+            logging.exception(err)
+            count = 0
+        return count
 
     @property
     def db(self):
@@ -480,7 +857,7 @@ class Scribe(object):
     @property
     def get_game_settings(self):
         value = self.__rowids.get("game_settings", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -489,7 +866,7 @@ class Scribe(object):
     @property
     def get_agent(self):
         value = self.__rowids.get("agent", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -499,7 +876,7 @@ class Scribe(object):
     def get_player(self):
         value = self.__rowids.get("player", None)
         # debug(f"retrieving player_id = {value} {type(value)}")
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -508,7 +885,7 @@ class Scribe(object):
     @property
     def get_game_type(self):
         value = self.__rowids.get("game_type", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -517,16 +894,42 @@ class Scribe(object):
     @property
     def get_game_instance(self):
         value = self.__rowids.get("game_instance", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
         return value
     
+    @property
+    def get_game_uuid(self):
+        """
+        The UUID that identifies the current game instance outside of the database.
+        """
+        return self.__rowids.get("game_uuid", None)
+
+    def read_query(self, name):
+        """
+        One of the READ_QUERIES, as it's run against this database; databases
+        keyed by UUIDs have no 'uuid' column, and ids that can't be compared.
+        """
+        query = READ_QUERIES[name]
+        if self.schema_version < SCHEMA_VERSION:
+            query = query.replace("uuid=?", "id=?").replace(SPAWNED_LATER, "")
+        return query
+
+    def get_game_id(self, game_uuid):
+        """
+        The id of the game instance a UUID identifies, or None if it isn't in the database.
+        """
+        row = self.exc(self.read_query("game_id"), (str(game_uuid), ))
+        if not row:
+            return None
+        return row[0][0] if self.schema_version >= SCHEMA_VERSION else uuid.UUID(row[0][0])
+
     @property
     def get_command(self):
         value = self.__rowids.get("command", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -535,7 +938,7 @@ class Scribe(object):
     @property
     def get_state(self):
         value = self.__rowids.get("state", None)
-        if value is None or isinstance(value, uuid.UUID):
+        if value is None or isinstance(value, ID_TYPES):
             pass
         else:
             value = uuid.UUID(value)
@@ -545,7 +948,7 @@ class Scribe(object):
     def get_obstacles(self):
         value = self.__rowids.get("obstacles", [])
         value = value if isinstance(value, list) else []
-        if len(value) > 0 and not all([ isinstance(v, uuid.UUID) for v in value ]):
+        if len(value) > 0 and not all([ isinstance(v, ID_TYPES) for v in value ]):
             raise ValueError(f"Expected a list of integers, not {value}")
         return value
 
@@ -553,7 +956,7 @@ class Scribe(object):
     def get_fruits(self):
         value = self.__rowids.get("fruits", [])
         value = value if isinstance(value, list) else []
-        if len(value) > 0 and not all([ isinstance(v, uuid.UUID) for v in value ]):
+        if len(value) > 0 and not all([ isinstance(v, ID_TYPES) for v in value ]):
             raise ValueError(f"Expected a list of integers, not {value}")
         return value
 
@@ -561,7 +964,7 @@ class Scribe(object):
     def get_segments(self):
         value = self.__rowids.get("segments", [])
         value = value if isinstance(value, list) else []
-        if len(value) > 0 and not all([ isinstance(v, uuid.UUID) for v in value ]):
+        if len(value) > 0 and not all([ isinstance(v, ID_TYPES) for v in value ]):
             raise ValueError(f"Expected a list of integers, not {value}")
         return value
 
@@ -569,7 +972,7 @@ class Scribe(object):
     def get_fruit_species(self):
         value = self.__rowids.get("fruit_species", {})
         value = value if isinstance(value, dict) else {}
-        if len(value) > 0 and not all([ (isinstance(k,str) and isinstance(v, uuid.UUID)) for k,v in value.items() ]):
+        if len(value) > 0 and not all([ (isinstance(k,str) and isinstance(v, ID_TYPES)) for k,v in value.items() ]):
             raise ValueError(f"Expected a dictionary mapping fruit species names to their ids, not {value}")
         return value
 
@@ -578,10 +981,10 @@ class Scribe(object):
         Record a command to the sql database.
         """
         timestamp = get_timestamp()
-        command_id = get_uuid()
+        command_id = self.new_id()
         game_id = self.get_game_instance
         if game_id is not None:
-            self.insert("INSERT OR REPLACE INTO 'commands_executed' ('id', 'timestamp', 'command', 'game') VALUES (?, ?, ?, ?) ",
+            self.write("INSERT OR REPLACE INTO 'commands_executed' ('id', 'timestamp', 'command', 'game') VALUES (?, ?, ?, ?) ",
                 (command_id, timestamp, command, game_id, )
                 )
             self.__rowids["command"] = command_id
@@ -590,8 +993,8 @@ class Scribe(object):
         """
         Record a agent to the sql database.
         """
-        agent_id = get_uuid()
-        self.insert("INSERT OR REPLACE INTO 'agents' ('id', 'weights', 'gamma') VALUES (?, ?, ?) ",
+        agent_id = self.new_id()
+        self.write("INSERT OR REPLACE INTO 'agents' ('id', 'weights', 'gamma') VALUES (?, ?, ?) ",
             (agent_id, agent.weights, agent.gamma, )
             )
         self.__rowids["agent"] = agent_id
@@ -611,9 +1014,9 @@ class Scribe(object):
             player_id = player_id[0][0]
             debug(f"player_id is {player_id}")
         else:
-            player_id = get_uuid()
+            player_id = self.new_id()
             debug(f"got player_id = {player_id}")
-        self.insert("INSERT OR REPLACE INTO 'players' ('id', 'name', 'agent') VALUES (?, ?, ?) ",
+        self.write("INSERT OR REPLACE INTO 'players' ('id', 'name', 'agent') VALUES (?, ?, ?) ",
             (player_id, player, self.get_agent, )
             )
         self.__rowids["player"] = player_id
@@ -622,7 +1025,7 @@ class Scribe(object):
         """
         Record a set of game_settings to the sql database.
         """
-        game_settings_id = get_uuid()
+        game_settings_id = self.new_id()
         settings = tuple([
                     game_settings_id,
                     game_settings["height"], 
@@ -632,8 +1035,9 @@ class Scribe(object):
                     game_settings["frames"],
                     game_settings["reward_limit"],
                     game_settings["auto_tick"],
+                    game_settings["starting_length"],
                     ])
-        self.insert("INSERT OR REPLACE INTO 'game_settings' ('id', 'height', 'width', 'size', 'snake_speed', 'frames', 'reward_limit', 'auto_tick') VALUES (?, ?, ?, ?, ?, ?, ?, ?) ",
+        self.write("INSERT OR REPLACE INTO 'game_settings' ('id', 'height', 'width', 'size', 'snake_speed', 'frames', 'reward_limit', 'auto_tick', 'starting_length') VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ",
             settings
             )
         info(f"game_settings = {game_settings_id}")
@@ -643,10 +1047,10 @@ class Scribe(object):
         """
         Record a type of a game to the sql database.
         """
-        game_type_id = get_uuid()
+        game_type_id = self.new_id()
         # info(f"game_type_id = {self.get_game_settings}")
         # info(f"game_type_id = {game_type_id}")
-        self.insert("INSERT OR REPLACE INTO 'games' ('id', 'settings', 'player', 'version') VALUES (?, ?, ?, ?) ",
+        self.write("INSERT OR REPLACE INTO 'games' ('id', 'settings', 'player', 'version') VALUES (?, ?, ?, ?) ",
             (game_type_id, self.get_game_settings, self.get_player, version, )
             )
         self.__rowids["game_type"] = game_type_id
@@ -665,11 +1069,23 @@ class Scribe(object):
 
         self.record_game_type(version)
 
-        game_instance_id = get_uuid()
-        self.insert("INSERT OR REPLACE INTO 'game_instances' ('id', 'game', 'start') VALUES (?, ?, ?) ",
-            (game_instance_id, self.get_game_type, get_timestamp(), )
-            )
+        game_instance_id = self.new_id()
+        self._last_recorded = None
+        # the first state of every game is a keyframe
+        if isinstance(game_instance_id, uuid.UUID):
+            game_uuid = game_instance_id
+            self.write("INSERT OR REPLACE INTO 'game_instances' ('id', 'game', 'start', 'seed') VALUES (?, ?, ?, ?) ",
+                (game_instance_id, self.get_game_type, get_timestamp(), game._seed, )
+                )
+        else:
+            game_uuid = get_uuid()
+            self.write("INSERT OR REPLACE INTO 'game_instances' ('id', 'uuid', 'game', 'start', 'seed') VALUES (?, ?, ?, ?, ?) ",
+                (game_instance_id, game_uuid, self.get_game_type, get_timestamp(), game._seed, )
+                )
         self.__rowids["game_instance"] = game_instance_id
+        self.__rowids["game_uuid"] = game_uuid
+        self.flush()
+        # the start of a game is written as a transaction of its own
         info(f"Recorded game start. game_instance_id = {game_instance_id}")
         info(f"Recorded game start. game_instance_id = {self.get_game_instance}")
 
@@ -678,8 +1094,10 @@ class Scribe(object):
         Update when the single game ended.
         """
         game_id = self.get_game_instance
-        if not isinstance(game_id, uuid.UUID):
+        if not isinstance(game_id, ID_TYPES):
             raise RuntimeError("Don't have an id for the current game, so we can't update the end timestamp")
+        self.flush()
+        # everything queued during the game is written before it's marked as ended
         self.exc("UPDATE 'game_instances' SET 'end'=? WHERE id=?",
             (end, game_id, )
             )
@@ -697,19 +1115,23 @@ class Scribe(object):
         #     }
         timestamp = get_timestamp()
         game_id = self.get_game_instance
-        if not isinstance(game_id, uuid.UUID):
+        if not isinstance(game_id, ID_TYPES):
             raise RuntimeError("Don't have an id for the current game, so we can't update the end timestamp")
 
-        state_id = get_uuid()
-        self.insert("INSERT OR REPLACE INTO 'states' ('id', 'game', 'timestamp', 'score') VALUES (?, ?, ?, ?) ",
+        state_id = self.new_id()
+        self.write("INSERT OR REPLACE INTO 'states' ('id', 'game', 'timestamp', 'score') VALUES (?, ?, ?, ?) ",
              (state_id, game_id, timestamp, state.get("score"), )
             )
         self.__rowids["state"] = state_id
         # self.record_fruits(state.get("fruits")[-1])
-        self.record_fruit_states(state.get("fruits"))
+        if self.keyframes is not None:
+            self.record_snake_delta(state.get("snake"), state.get("fruits"))
+        else:
+            self.record_fruit_states(state.get("fruits"))
         if len(self.get_obstacles) == 0:
             self.record_obstacles(state.get("obstacles"))
-        self.record_snake(state.get("snake"))
+        if self.keyframes is None:
+            self.record_snake(state.get("snake"))
 
     def record_fruit_species(self, fruit_defs):
         """
@@ -723,8 +1145,8 @@ class Scribe(object):
             fruit = fnc([0,0])
             # spawn a dummy fruit so we can access its properties
 
-            species_id = get_uuid()
-            self.insert("INSERT OR REPLACE INTO 'fruits' ('id', 'name', 'value', 'frequency', 'color') VALUES (?, ?, ?, ?, ?) ", 
+            species_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'fruits' ('id', 'name', 'value', 'frequency', 'color') VALUES (?, ?, ?, ?, ?) ", 
                 (species_id, fruit.name, fruit.value, fruit.frequency, fruit.color, )
                 )
             self.__rowids["fruit_species"][name] = species_id
@@ -751,14 +1173,14 @@ class Scribe(object):
                 self.record_fruit_species({fruit.name: lambda dimensions: fruit })
                 species_id = self.get_fruit_species.get(fruit.name, None)
 
-            fruit.id = get_uuid()
-            self.insert("INSERT OR REPLACE INTO 'fruit_instances' ('id', 'x', 'y', 'species') VALUES (?, ?, ?, ?) ", 
+            fruit.id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'fruit_instances' ('id', 'x', 'y', 'species') VALUES (?, ?, ?, ?) ", 
                 (fruit.id, fruit.x, fruit.y, species_id, )
                 )
 
             # self.__rowids["fruits"] += [ fruit.id ]
-            states_fruits_id = get_uuid()
-            self.exc("INSERT OR REPLACE INTO 'states_fruits' ('id', 'fruit', 'state') VALUES (?, ?, ?) ",
+            states_fruits_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'states_fruits' ('id', 'fruit', 'state') VALUES (?, ?, ?) ",
                 (states_fruits_id, fruit.id, state_id, )
                 )
 
@@ -783,13 +1205,13 @@ class Scribe(object):
                 if species_id is None:
                     self.record_fruit_species({fruit.name: lambda dimensions: fruit })
                     species_id = self.get_fruit_species.get(fruit.name, None)
-                fruit.id = get_uuid()
-                self.insert("INSERT OR REPLACE INTO 'fruit_instances' ('id', 'x', 'y', 'species') VALUES (?, ?, ?, ?) ", 
+                fruit.id = self.new_id()
+                self.write("INSERT OR REPLACE INTO 'fruit_instances' ('id', 'x', 'y', 'species') VALUES (?, ?, ?, ?) ", 
                     (fruit.id, fruit.x, fruit.y, species_id, )
                     )
-            states_fruits_id = get_uuid()
+            states_fruits_id = self.new_id()
             debug("Insert fruit_state")
-            self.exc("INSERT OR REPLACE INTO 'states_fruits' ('id', 'fruit', 'state') VALUES (?, ?, ?) ",
+            self.write("INSERT OR REPLACE INTO 'states_fruits' ('id', 'fruit', 'state') VALUES (?, ?, ?) ",
                 (states_fruits_id, fruit.id, state_id, )
                 )
             debug("Inserted fruit_state")
@@ -810,13 +1232,13 @@ class Scribe(object):
         self.__rowids["obstacles"] = []
         state_id = self.get_state
         for ob in obstacles:
-            obstacle_id = get_uuid()
-            self.insert("INSERT OR REPLACE INTO 'obstacles' ('id', 'x', 'y', 'w', 'h') VALUES (?, ?, ?, ?, ?) ", 
+            obstacle_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'obstacles' ('id', 'x', 'y', 'w', 'h') VALUES (?, ?, ?, ?, ?) ", 
                 (obstacle_id, ob.x, ob.y, ob.w, ob.h, ) 
                 )
             self.__rowids["obstacles"] += [ obstacle_id ]
-            states_obstacles_id = get_uuid()
-            self.exc("INSERT OR REPLACE INTO 'states_obstacles' ('id', 'obstacle', 'state') VALUES (?, ?, ?) ",
+            states_obstacles_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'states_obstacles' ('id', 'obstacle', 'state') VALUES (?, ?, ?) ",
                 (states_obstacles_id, obstacle_id, state_id, )
                 )
 
@@ -835,8 +1257,8 @@ class Scribe(object):
         # self.__rowids["segments"] = self.__rowids.get("segments",[])
         self.__rowids["segments"] = []
         for sg in segments:
-            segment_id = get_uuid()
-            self.exc("INSERT OR REPLACE INTO 'segments' ('id', 'x', 'y', 'w', 'h', 'heading') VALUES (?, ?, ?, ?, ?, ?) ",
+            segment_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'segments' ('id', 'x', 'y', 'w', 'h', 'heading') VALUES (?, ?, ?, ?, ?, ?) ",
                 (segment_id, sg.x, sg.y, sg.w, sg.h, sg.heading, )
                 )
             self.__rowids["segments"] += [ segment_id ]
@@ -847,23 +1269,318 @@ class Scribe(object):
         """
         state_id = self.get_state
 
-        snake_state_id = get_uuid()
-        self.insert("INSERT OR REPLACE INTO 'states_snakes' ('id', 'state', 'belly', 'length') VALUES (?, ?, ?, ?) ",
+        snake_state_id = self.new_id()
+        self.write("INSERT OR REPLACE INTO 'states_snakes' ('id', 'state', 'belly', 'length') VALUES (?, ?, ?, ?) ",
             (snake_state_id, state_id, snake.belly, snake.length)
             )
         for idx,sg in enumerate(snake.segments):
-            segment_id = get_uuid()
-            self.insert("INSERT OR REPLACE INTO 'segments' ('id', 'x', 'y', 'w', 'h', 'heading') VALUES (?, ?, ?, ?, ?, ?) ",
+            segment_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'segments' ('id', 'x', 'y', 'w', 'h', 'heading') VALUES (?, ?, ?, ?, ?, ?) ",
                 (segment_id, sg.x, sg.y, sg.w, sg.h, sg.heading, )
                 )
-            snake_body_parts_id = get_uuid()
-            self.exc("INSERT OR REPLACE INTO 'snake_body_parts' ('id', 'snake', 'segment', 'body_index') VALUES (?, ?, ?, ?) ",
+            snake_body_parts_id = self.new_id()
+            self.write("INSERT OR REPLACE INTO 'snake_body_parts' ('id', 'snake', 'segment', 'body_index') VALUES (?, ?, ?, ?) ",
                 (snake_body_parts_id, snake_state_id, segment_id, idx, )
                 )
 
+    def record_snake_delta(self, snake, fruits):
+        """
+        Record how the snake and fruits changed since the last state: the cells
+        added in front of the head, how many cells the tail retracted, and the
+        fruits that were added or removed. A keyframe with the whole snake and
+        every fruit is recorded every 'keyframes' states, and whenever the
+        change can't be written as a move.
+        """
+        state_id = self.get_state
+        cells = snake_cells(snake) if snake is not None else ()
+        fruits = { (f.x, f.y, f.name):f for f in fruits }
+        last = self._last_recorded
+        heads, retract = None, None
+        if last is not None and self._since_keyframe < self.keyframes:
+            heads, retract = cell_delta(last[0], cells)
+        heading = snake.heading if snake is not None else None
+        belly = snake.belly if snake is not None else 0
+        if heads is None:
+            self.write("INSERT INTO 'snake_keyframes' ('state', 'heading', 'belly', 'cells') VALUES (?, ?, ?, ?) ",
+                (state_id, heading, belly, pack_cells(cells), )
+                )
+            self._since_keyframe = 0
+            added, removed = set(fruits), set()
+        else:
+            self.write("INSERT INTO 'snake_deltas' ('state', 'heading', 'belly', 'heads', 'retract') VALUES (?, ?, ?, ?, ?) ",
+                (state_id, heading, belly, pack_cells(heads), retract, )
+                )
+            added, removed = set(fruits)-last[1], last[1]-set(fruits)
+        self._since_keyframe += 1
+        for key,is_added in sorted([ (k, True) for k in added ]+[ (k, False) for k in removed ]):
+            x, y, name = key
+            species_id = self.get_fruit_species.get(name, None)
+            if species_id is None:
+                # only a fruit being added can be of a species that hasn't been recorded
+                fruit = fruits[key]
+                self.record_fruit_species({name: lambda dimensions: fruit })
+                species_id = self.get_fruit_species.get(name, None)
+            self.write("INSERT INTO 'fruit_deltas' ('state', 'x', 'y', 'species', 'added') VALUES (?, ?, ?, ?, ?) ",
+                (state_id, x, y, species_id, is_added, )
+                )
+        self._last_recorded = (cells, set(fruits))
+
+    def get_states(self, game_id):
+        """
+        Rebuild every state of a game, in the order they were recorded. Yields
+        a dict of the score, and the snake's heading, belly and cells (from the
+        head to the tail), and the x, y and name of each fruit; see iter_states.
+        """
+        return self.iter_states(game_id)
+
+    def iter_states(self, game_id, batch=1000):
+        """
+        Rebuild every state of a game one at a time, like get_states, whether it
+        was recorded whole or as keyframes and deltas. States are read 'batch'
+        at a time, each page starting after the rowid the last one ended at,
+        so memory use doesn't grow with the length of the game.
+        """
+        self.flush()
+        last = 0
+        cells = None
+        fruits = set()
+        # what the last delta was applied to
+        while True:
+            page = self.cur.execute(self.read_query("states"), (game_id, last, batch)).fetchall()
+            if not page:
+                return
+            bounds = (game_id, last, page[-1][0])
+            last = page[-1][0]
+            fruit_changes = {}
+            for state_id, x, y, species, name, added in self.cur.execute(self.read_query("fruit_deltas"), bounds):
+                fruit_changes[state_id] = fruit_changes.get(state_id, [])+[((x, y, name), bool(added))]
+            snakes, boards = {}, {}
+            if any([ row[5] is None and row[8] is None for row in page ]):
+                # some states were recorded whole
+                for state_id, belly, length, x, y, w, h, heading in self.cur.execute(self.read_query("snakes"), bounds):
+                    snakes[state_id] = snakes.get(state_id, [])+[(belly, (x, y, w, h, heading))]
+                for state_id, x, y, species, name in self.cur.execute(self.read_query("fruit_states"), bounds):
+                    boards[state_id] = boards.get(state_id, [])+[(x, y, name)]
+            for _, state_id, score, k_heading, k_belly, k_cells, d_heading, d_belly, heads, retract in page:
+                if k_cells is not None:
+                    cells = deque(unpack_cells(k_cells))
+                    fruits = set()
+                    heading, belly = k_heading, k_belly
+                elif heads is not None and cells is not None:
+                    for _ in range(retract):
+                        cells.pop()
+                    cells.extendleft(reversed(unpack_cells(heads)))
+                    heading, belly = d_heading, d_belly
+                elif state_id in snakes:
+                    segments = snakes[state_id]
+                    belly, heading = segments[0][0], segments[0][1][-1]
+                    cells = deque(map(tuple, segments_cells(np.array([ seg for _, seg in segments ]))[0].tolist()))
+                    fruits = set(boards.get(state_id, []))
+                else:
+                    raise ValueError(f"state '{state_id}' of game '{game_id}' wasn't recorded whole, or as a keyframe or a delta")
+                for key, added in fruit_changes.get(state_id, []):
+                    if added:
+                        fruits.add(key)
+                    else:
+                        fruits.discard(key)
+                yield {
+                    "score": score,
+                    "heading": heading,
+                    "belly": belly,
+                    "cells": tuple(cells),
+                    "fruits": sorted(fruits),
+                }
+
+    def get_replay(self, game_id):
+        """
+        Retrieve what's needed to replay a game instance: the settings it was
+        played with, the seed for its random generator, and every command it
+        executed (in the order they were executed).
+        """
+        self.flush()
+        row = self.cur.execute(READ_QUERIES["settings"], (game_id, )).fetchone()
+        if row is None:
+            raise KeyError(f"game instance '{game_id}' not found in database")
+        names = ["height", "width", "size", "snake_speed", "frames", "reward_limit", "auto_tick", "starting_length"]
+        settings = { k:v for k,v in zip(names, row) }
+        settings["auto_tick"] = bool(settings["auto_tick"])
+        commands = self.cur.execute(READ_QUERIES["commands"], (game_id, )).fetchall()
+        return {
+            "settings": settings,
+            "seed": row[-1],
+            "commands": [ cmd for (_, cmd) in commands ],
+        }
+
+    def load_game(self, game_id):
+        """
+        Load a whole game as columns of NumPy arrays, with one entry per
+        recorded state in the order they were recorded, in a few queries:
+            "state"         the id of each state
+            "tick"          the index of each state in the game
+            "score"         the score at each state
+            "belly"         how much food is in the snake's belly
+            "length"        the length of the snake, like Snake.length
+            "head_x"        the top left point of the snake's head
+            "head_y"
+            "heading"       the direction (0-3) the snake is heading in
+            "action"        the move (0-3) that led to each state, or -1
+            "moves"         how many moves the game executed before each state
+            "cells"         the x,y of every virtual pixel of each snake, from the
+                            head to the tail; a state's snake is
+                            cells[cell_offsets[i]:cell_offsets[i+1]]
+            "cell_offsets"
+            "fruits"        the x,y and species id of every fruit on the board, sorted;
+                            a state's fruits are fruits[fruit_offsets[i]:fruit_offsets[i+1]]
+            "fruit_offsets"
+            "commands"      every command the game executed, in order
+        Works with games recorded either way (see Scribe.keyframes), but needs
+        a database keyed by integers to match moves to states.
+        """
+        if self.schema_version < SCHEMA_VERSION:
+            raise ValueError("Moves can only be matched to states in databases keyed by integers, "
+                "see interfaces.migrate")
+        self.flush()
+        commands = rows_array(self.cur.execute(READ_QUERIES["commands"], (game_id, )).fetchall(), 2)
+        rows = self.cur.execute(READ_QUERIES["states"], (game_id, 0, -1)).fetchall()
+        # every state of the game, with its keyframe or delta if it has one
+        states = rows_array([ row[1:3] for row in rows ], 2)
+        # a game is recorded by one Scribe, so its ids grow in the order its rows
+        # were written, and rows are matched to states and moves by searching them
+        count = len(states)
+        bounds = (game_id, 0, np.iinfo(np.int64).max)
+        # every state of the game
+        keyframes = np.array([ row[5] is not None for row in rows ], dtype=bool)
+        deltas = np.array([ row[8] is not None for row in rows ], dtype=bool)
+        if not keyframes.any() and not deltas.any():
+            belly = np.zeros(count, dtype=np.int32)
+            length = np.zeros(count, dtype=np.int32)
+            snakes = rows_array(self.cur.execute(READ_QUERIES["snakes"], bounds).fetchall(), 8)
+            owner = np.searchsorted(states[:, 0], snakes[:, 0])
+            heading = np.zeros(count, dtype=np.int8)
+            belly[owner] = snakes[:, 1]
+            length[owner] = snakes[:, 2]
+            heads = np.unique(owner, return_index=True)[1]
+            heading[owner[heads]] = snakes[heads, 7]
+            # a snake heads where its head segment does
+            cells, per_segment = segments_cells(snakes[:, 3:])
+            cell_counts = np.bincount(owner, weights=per_segment, minlength=count).astype(np.int64)
+            fruits = rows_array([ row[:4] for row in self.cur.execute(READ_QUERIES["fruit_states"], bounds) ], 4)
+            boards = np.searchsorted(states[:, 0], fruits[:, 0])
+            fruits = fruits[:, 1:]
+        else:
+            cells, cell_counts, belly, fruits, boards = self._load_deltas(game_id, states, rows, keyframes, deltas)
+            size = self.cur.execute(READ_QUERIES["settings"], (game_id, )).fetchone()[2]
+            length = (cell_counts*size).astype(np.int32)
+            heading = np.where(keyframes, np.array([ row[3] for row in rows ], dtype=np.float64),
+                np.array([ row[6] for row in rows ], dtype=np.float64)).astype(np.int8)
+        order = np.lexsort((fruits[:, 2], fruits[:, 1], fruits[:, 0], boards))
+        # each state's fruits, sorted, however they were recorded
+        cell_offsets = np.concatenate([[0], np.cumsum(cell_counts)])
+        heads = np.full((count, 2), -1, dtype=np.int32)
+        has_snake = cell_counts > 0
+        heads[has_snake] = cells[cell_offsets[:-1][has_snake]]
+        moves = commands[commands[:, 1] < 4]
+        before = np.searchsorted(moves[:, 0], states[:, 0])-1
+        # a state's move is the last one before it
+        action = np.where(before >= 0, moves[np.maximum(before, 0), 1], -1).astype(np.int8)
+        return {
+            "state": states[:, 0],
+            "tick": np.arange(count, dtype=np.int32),
+            "score": states[:, 1].astype(np.int32),
+            "belly": belly,
+            "length": length,
+            "head_x": heads[:, 0],
+            "head_y": heads[:, 1],
+            "heading": heading,
+            "action": action,
+            "moves": (before+1).astype(np.int32),
+            "cells": cells,
+            "cell_offsets": cell_offsets,
+            "fruits": fruits[order],
+            "fruit_offsets": np.concatenate([[0], np.cumsum(np.bincount(boards, minlength=count))]),
+            "commands": commands[:, 1].astype(np.int16),
+        }
+
+    def _load_deltas(self, game_id, states, rows, keyframes, deltas):
+        """
+        Rebuild the snakes and fruits of every state of a game recorded as
+        keyframes and deltas (see load_game) with NumPy, without stepping
+        through the states: each state's snake is a reversed slice of every
+        cell the game's snakes were given, from the tail up, and each fruit
+        is on the board from the state it was added until it's removed or
+        the next keyframe. Returns the cells, how many cells each state has,
+        the bellies, and the fruits with the index of their state.
+        """
+        count = len(states)
+        if not (keyframes | deltas).all() or not keyframes[0]:
+            missing = states[~(keyframes | deltas), 0].tolist()+([] if keyframes[0] else [states[0, 0]])
+            raise ValueError(f"state '{missing[0]}' of game '{game_id}' wasn't recorded whole, or as a keyframe or a delta")
+        _, _, _, _, k_belly, k_cells, _, d_belly, heads, retract = zip(*rows)
+        # a column per value, rather than a row per state
+        belly = np.where(keyframes, np.array(k_belly, dtype=np.float64), np.array(d_belly, dtype=np.float64)).astype(np.int32)
+        retract = np.nan_to_num(np.array(retract, dtype=np.float64)).astype(np.int64)
+        # keyframes have no belly or retract of a delta, read as nan
+        stored, added = unpack_blobs(np.where(keyframes, np.array(k_cells, dtype=object), np.array(heads, dtype=object)))
+        # a keyframe's cells, or a delta's new heads, from the head back
+        ends = np.cumsum(added)
+        grown = stored[reverse_slices(ends-added, ends)]
+        # every cell given to the snake, from the tail up to the latest head
+        run = np.cumsum(keyframes)-1
+        firsts = np.flatnonzero(keyframes)
+        # the keyframe each state's deltas are applied to
+        retracted = np.cumsum(retract)
+        tails = (ends-added)[firsts][run]+retracted-retracted[firsts][run]
+        cells = grown[reverse_slices(tails, ends)]
+        changes = rows_array([ row[:4]+row[5:] for row in self.cur.execute(READ_QUERIES["fruit_deltas"],
+            (game_id, 0, np.iinfo(np.int64).max)) ], 5)
+        # state, x, y, species and whether the fruit was added, in the order they were recorded
+        at = np.searchsorted(states[:, 0], changes[:, 0])
+        order = np.lexsort((np.arange(len(changes)), changes[:, 3], changes[:, 2], changes[:, 1], run[at]))
+        changes, at = changes[order], at[order]
+        # each fruit's changes in a run of deltas, one after another
+        follows = np.zeros(len(changes), dtype=bool)
+        follows[:-1] = (run[at][1:] == run[at][:-1]) & (changes[1:, 1:4] == changes[:-1, 1:4]).all(axis=1)
+        until = np.append(firsts[1:], count)[run[at]]
+        # a fruit is on the board until the next keyframe
+        until[:-1] = np.where(follows[:-1], at[1:], until[:-1])
+        # or until its next change
+        added = changes[:, 4] != 0
+        stays = until[added]-at[added]
+        boards = np.repeat(at[added], stays)+(np.arange(stays.sum())-np.repeat(np.cumsum(stays)-stays, stays))
+        fruits = np.repeat(changes[added, 1:4], stays, axis=0)
+        return cells, ends-tails, belly, fruits, boards
+
+    def query_plan(self, query, args=()):
+        """
+        The steps sqlite takes to run a query, as the details of its EXPLAIN QUERY PLAN.
+        """
+        return [ row[-1] for row in self.cur.execute("EXPLAIN QUERY PLAN "+query, args).fetchall() ]
+
+    def full_scans(self):
+        """
+        Check the plan of each of the READ_QUERIES against this database.
+        Returns a dict mapping each query that reads every row of a table
+        to those steps of its plan; empty when every table is searched
+        through an index, as it is once the schema's indexes are created.
+        """
+        scans = {}
+        for name in READ_QUERIES:
+            query = self.read_query(name)
+            try:
+                steps = full_scans(self.query_plan(query, (None, )*query.count("?")))
+            except sqlite3.OperationalError as err:
+                # the tables for keyframes and deltas aren't in older databases
+                debug(f"Couldn't plan the '{name}' query: {err}")
+                continue
+            if steps:
+                scans[name] = steps
+        return scans
+
     def exc(self, query, args, row_factory=None):
         result = None
         uses_args = False
+        self.flush()
+        # queued rows are written first, so they can be read back
         try:
             if args:
                 uses_args = True
@@ -916,26 +1633,24 @@ class Scribe(object):
         finally:
             return result
 
-    def exc_many(self, query, row_factory=None, *args):
+    def exc_many(self, query, args, row_factory=None):
+        """
+        Execute a query once for every tuple of column values in 'args',
+        in a single transaction. Returns how many rows were changed.
+        """
         result = None
-        uses_args = False
         try:
-            if args:
-                uses_args = True
-                args = args[0]
-                if not isinstance(args, list):
-                    raise TypeError("The next argument after 'query' should be a list of tuples containing the column values.")
-                elif len(args) > 0 and not isinstance(args[0], list):
-                    raise TypeError("The next argument after 'query' should be a list of tuples containing the column values.")
+            if not isinstance(args, (list, tuple)):
+                raise TypeError("The next argument after 'query' should be a list of tuples containing the column values.")
+            elif len(args) > 0 and not isinstance(args[0], (list, tuple)):
+                raise TypeError("The next argument after 'query' should be a list of tuples containing the column values.")
             if row_factory:
                 temp = self.db.row_factory
                 self.db.row_factory = row_factory
-            if uses_args:
-                db.executemany(query, args)
-            else:
-                db.executemany(query)
-            result = [row for row in db.fetchall()]
+            self.flush()
+            self.cur.executemany(query, args)
             self.db.commit()
+            result = self.cur.rowcount
             if row_factory:
                 self.db.row_factory = temp
         except Exception as err:
@@ -943,6 +1658,139 @@ class Scribe(object):
         finally:
             return result
 
+class AsyncScribe(Scribe):
+    """
+    A Scribe that never writes on the game's thread. The rows recorded
+    during a tick are put on a bounded queue as one immutable tuple, and a
+    writer thread with its own connection drains the queue into the database,
+    writing whatever is waiting in a single transaction.
+    When the queue is full, the "block" policy waits for the writer to catch up,
+    and the "drop" policy throws away the tick's state and counts it in 'dropped';
+    the rest of its rows, such as the commands executed, go with the next tick.
+    """
+    policies = ["block", "drop"]
+    state_tables = ["states", "states_fruits", "states_obstacles", "obstacles", "states_snakes", "segments",
+        "snake_body_parts", "snake_keyframes", "snake_deltas", "fruit_deltas"]
+    # the tables whose rows only describe the state they were recorded for
+    def __init__(self, db, queue_size=1000, overflow="block", keyframes=None):
+        if overflow not in AsyncScribe.policies:
+            raise ValueError(f"overflow should be one of {AsyncScribe.policies}, not {overflow}")
+        self.overflow = overflow
+        self.dropped = 0
+        # how many ticks have been thrown away because the queue was full
+        self._rows = []
+        # the rows recorded since the last tick
+        self._queue = queue.Queue(maxsize=queue_size)
+        super(AsyncScribe, self).__init__(db, keyframes=keyframes)
+        self._writer = threading.Thread(target=AsyncScribe._drain, args=(self.db.connect, self._queue, ),
+            name="ScribeWriter", daemon=True)
+        # the writer doesn't hold a reference to the Scribe, so it can still be garbage collected
+        self._writer.start()
+
+    def write(self, query, args):
+        """
+        Keep a row until the end of the tick.
+        """
+        self._rows.append((query, tuple(args)))
+
+    def _enqueue(self, block):
+        """
+        Put the rows recorded since the last tick on the queue.
+        """
+        if not self._rows:
+            return True
+        rows = tuple(self._rows)
+        self._rows = []
+        try:
+            self._queue.put(rows, block=block)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                warn(f"The Scribe's queue is full, dropping the states of ticks of {len(rows)} rows")
+            self._rows = [ row for row in rows if AsyncScribe._table(row[0]) not in AsyncScribe.state_tables ]
+            # rows later ticks rely on, and the commands a replay needs, are kept
+            self._last_recorded = None
+            # the next state is recorded as a keyframe, since the delta after this state would build on it
+            return False
+        return True
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _table(query):
+        """
+        The table a query inserts into.
+        """
+        match = re.search(r"INTO '(\w+)'", query)
+        return match.group(1) if match else None
+
+    def tick(self):
+        """
+        The tick has ended, hand its rows to the writer.
+        """
+        self._enqueue(block=self.overflow == "block")
+
+    def flush(self):
+        """
+        Hand the writer the rows recorded so far, and wait until
+        everything on the queue is in the database.
+        """
+        if not self._writer.is_alive():
+            if self._rows:
+                warn(f"The Scribe's writer has stopped, {len(self._rows)} rows weren't written")
+                self._rows = []
+            return
+        self._enqueue(block=True)
+        self._queue.join()
+
+    def close(self):
+        """
+        Flush, then stop the writer thread, and release the database.
+        """
+        if hasattr(self, "_writer") and self._writer.is_alive():
+            self.flush()
+            self._queue.put(None)
+            self._writer.join()
+        super(AsyncScribe, self).close()
+
+    @staticmethod
+    def _drain(connect, rows_queue):
+        """
+        Write ticks from the queue until told to stop by None,
+        to a connection opened by 'connect'.
+        """
+        connection = connect(timeout=60)
+        cursor = connection.cursor()
+        running = True
+        while running:
+            items = [rows_queue.get()]
+            while True:
+                # take whatever else is waiting, so it's written in the same transaction
+                try:
+                    items.append(rows_queue.get_nowait())
+                except queue.Empty:
+                    break
+            pending = OrderedDict()
+            for rows in items:
+                if rows is None:
+                    running = False
+                    continue
+                for query, args in rows:
+                    if query not in pending:
+                        pending[query] = []
+                    pending[query].append(args)
+            try:
+                for query, rows in pending.items():
+                    cursor.executemany(query, rows)
+                connection.commit()
+            except Exception as err:
+                connection.rollback()
+                error(f"The Scribe's writer failed to write {len(items)} ticks, they were rolled back")
+                logging.exception(err)
+            finally:
+                for _ in items:
+                    rows_queue.task_done()
+        connection.close()
+
 def adapt_bool(val):
     """
     From python bool type to sqlite 'BOOLEAN',
@@ -1,14 +1,37 @@
 import unittest
 import multiprocessing
+import threading
 import json
+import copy
+import time
+import sys
+import types
+from unittest import mock
 from .player import Player
 from .game import *
 # from .DQN import DQN
 from objects.snake import Snake
+from objects.cell_snake import CellSnake
 from objects.segment import Segment
 from objects.obstacle import Obstacle
 from objects.fruit import Fruit
-from .scribe import Scribe
+from .scribe import Scribe, AsyncScribe, SQLiteInterface, get_uuid, get_timestamp, snake_cells, shard_path
+from . import scribe as scribe_module
+import sqlite3
+from .vec_game import VecSnakeGame
+from .runner import run_games
+from .merge import merge as merge_shards
+from .replay import Replay
+from . import migrate as migration
+from . import export
+from .memory import ReplayMemory, PrioritizedReplayMemory, SumTree, td_targets
+from .network import DenseNetwork
+from .inference import InferenceServer, play as play_served, TURNS
+import os
+import re
+import uuid
+from objects.grid import OccupancyGrid
+import numpy as np
 import logging
 
 try:
@@ -127,6 +150,334 @@ class TestSnakeGameObject(unittest.TestCase):
         
 
 
+class TestSnakeGameHeadless(unittest.TestCase):
+    """
+    Test that a headless SnakeGame moves once per update, without a clock.
+    """
+    def setUp(self):
+        data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "frames": 60,
+            "snake_speed": 5,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+        }
+        self.data = data
+        self.game = SnakeGame(**data)
+
+    # @unittest.skip("skipping test_no_clock")
+    def test_no_clock(self):
+        """
+        Test a headless game never creates a pygame clock.
+        """
+        self.assertIsNone(self.game.clock)
+
+    # @unittest.skip("skipping test_step")
+    def test_step(self):
+        """
+        Test each step moves the snake exactly once, ignoring frames/snake_speed.
+        """
+        heading = self.game.snake.heading
+        head = list(self.game.snake.head.dimensions)
+        reward, done = self.game.step()
+        # step without a command; the snake keeps its heading
+        self.assertFalse(done)
+        self.assertTrue(reward > 0)
+        # staying alive is always worth some points
+        self.assertEqual(self.game.snake.heading, heading)
+        self.assertNotEqual(self.game.snake.head.dimensions, head)
+        reward, done = self.game.step((heading+2)%4)
+        # turning back into the body kills the snake
+        self.assertTrue(done)
+        self.assertTrue(self.game.game_over)
+
+    # @unittest.skip("skipping test_cell_body")
+    def test_cell_body(self):
+        """
+        Test a game whose snake is a CellSnake plays out exactly the same.
+        """
+        game = SnakeGame(**dict(self.data, seed=self.game._seed, database=None, cell_body=True))
+        game_b = SnakeGame(**dict(self.data, seed=self.game._seed, database=None))
+        self.assertIsInstance(game.snake, CellSnake)
+        heading = game.snake.heading
+        for cmd in [heading, (heading+1)%4, 7, None, heading, None, None]:
+            if game.game_over:
+                break
+            self.assertEqual(game.step(cmd), game_b.step(cmd))
+            self.assertEqual(game.game_state[2], game_b.game_state[2])
+            # the same fruit
+            self.assertEqual(bytes(game.grid.cells), bytes(game_b.grid.cells))
+            # the same cells occupied
+
+class TestSnakeGameObservation(unittest.TestCase):
+    """
+    Test that a SnakeGame can describe itself with NumPy arrays.
+    """
+    def setUp(self):
+        data = {
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 3,
+            "headless": True,
+            "database": None,
+        }
+        self.game = SnakeGame(**data)
+        self.game.snake = Snake([50, 50, 10, 30], 0)
+        # headed north, with the body trailing south of the head
+        self.game.rewards = [Fruit("apple", [80, 20, 10], 1), Fruit("orange", [20, 90, 10], 10)]
+        self.game._init_grid()
+
+    # @unittest.skip("skipping test_observation")
+    def test_observation(self):
+        """
+        Test every channel of the board is filled in, and the buffer is reused.
+        """
+        obs = self.game.observation()
+        self.assertEqual(obs.shape, (4, 12, 12))
+        self.assertEqual(obs[0].sum(), 40)
+        # the border around the board
+        self.assertEqual(obs[1].sum(), 3)
+        self.assertEqual(obs[2, 6, 6], 1)
+        self.assertEqual(obs[2].sum(), 1)
+        self.assertEqual(obs[3, 3, 9], 1)
+        self.assertEqual(obs[3, 10, 3], 10)
+        self.assertIs(self.game.observation(), obs)
+        out = np.zeros_like(obs)
+        self.assertIs(self.game.observation(out=out), out)
+        self.assertTrue((out == obs).all())
+
+    # @unittest.skip("skipping test_features")
+    def test_features(self):
+        """
+        Test the 11 features match the board around the head.
+        """
+        features = self.game.features()
+        self.assertEqual(features.shape, (SnakeGame.NUMBER_OF_FEATURES, ))
+        self.assertEqual(list(features), [0, 0, 0, 0, 0, 1, 0, 0, 1, 1, 0])
+        # heading north, with the apple north east of the head
+        self.game.snake = Snake([0, 50, 10, 30], 0)
+        self.game._init_grid()
+        self.assertEqual(list(self.game.features()), [0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 1])
+        # the west wall is to the left, and the orange is now nearest (south east)
+
+class TestSnakeGameSnapshot(unittest.TestCase):
+    """
+    Test that a SnakeGame can be returned to an earlier point, and branch from it.
+    """
+    def setUp(self):
+        data = {
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "auto_tick": False,
+            "headless": True,
+            "database": None,
+            "seed": 3,
+        }
+        self.game = SnakeGame(**data)
+        self.other = SnakeGame(**dict(data, seed=4))
+
+    def play(self, game, cmds):
+        states = []
+        for cmd in cmds:
+            if game.game_over:
+                break
+            game.step(cmd)
+            states += [copy.deepcopy((game.game_state, game._score, game.fruit_count, game.rand.random()))]
+        return states
+
+    # @unittest.skip("skipping test_restore")
+    def test_restore(self):
+        """
+        Test a restored game plays out exactly as it did after the snapshot,
+        including the fruit its random generator spawns.
+        """
+        self.game.step(7)
+        snapshot = self.game.snapshot()
+        heading = self.game.snake.heading
+        cmds = [heading, (heading+1)%4, 9, None, (heading+1)%4, None, 8]
+        states = self.play(self.game, cmds)
+        self.assertTrue(len(states) > 0)
+        self.game.restore(snapshot)
+        self.assertEqual(self.play(self.game, cmds), states)
+        self.other.restore(snapshot)
+        # a snapshot can be restored into any game with the same settings
+        self.assertEqual(self.play(self.other, cmds), states)
+
+    # @unittest.skip("skipping test_branch")
+    def test_branch(self):
+        """
+        Test branching from a snapshot leaves the snapshot unchanged.
+        """
+        snapshot = self.game.snapshot()
+        heading = self.game.snake.heading
+        self.game.step((heading+2)%4)
+        # turning back into the body ends the game
+        self.assertTrue(self.game.game_over)
+        self.game.restore(snapshot)
+        self.assertFalse(self.game.game_over)
+        self.assertEqual(self.game.snapshot(), snapshot)
+
+class TestVecSnakeGame(unittest.TestCase):
+    """
+    Test that the VecSnakeGame object steps many games in lockstep.
+    """
+    def setUp(self):
+        self.game = VecSnakeGame(num_envs=32, height=16, width=16, seed=1)
+
+    # @unittest.skip("skipping test_step")
+    def test_step(self):
+        """
+        Test every game moves once per step, and stays consistent with its board.
+        """
+        actions = self.game.headings.copy()
+        obs, rewards, done = self.game.step(actions)
+        actions[:] = (actions+2)%4
+        # the game keeps its own copy of the moves
+        self.assertFalse((self.game.headings == actions).any())
+        self.assertEqual(obs.shape, (32, 18, 18))
+        self.assertEqual(rewards.shape, (32,))
+        self.assertEqual(done.shape, (32,))
+        self.assertFalse(done.any())
+        # every snake spawns with room to move straight ahead
+        self.assertTrue((rewards > 0).all())
+        self.assertTrue(((obs == VecSnakeGame.HEAD).sum(axis=(1,2)) == 1).all())
+        rand = np.random.default_rng(1)
+        for x in range(500):
+            turns = rand.choice([0, 0, 0, 1, 3], size=32)
+            self.game.step((self.game.headings+turns)%4)
+            bodies = (self.game.boards == OccupancyGrid.BODY).sum(axis=1)
+            self.assertTrue((bodies == self.game.lengths).all())
+            fruits = (self.game.boards == OccupancyGrid.FRUIT).sum(axis=1)
+            self.assertTrue((fruits == self.game.fruit_counts).all())
+            self.assertTrue((self.game.fruit_counts <= self.game.reward_limit).all())
+
+    # @unittest.skip("skipping test_germinate")
+    def test_germinate(self):
+        """
+        Test fruit only spawn on free cells, even on boards with a single one left.
+        """
+        inside = np.flatnonzero(self.game._blank == OccupancyGrid.EMPTY)
+        self.game.boards[:, inside] = OccupancyGrid.BODY
+        last = inside[np.arange(32)*7%len(inside)]
+        self.game.boards[np.arange(32), last] = OccupancyGrid.EMPTY
+        self.game.fruit_counts[:] = 0
+        self.game._chances[:] = 1
+        self.game._germinate()
+        self.assertTrue((self.game.boards[np.arange(32), last] == OccupancyGrid.FRUIT).all())
+        self.assertTrue((self.game.fruit_counts == 1).all())
+        self.game._germinate()
+        # full boards are left alone
+        self.assertTrue((self.game.fruit_counts == 1).all())
+
+    # @unittest.skip("skipping test_reset")
+    def test_reset(self):
+        """
+        Test games that end are started over automatically.
+        """
+        obs, rewards, done = self.game.step((self.game.headings+2)%4)
+        # turning back into the body ends every game
+        self.assertTrue(done.all())
+        self.assertEqual(self.game.games_played, 32)
+        self.assertTrue((self.game.lengths == self.game.starting_length).all())
+        self.assertTrue((self.game.scores == 0).all())
+
+class TestReplay(unittest.TestCase):
+    """
+    Test that a recorded game can be rebuilt from its seed, settings and commands.
+    """
+    def setUp(self):
+        data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "record_states": False,
+        }
+        self.game = SnakeGame(**data)
+        self.game_id = self.game.scribe.get_game_instance
+
+    # @unittest.skip("skipping test_replay")
+    def test_replay(self):
+        """
+        Test the replay matches the game after every command, including forced fruit.
+        """
+        states = []
+        turns = [None, 8, None, 1, 3, 7, None, 3, 1, 9, None, None]
+        for turn in turns*5:
+            if self.game.game_over:
+                break
+            if turn in [1, 3]:
+                turn = (self.game.snake.heading+turn)%4
+                # turn right or left
+            self.game.step(turn)
+            states += [copy.deepcopy((self.game.game_state[1:], self.game._score))]
+            # game_state shares the segments' dimensions, which keep changing
+        replay = Replay(self.game.scribe, self.game_id)
+        self.assertEqual(len(replay), len(states))
+        for idx,game in enumerate(replay):
+            self.assertEqual((game.game_state[1:], game._score), states[idx])
+        self.assertIsNone(replay.game.scribe)
+        # replays are never recorded
+        game = replay.seek(3)
+        self.assertEqual(game.game_state[1:], states[2][0])
+
+class TestSelfPlayRunner(unittest.TestCase):
+    """
+    Test that run_games plays games across a pool of processes.
+    """
+    def setUp(self):
+        self.folder = "runner_test"
+        self.tearDown()
+        os.makedirs(self.folder)
+        folder = os.path.dirname(migration.SCHEMA)
+        for name in ["SCHEMA", "FIXTURES"]:
+            with open(os.path.join(folder, f"{name}_data.sql"), "r") as f, open(os.path.join(self.folder, f"{name}_games.sql"), "w") as out:
+                out.write(f.read())
+        self.database = os.path.join(self.folder, "games.db")
+        self.settings = {
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "reward_limit": 3,
+        }
+
+    def tearDown(self):
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+            os.rmdir(self.folder)
+
+    # @unittest.skip("skipping test_run_games")
+    def test_run_games(self):
+        """
+        Test every game is summarized, and the results don't depend on the pool size.
+        """
+        results = run_games(games=6, processes=3, seed=10, settings=self.settings, database=self.database, max_steps=50)
+        self.assertEqual([r["seed"] for r in results], list(range(10, 16)))
+        self.assertEqual(sorted(set(r["worker"] for r in results)), [0, 1, 2])
+        for r in results:
+            for k in ["score", "length", "fruit_count", "alive_bonus"]:
+                self.assertIn(k, r)
+            self.assertTrue(0 < r["steps"] <= 50)
+        again = run_games(games=6, processes=2, seed=10, settings=self.settings, database=self.database, max_steps=50)
+        self.assertEqual(
+                [(r["score"], r["steps"], r["fruit_count"]) for r in results],
+                [(r["score"], r["steps"], r["fruit_count"]) for r in again]
+            )
+
 class TestSnakeGameCmdProcesses(unittest.TestCase):
     """
     Test that the SnakeGame object behaves as 
@@ -137,7 +488,10 @@ class TestSnakeGameCmdProcesses(unittest.TestCase):
         global_game.playing = True
         global_game.crashed = False
         global_game.snake.segments = [Segment([9, 57, 1, 3], 2)]
+        global_game.snake.heading = 2
         # headed south
+        global_game._init_grid()
+        # the grid has to be told about the moved snake
         self.proc = multiprocessing.Process(target=test_setting_next_cmd, args=(global_game, ))
         
     # @unittest.skip("skipping test_cmd_null")
@@ -284,6 +638,1206 @@ class TestSnakeGameCmdProcesses(unittest.TestCase):
         self.assertTrue(SnakeGame.compare_states(run_state, global_game.game_state))
         self.assertListEqual(run_state, global_game.game_state)
 
+class TestScribeBatching(unittest.TestCase):
+    """
+    Test that a Scribe batching its writes records the same game as one that doesn't.
+    """
+    def setUp(self):
+        self.data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "record_batch": 4,
+        }
+        self.game = SnakeGame(**self.data)
+        self.game_id = self.game.scribe.get_game_instance
+
+    def count(self, query):
+        return self.game.scribe.cur.execute(query, (self.game_id, )).fetchone()[0]
+
+    # @unittest.skip("skipping test_flush")
+    def test_flush(self):
+        """
+        Test rows are only written every 'record_batch' updates, and when the game ends.
+        """
+        commands = "SELECT COUNT(*) FROM commands_executed WHERE game=?"
+        states = "SELECT COUNT(*) FROM states WHERE game=?"
+        self.assertEqual(self.count("SELECT COUNT(*) FROM game_instances WHERE id=?"), 1)
+        # the start of the game is written straight away
+        for _ in range(3):
+            self.game.step()
+        self.assertEqual(self.count(commands), 0)
+        self.game.step()
+        self.assertEqual(self.count(commands), 4)
+        self.assertEqual(self.count(states), 4)
+        self.game.step()
+        self.assertEqual(self.count(commands), 4)
+        steps = 5
+        while not self.game.game_over:
+            self.game.step(self.game.snake.heading)
+            steps += 1
+        self.assertEqual(self.count(commands), steps)
+        self.assertIsNotNone(self.count("SELECT end FROM game_instances WHERE id=?"))
+
+    # @unittest.skip("skipping test_replay")
+    def test_replay(self):
+        """
+        Test a batched game replays the same as it was played.
+        """
+        scores = []
+        for turn in [None, 8, 1, 7, None, 3, 9, None]*3:
+            if self.game.game_over:
+                break
+            self.game.step(turn)
+            scores += [copy.deepcopy((self.game.game_state[1:], self.game._score))]
+        replay = Replay(self.game.scribe, self.game_id)
+        self.assertEqual(len(replay), len(scores))
+        for idx,game in enumerate(replay):
+            self.assertEqual((game.game_state[1:], game._score), scores[idx])
+
+class TestScribeDeltas(unittest.TestCase):
+    """
+    Test that states recorded as keyframes and deltas are rebuilt as they were played.
+    """
+    def setUp(self):
+        self.data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 3,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "record_deltas": 5,
+            "seed": 1,
+        }
+
+    # @unittest.skip("skipping test_get_states")
+    def test_get_states(self):
+        """
+        Test every state is rebuilt, for a Snake and a CellSnake, while growing and turning.
+        """
+        for cell_body in [False, True]:
+            game = SnakeGame(**dict(self.data, cell_body=cell_body))
+            game_id = game.scribe.get_game_instance
+            expected = []
+            for turn in [None, 8, None, 1, 7, None, 3, 9, None, None, 1]*4:
+                if game.game_over:
+                    break
+                if turn in [1, 3]:
+                    turn = (game.snake.heading+turn)%4
+                    # turn right or left
+                state_id = game.scribe.get_state
+                game.step(turn)
+                if game.scribe.get_state != state_id:
+                    # a state was recorded
+                    expected += [{
+                            "score": game.score,
+                            "heading": game.snake.heading,
+                            "belly": game.snake.belly,
+                            "cells": snake_cells(game.snake),
+                            "fruits": sorted([ (f.x, f.y, f.name) for f in game.rewards ]),
+                        }]
+            states = list(game.scribe.get_states(game_id))
+            self.assertGreater(len(expected), 10)
+            self.assertEqual(states, expected)
+            keyframes = game.scribe.cur.execute("""SELECT COUNT(*) FROM snake_keyframes INNER JOIN states
+                ON snake_keyframes.state=states.id WHERE states.game=?""", (game_id, )).fetchone()[0]
+            self.assertEqual(keyframes, (len(expected)+4)//5)
+
+    # @unittest.skip("skipping test_iter_states")
+    def test_iter_states(self):
+        """
+        Test states are rebuilt page by page the same, whether they were recorded whole or as deltas.
+        """
+        for record_deltas in [None, 5]:
+            game = SnakeGame(**dict(self.data, record_deltas=record_deltas))
+            game_id = game.scribe.get_game_instance
+            expected = []
+            for turn in [None, 8, None, 1, 7, None, 3, 9, None, None, 1]*4:
+                if game.game_over:
+                    break
+                if turn in [1, 3]:
+                    turn = (game.snake.heading+turn)%4
+                state_id = game.scribe.get_state
+                game.step(turn)
+                if game.scribe.get_state != state_id:
+                    expected += [{
+                            "score": game.score,
+                            "heading": game.snake.heading,
+                            "belly": game.snake.belly,
+                            "cells": snake_cells(game.snake),
+                            "fruits": sorted([ (f.x, f.y, f.name) for f in game.rewards ]),
+                        }]
+            self.assertGreater(len(expected), 10)
+            for batch in [1, 3, 1000]:
+                self.assertEqual(list(game.scribe.iter_states(game_id, batch=batch)), expected)
+
+class TestLoadGame(unittest.TestCase):
+    """
+    Test that a whole game is loaded as columns of NumPy arrays.
+    """
+    def setUp(self):
+        self.data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 3,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "seed": 1,
+        }
+
+    def play(self, **settings):
+        """
+        Play a game, and return it, its id, and what it looked like after each recorded state.
+        """
+        game = SnakeGame(**dict(self.data, **settings))
+        game_id = game.scribe.get_game_instance
+        expected = []
+        for turn in [None, 8, None, 1, 7, None, 3, 9, None, None, 1]*4:
+            if game.game_over:
+                break
+            if turn in [1, 3]:
+                turn = (game.snake.heading+turn)%4
+            state_id = game.scribe.get_state
+            game.step(turn)
+            if game.scribe.get_state != state_id:
+                expected += [(game.score, game.snake.belly, game.snake.length, game.snake.heading,
+                    snake_cells(game.snake), sorted([ (f.x, f.y) for f in game.rewards ]))]
+        return game, game_id, expected
+
+    # @unittest.skip("skipping test_load_game")
+    def test_load_game(self):
+        """
+        Test the columns match the game as it was played, whether states are recorded whole or as deltas.
+        """
+        loaded = []
+        for record_deltas in [None, 5]:
+            game, game_id, expected = self.play(record_deltas=record_deltas)
+            columns = game.scribe.load_game(game_id)
+            self.assertGreater(len(expected), 10)
+            self.assertEqual(len(columns["state"]), len(expected))
+            self.assertEqual(columns["state"].dtype, np.int64)
+            self.assertEqual(columns["tick"].tolist(), list(range(len(expected))))
+            self.assertEqual(columns["score"].tolist(), [ e[0] for e in expected ])
+            self.assertEqual(columns["belly"].tolist(), [ e[1] for e in expected ])
+            self.assertEqual(columns["length"].tolist(), [ e[2] for e in expected ])
+            self.assertEqual(columns["action"].tolist(), [ e[3] for e in expected ])
+            self.assertEqual(list(zip(columns["head_x"].tolist(), columns["head_y"].tolist())),
+                [ e[4][0] for e in expected ])
+            offsets = columns["cell_offsets"]
+            self.assertEqual([ tuple(map(tuple, columns["cells"][offsets[i]:offsets[i+1]].tolist()))
+                for i in range(len(expected)) ], [ e[4] for e in expected ])
+            offsets = columns["fruit_offsets"]
+            self.assertEqual([ sorted(map(tuple, columns["fruits"][offsets[i]:offsets[i+1], :2].tolist()))
+                for i in range(len(expected)) ], [ e[5] for e in expected ])
+            self.assertEqual(columns["commands"].tolist(), game.scribe.get_replay(game_id)["commands"])
+            loaded += [columns]
+        for name in loaded[0]:
+            if name not in ["state", "fruits"]:
+                # the same game is loaded the same, however it was recorded
+                self.assertEqual(loaded[0][name].tolist(), loaded[1][name].tolist(), name)
+        self.assertEqual(loaded[0]["fruits"][:, :2].tolist(), loaded[1]["fruits"][:, :2].tolist())
+        # each game registers its own fruit species
+
+    # @unittest.skip("skipping test_load_deltas")
+    def test_load_deltas(self):
+        """
+        Test a long game recorded as deltas is loaded the same as its states are rebuilt one at a time.
+        """
+        rand = np.random.default_rng(4)
+        played = 0
+        for seed in range(4):
+            game = SnakeGame(**dict(self.data, seed=seed, record_deltas=7, reward_limit=5, height=200, width=200))
+            game_id = game.scribe.get_game_instance
+            for _ in range(300):
+                if game.game_over:
+                    break
+                features = game.features()
+                turns = [ turn for idx, turn in enumerate([0, 1, 3]) if not features[idx] ] or [0]
+                # turns that don't kill the snake, and of those the ones towards the nearest fruit
+                towards = [ turn for turn in turns if features[[9, 8, 10, 7][(game.snake.heading+turn)%4]] ]
+                game.step(int((game.snake.heading+rand.choice(towards or turns))%4))
+            columns = game.scribe.load_game(game_id)
+            states = list(game.scribe.iter_states(game_id))
+            played += len(states)
+            self.assertGreater(columns["length"][-1], columns["length"][0])
+            species = { name: species_id for species_id, name in game.scribe.cur.execute("SELECT id, name FROM fruits") }
+            offsets, fruit_offsets = columns["cell_offsets"], columns["fruit_offsets"]
+            self.assertEqual(len(offsets), len(states)+1)
+            for i, state in enumerate(states):
+                self.assertEqual(columns["belly"][i], state["belly"])
+                self.assertEqual(tuple(map(tuple, columns["cells"][offsets[i]:offsets[i+1]].tolist())), state["cells"])
+                self.assertEqual(columns["fruits"][fruit_offsets[i]:fruit_offsets[i+1]].tolist(),
+                    sorted([ [x, y, species[name]] for x, y, name in state["fruits"] ]))
+        self.assertGreater(played, 500)
+
+class TestAsyncScribe(unittest.TestCase):
+    """
+    Test that an AsyncScribe records games from its writer thread.
+    """
+    def setUp(self):
+        self.folder = "async_test"
+        self.tearDown()
+        os.makedirs(self.folder)
+        folder = os.path.dirname(migration.SCHEMA)
+        for name in ["SCHEMA", "FIXTURES"]:
+            with open(os.path.join(folder, f"{name}_data.sql"), "r") as f, open(os.path.join(self.folder, f"{name}_games.sql"), "w") as out:
+                out.write(f.read())
+        self.database = os.path.join(self.folder, "games.db")
+        self.data = {
+            "database": self.database,
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "record_async": True,
+        }
+
+    def tearDown(self):
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+            os.rmdir(self.folder)
+
+    # @unittest.skip("skipping test_replay")
+    def test_replay(self):
+        """
+        Test every command is written once the game ends, and the game replays.
+        """
+        game = SnakeGame(**self.data)
+        self.assertIsInstance(game.scribe, AsyncScribe)
+        game_id = game.scribe.get_game_instance
+        states = []
+        for turn in [None, 8, 1, 7, None, 3, 9, None]*3:
+            if game.game_over:
+                break
+            game.step(turn)
+            states += [copy.deepcopy((game.game_state[1:], game._score))]
+        game.scribe.flush()
+        replay = Replay(game.scribe, game_id)
+        self.assertEqual(len(replay), len(states))
+        for idx,replayed in enumerate(replay):
+            self.assertEqual((replayed.game_state[1:], replayed._score), states[idx])
+        game.scribe.close()
+        self.assertFalse(game.scribe._writer.is_alive())
+
+    # @unittest.skip("skipping test_drop")
+    def test_drop(self):
+        """
+        Test ticks' states are thrown away while the writer is stuck, but never the commands executed.
+        """
+        writing = threading.Event()
+        drain = AsyncScribe._drain
+        def stuck(connect, rows_queue):
+            writing.wait()
+            drain(connect, rows_queue)
+        # the writer takes nothing off the queue until 'writing' is set
+        with mock.patch.object(AsyncScribe, "_drain", stuck):
+            scribe = AsyncScribe(self.database, queue_size=1, overflow="drop")
+        game_id = get_uuid()
+        query = "INSERT INTO 'commands_executed' ('id', 'timestamp', 'command', 'game') VALUES (?, ?, ?, ?) "
+        for cmd in range(10):
+            scribe.write(query, (scribe.new_id(), get_timestamp(), cmd%4, game_id, ))
+            scribe.tick()
+        self.assertEqual(scribe.dropped, 9)
+        # the queue holds the first tick, and has no room for the rest
+        writing.set()
+        scribe.flush()
+        rows = scribe.cur.execute("SELECT COUNT(*) FROM commands_executed WHERE game=?", (game_id, )).fetchone()
+        self.assertEqual(rows[0], 10)
+        scribe.close()
+
+    # @unittest.skip("skipping test_drop_keyframes")
+    def test_drop_keyframes(self):
+        """
+        Test the states recorded after some are dropped are whole, and the game still replays.
+        """
+        writing = threading.Event()
+        writing.set()
+        drain = AsyncScribe._drain
+        def stuck(connect, rows_queue):
+            get = rows_queue.get
+            def wait_then_get(*args, **kwargs):
+                writing.wait()
+                return get(*args, **kwargs)
+            rows_queue.get = wait_then_get
+            drain(connect, rows_queue)
+        # the writer takes nothing more off the queue while 'writing' is clear
+        with mock.patch.object(AsyncScribe, "_drain", stuck):
+            game = SnakeGame(**dict(self.data, seed=3, record_overflow="drop", record_deltas=4))
+        game_id = game.scribe.get_game_instance
+        size, game.scribe._queue.maxsize = game.scribe._queue.maxsize, 2
+        writing.clear()
+        # once the game has started, a couple of ticks fit on the queue and the rest are dropped
+        rand = np.random.default_rng(3)
+        played, expected = [], []
+        for idx in range(20):
+            if game.game_over:
+                break
+            if idx == 10:
+                game.scribe._queue.maxsize = size
+                writing.set()
+                game.scribe.flush()
+            features = game.features()
+            turns = [ turn for idx, turn in enumerate([0, 1, 3]) if not features[idx] ] or [0]
+            # keep the snake alive, so the game doesn't end (and flush) while the writer is stuck
+            game.step(int((game.snake.heading+rand.choice(turns))%4))
+            played += [(game._score, snake_cells(game.snake))]
+            if writing.is_set():
+                expected += [snake_cells(game.snake)]
+        self.assertGreater(game.scribe.dropped, 0)
+        self.assertGreater(len(expected), 4)
+        game.scribe.flush()
+        states = list(game.scribe.get_states(game_id))
+        self.assertEqual([ state["cells"] for state in states[-len(expected):] ], expected)
+        self.assertEqual([ (replayed._score, snake_cells(replayed.snake)) for replayed in Replay(game.scribe, game_id) ], played)
+        # every command was written, dropped tick or not
+        game.scribe.close()
+
+class TestMigrate(unittest.TestCase):
+    """
+    Test that a database keyed by UUIDs is copied into one keyed by integers.
+    """
+    def setUp(self):
+        self.source = "legacy_test.db"
+        self.destination = "migrated_test.db"
+        self.current = "current_test.db"
+        self.tearDown()
+        with open(migration.SCHEMA, "r") as f:
+            schema = f.read()
+        schema = schema.replace("PRAGMA user_version = 2;", "")
+        keyframes = schema.index('CREATE TABLE IF NOT EXISTS "snake_keyframes"')
+        schema = re.sub(r'("id"\s+)INTEGER PRIMARY KEY,', r'\1TEXT PRIMARY KEY,', schema[:keyframes])+schema[keyframes:]
+        schema = re.sub(r'\n\s+"uuid"\s+TEXT UNIQUE,', '', schema)
+        # the same tables, keyed by UUIDs as they were before version 2;
+        # the tables for keyframes and deltas were always keyed by integers
+        connection = sqlite3.connect(self.source)
+        connection.executescript(schema)
+        connection.close()
+
+    def tearDown(self):
+        for path in [self.source, self.destination, self.current]:
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(path+suffix):
+                    os.remove(path+suffix)
+
+    # @unittest.skip("skipping test_migrate")
+    def test_migrate(self):
+        """
+        Test a migrated game is replayed and rebuilt the same, and is found by its UUID.
+        """
+        game = SnakeGame(testing=True, height=100, width=100, size=10, auto_tick=False, headless=True,
+            seed=1, record_deltas=5, database=self.source)
+        game_uuid = game.scribe.get_game_instance
+        self.assertIsInstance(game_uuid, uuid.UUID)
+        for turn in [None, 8, None, 7, None, 9]*4:
+            if game.game_over:
+                break
+            game.step(turn)
+        game.scribe.flush()
+        legacy = Scribe(self.source)
+        states = list(legacy.get_states(game_uuid))
+        replayed = [ g.game_state[1:] for g in Replay(legacy, game_uuid) ]
+
+        counts = migration.migrate(self.source, self.destination)
+        self.assertEqual(migration.schema_version(self.destination), 2)
+        self.assertEqual(counts["states"], len(states))
+        scribe = Scribe(self.destination)
+        game_id = scribe.get_game_id(game_uuid)
+        self.assertIsInstance(game_id, int)
+        self.assertEqual(list(scribe.get_states(game_id)), states)
+        self.assertEqual([ g.game_state[1:] for g in Replay(scribe, game_id) ], replayed)
+        blocks = lambda: scribe.cur.execute("SELECT COUNT(*) FROM id_blocks").fetchone()[0]
+        reserved = blocks()
+        Scribe(self.destination)
+        self.assertEqual(blocks(), reserved)
+        # a Scribe that only reads never reserves a block of ids
+        self.assertGreater(scribe.new_id(), 2**32)
+        # new rows never collide with migrated ones
+        scribe.new_id()
+        self.assertEqual(blocks(), reserved+1)
+        with self.assertRaises(FileExistsError):
+            migration.migrate(self.source, self.destination)
+
+    # @unittest.skip("skipping test_migrate_whole")
+    def test_migrate_whole(self):
+        """
+        Test a game recorded without deltas reads back the same once migrated, and is
+        loaded as it is when recorded into a database keyed by integers.
+        """
+        fixtures = os.path.join(os.path.dirname(migration.SCHEMA), "FIXTURES_data.sql")
+        games = []
+        for database in [self.source, SQLiteInterface(self.current, schema=migration.SCHEMA, fixtures=fixtures)]:
+            game = SnakeGame(testing=True, height=100, width=100, size=10, auto_tick=False, headless=True,
+                seed=1, database=database)
+            games += [game.scribe.get_game_instance]
+            for turn in [None, 8, None, 1, 7, None, 3, 9, None, None, 1]*4:
+                if game.game_over:
+                    break
+                if turn in [1, 3]:
+                    turn = (game.snake.heading+turn)%4
+                game.step(turn)
+            game.scribe.flush()
+        legacy = Scribe(self.source)
+        states = list(legacy.get_states(games[0]))
+        self.assertGreater(max([ len(state["fruits"]) for state in states ]), 1)
+
+        migration.migrate(self.source, self.destination)
+        scribe = Scribe(self.destination)
+        game_id = scribe.get_game_id(games[0])
+        self.assertEqual(list(scribe.get_states(game_id)), states)
+        migrated = scribe.load_game(game_id)
+        recorded = Scribe(self.current).load_game(games[1])
+        for column in ["score", "belly", "length", "head_x", "head_y", "action", "cells", "commands"]:
+            self.assertEqual(migrated[column].tolist(), recorded[column].tolist(), column)
+        self.assertGreater(len(set(migrated["action"].tolist())), 1)
+
+    # @unittest.skip("skipping test_added_columns")
+    def test_added_columns(self):
+        """
+        Test a database created before the seed and starting_length columns gets them, and records games again.
+        """
+        os.remove(self.source)
+        with open(migration.SCHEMA, "r") as f:
+            schema = f.read()
+        schema = schema.replace("PRAGMA user_version = 2;", "")
+        keyframes = schema.index('CREATE TABLE IF NOT EXISTS "snake_keyframes"')
+        schema = re.sub(r'("id"\s+)INTEGER PRIMARY KEY,', r'\1TEXT PRIMARY KEY,', schema[:keyframes])
+        schema = re.sub(r'\n\s+"uuid"\s+TEXT UNIQUE,', '', schema)
+        schema = re.sub(r',\n\s+"starting_length"[^\n]*', '', schema)
+        schema = re.sub(r'\n\s+"seed"[^\n]*\n\s+--[^\n]*', '', schema)
+        # the tables as they were before games could be replayed
+        connection = sqlite3.connect(self.source)
+        connection.executescript(schema)
+        self.assertNotIn("seed", migration.columns(connection, "game_instances"))
+        connection.close()
+        game = SnakeGame(testing=True, height=100, width=100, size=10, auto_tick=False, headless=True,
+            seed=3, starting_length=2, database=self.source)
+        game_uuid = game.scribe.get_game_instance
+        game.step(None)
+        replay = game.scribe.get_replay(game_uuid)
+        self.assertEqual((replay["seed"], replay["settings"]["starting_length"]), (3, 2))
+        self.assertEqual(scribe_module.add_columns(self.source), [])
+        fixtures = os.path.join(os.path.dirname(migration.SCHEMA), "FIXTURES_data.sql")
+        SQLiteInterface(self.current, schema=migration.SCHEMA, fixtures=fixtures)
+        with mock.patch.object(scribe_module, "ADDED_COLUMNS", [("game_instances", "extra", "INTEGER")]):
+            self.assertEqual(scribe_module.add_columns(self.current), [])
+            # a database at SCHEMA_VERSION isn't checked for columns
+            self.assertEqual(scribe_module.add_columns(self.source), ["game_instances.extra"])
+
+class TestMerge(unittest.TestCase):
+    """
+    Test that shards recorded by parallel workers are folded into one database.
+    """
+    def setUp(self):
+        self.folder = "merge_test"
+        self.tearDown()
+        os.makedirs(self.folder)
+        folder = os.path.dirname(migration.SCHEMA)
+        for name in ["SCHEMA", "FIXTURES"]:
+            with open(os.path.join(folder, f"{name}_data.sql"), "r") as f, open(os.path.join(self.folder, f"{name}_games.sql"), "w") as out:
+                out.write(f.read())
+        self.database = os.path.join(self.folder, "games.db")
+        self.settings = {
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "reward_limit": 3,
+        }
+
+    def tearDown(self):
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+            os.rmdir(self.folder)
+
+    # @unittest.skip("skipping test_merge")
+    def test_merge(self):
+        """
+        Test every game is merged and replayed the same, and shared rows are only merged once.
+        """
+        results = run_games(games=4, processes=2, seed=20, settings=self.settings, database=self.database,
+            max_steps=30, merge=True)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["FIXTURES_games.sql", "SCHEMA_games.sql", "games.db"])
+        connection = sqlite3.connect(self.database)
+        count = lambda query: connection.execute(query).fetchone()[0]
+        self.assertEqual(count("SELECT COUNT(*) FROM game_instances"), 4)
+        self.assertEqual(count("SELECT COUNT(*) FROM game_settings WHERE height=100"), 1)
+        self.assertEqual(count("SELECT COUNT(*) FROM fruits"), count("SELECT COUNT(DISTINCT name) FROM fruits"))
+        self.assertEqual(count("SELECT COUNT(*) FROM commands"), 14)
+        self.assertGreater(count("SELECT COUNT(*) FROM states"), 4)
+        self.assertEqual(count("""SELECT COUNT(*) FROM states LEFT JOIN game_instances
+            ON states.game=game_instances.id WHERE game_instances.id IS NULL"""), 0)
+        games = connection.execute("SELECT id, seed FROM game_instances").fetchall()
+        connection.close()
+        scribe = Scribe(self.database)
+        scores = { r["seed"]: r["score"] for r in results }
+        for game_id, seed in games:
+            replay = Replay(scribe, game_id)
+            self.assertEqual(replay.seek(len(replay)).score, scores[seed])
+            recorded = scribe.cur.execute("SELECT COUNT(*) FROM states WHERE game=?", (game_id, )).fetchone()[0]
+            self.assertEqual(len(list(scribe.iter_states(game_id))), recorded)
+        del scribe
+
+        run_games(games=2, processes=1, seed=30, settings=self.settings, database=self.database, max_steps=10)
+        shard = os.path.join(self.folder, "games_w0.db")
+        counts = merge_shards(self.database, [shard])
+        self.assertEqual(counts["game_instances"], 2)
+        self.assertEqual(counts["game_settings"], 0)
+        with self.assertRaises(ValueError):
+            merge_shards(self.database, [shard])
+
+class TestExport(unittest.TestCase):
+    """
+    Test that recorded games are exported as shards of transitions.
+    """
+    def setUp(self):
+        self.database = "export_test.db"
+        self.folder = "export_test"
+        self.tearDown()
+        fixtures = os.path.join(os.path.dirname(migration.SCHEMA), "FIXTURES_data.sql")
+        self.db = SQLiteInterface(self.database, schema=migration.SCHEMA, fixtures=fixtures)
+
+    def tearDown(self):
+        if os.path.exists(self.database):
+            os.remove(self.database)
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+            os.rmdir(self.folder)
+
+    # @unittest.skip("skipping test_export")
+    def test_export(self):
+        """
+        Test every move of every game is exported once, with the features, action, and reward it was played with,
+        however its states were recorded and whatever fruits it spawned; moves that turn back, and the first move,
+        which no recorded state comes before, are left out.
+        """
+        fruits = {
+            "plum": lambda dimensions: Fruit("plum", dimensions, 5, color=(128,0,128), frequency=0.5 ),
+            "apple": lambda dimensions: Fruit("apple", dimensions, 1, color=(255,0,0), frequency=0.3 ),
+        }
+        expected = []
+        for seed, kwargs in [(1, {}), (2, {"record_deltas": 4, "fruits": fruits}), (3, {"fruits": fruits, "reward_limit": 5})]:
+            game = SnakeGame(testing=True, height=100, width=100, size=10, auto_tick=False, headless=True,
+                seed=seed, database=self.database, **kwargs)
+            game_id = game.scribe.get_game_instance
+            for step, turn in enumerate([None, 1, None, None, 3, None, 2, None, 1, None]*3):
+                if game.game_over:
+                    break
+                heading = game.snake.heading
+                features = game.features().copy()
+                reward, done = game.step((heading+turn)%4 if turn is not None else None)
+                if step > 0 and turn != 2:
+                    expected += [(game_id, features.tolist(), [0, 1, -1, 2][turn or 0], reward, game.features().tolist(), done)]
+            game.scribe.flush()
+            del game
+        paths = export.export(self.database, self.folder, shard_size=7)
+        self.assertEqual(len(paths), -(-len(expected)//7))
+        shards = [ export.read_shard(path) for path in paths ]
+        self.assertTrue(all([ len(shard["game"]) == 7 for shard in shards[:-1] ]))
+        columns = { name: np.concatenate([ shard[name] for shard in shards ]) for name in export.COLUMNS }
+        self.assertEqual(columns["features"].dtype, np.float32)
+        exported = list(zip(columns["game"].tolist(), columns["features"].tolist(), columns["action"].tolist(),
+            columns["reward"].tolist(), columns["next_features"].tolist(), columns["done"].tolist()))
+        self.assertEqual(len(exported), len(expected))
+        for row, (game_id, features, action, reward, next_features, done) in zip(exported, expected):
+            self.assertEqual(row[:3], (game_id, features, action))
+            self.assertAlmostEqual(row[3], reward, places=4)
+            self.assertEqual(row[4:], (next_features, done))
+        with self.assertRaises(ValueError):
+            export.export(self.database, self.folder, format="csv")
+
+class TestReplayMemory(unittest.TestCase):
+    """
+    Test that transitions are kept in a fixed-size ring buffer of NumPy arrays.
+    """
+    def setUp(self):
+        self.folder = "memory_test"
+        self.tearDown()
+        self.rand = np.random.default_rng(4)
+
+    def tearDown(self):
+        for folder in [self.folder, self.folder+"_uniform"]:
+            if os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    os.remove(os.path.join(folder, name))
+                os.rmdir(folder)
+
+    def transitions(self, count):
+        states = self.rand.random((count+1, 11), dtype=np.float32)
+        return (states[:-1], self.rand.integers(0, 3, count).astype(np.int8),
+            self.rand.random(count, dtype=np.float32), states[1:], self.rand.random(count) < 0.1)
+
+    # @unittest.skip("skipping test_push")
+    def test_push(self):
+        """
+        Test the oldest transitions are replaced once the memory is full, the same whether pushed or extended.
+        """
+        columns = self.transitions(25)
+        pushed = ReplayMemory(capacity=10)
+        extended = ReplayMemory(capacity=10)
+        for idx in range(25):
+            slot = pushed.push(*[ column[idx] for column in columns ])
+            self.assertEqual(slot, idx%10)
+            self.assertEqual(len(pushed), min(idx+1, 10))
+        extended.extend(*[ column[:4] for column in columns ])
+        extended.extend(*[ column[4:] for column in columns ])
+        for memory in [pushed, extended]:
+            self.assertEqual((memory.position, len(memory)), (5, 10))
+            batch = memory.batch(np.arange(10))
+            for column, values in zip(columns, batch[:5]):
+                self.assertTrue(np.array_equal(values, np.roll(column[15:], 5, axis=0)))
+
+    # @unittest.skip("skipping test_sample")
+    def test_sample(self):
+        """
+        Test a sample is made of different transitions held by the memory.
+        """
+        columns = self.transitions(40)
+        memory = ReplayMemory(capacity=100, seed=1)
+        memory.extend(*columns)
+        batch = memory.sample(16)
+        self.assertEqual(len(set(batch.indices.tolist())), 16)
+        self.assertTrue(all(0 <= idx < 40 for idx in batch.indices))
+        for column, values in zip(columns, batch[:5]):
+            self.assertTrue(np.array_equal(values, column[batch.indices]))
+        self.assertEqual(sorted(memory.sample(100).indices.tolist()), list(range(40)))
+
+    # @unittest.skip("skipping test_save")
+    def test_save(self):
+        """
+        Test a memory saved to a folder is loaded memory-mapped, and keeps recording where it left off.
+        """
+        columns = self.transitions(15)
+        memory = ReplayMemory(capacity=10)
+        memory.extend(*[ column[:12] for column in columns ])
+        memory.save(self.folder)
+        loaded = ReplayMemory.load(self.folder)
+        self.assertIsInstance(loaded.states, np.memmap)
+        self.assertEqual((loaded.capacity, loaded.position, len(loaded)), (10, 2, 10))
+        for name, dtype in ReplayMemory.FIELDS:
+            self.assertTrue(np.array_equal(getattr(loaded, name), getattr(memory, name)))
+        loaded.extend(*[ column[12:] for column in columns ])
+        loaded.save()
+        del loaded
+        reloaded = ReplayMemory.load(self.folder)
+        self.assertEqual(reloaded.position, 5)
+        self.assertTrue(np.array_equal(reloaded.states[:5], columns[0][10:]))
+        with self.assertRaises(ValueError):
+            ReplayMemory(capacity=20, folder=self.folder)
+        with self.assertRaises(ValueError):
+            ReplayMemory().save()
+
+    # @unittest.skip("skipping test_td_targets")
+    def test_td_targets(self):
+        """
+        Test a batch's targets match those worked out one transition at a time.
+        """
+        memory = ReplayMemory(capacity=50, seed=2)
+        memory.extend(*self.transitions(50))
+        batch = memory.sample(20)
+        q_values = self.rand.random((20, 3), dtype=np.float32)
+        next_q_values = self.rand.random((20, 3), dtype=np.float32)
+        targets, errors = td_targets(q_values, next_q_values, batch, 0.9)
+        for idx in range(20):
+            target = batch.rewards[idx]
+            if not batch.dones[idx]:
+                target = batch.rewards[idx]+0.9*np.amax(next_q_values[idx])
+            expected = q_values[idx].copy()
+            expected[batch.actions[idx]] = target
+            self.assertTrue(np.allclose(targets[idx], expected))
+            self.assertAlmostEqual(errors[idx], target-q_values[idx][batch.actions[idx]], places=5)
+        self.assertTrue(batch.dones.any())
+
+    # @unittest.skip("skipping test_sum_tree")
+    def test_sum_tree(self):
+        """
+        Test running totals are found in the same slot as by searching a cumulative sum.
+        """
+        priorities = self.rand.random(13)
+        priorities[[4, 5]] = 0
+        tree = SumTree(13)
+        tree.update(np.arange(13), priorities)
+        for idx in [0, 7, 12]:
+            priorities[idx] = self.rand.random()
+            tree.set(idx, priorities[idx])
+        tree.update([3, 9], [2.0, 0.5])
+        priorities[[3, 9]] = [2.0, 0.5]
+        self.assertAlmostEqual(tree.total, priorities.sum())
+        self.assertTrue(np.allclose(tree[np.arange(13)], priorities))
+        values = self.rand.random(200)*priorities.sum()
+        self.assertEqual(tree.find(values).tolist(),
+            np.searchsorted(np.cumsum(priorities), values, side="right").tolist())
+        self.assertEqual(tree.find([priorities[:4].sum()]).tolist(), [6])
+        # empty slots are skipped
+
+    # @unittest.skip("skipping test_prioritized")
+    def test_prioritized(self):
+        """
+        Test transitions are picked in proportion to their priority, with weights that make up for it.
+        """
+        memory = PrioritizedReplayMemory(capacity=8, alpha=1.0, beta=1.0, epsilon=0, seed=3)
+        memory.extend(*self.transitions(4))
+        self.assertTrue(np.allclose(memory.tree[np.arange(4)], 1.0))
+        memory.update_priorities(np.arange(4), np.array([1.0, -3.0, 0.0, 4.0]))
+        slot = memory.push(*[ column[0] for column in self.transitions(1) ])
+        self.assertEqual(memory.tree[slot], 4.0)
+        # new transitions get the highest priority yet
+        counts = np.zeros(8)
+        for _ in range(200):
+            batch = memory.sample(4)
+            np.add.at(counts, batch.indices, 1)
+        self.assertEqual(counts[2], 0)
+        self.assertTrue(np.allclose(counts[:5]/counts.sum(), [1/12, 3/12, 0, 4/12, 4/12], atol=0.03))
+        batch = memory.batch(np.array([0, 1, 3]))
+        self.assertTrue(np.allclose(batch.weights, [1, 1/3, 1/4]))
+        self.assertIsNone(ReplayMemory(capacity=8).sample(4).weights)
+        memory.save(self.folder)
+        loaded = PrioritizedReplayMemory.load(self.folder)
+        self.assertTrue(np.allclose(loaded.tree[np.arange(8)], memory.tree[np.arange(8)]))
+        self.assertEqual(loaded.max_priority, 4.0)
+        uniform = ReplayMemory(capacity=8)
+        uniform.extend(*self.transitions(3))
+        uniform.save(self.folder+"_uniform")
+        loaded = PrioritizedReplayMemory.load(self.folder+"_uniform")
+        self.assertEqual(loaded.tree[np.arange(8)].tolist(), [1.0]*3+[0.0]*5)
+        batch = loaded.sample(3)
+        self.assertTrue(np.allclose(batch.weights, 1))
+
+class TestDenseNetwork(unittest.TestCase):
+    """
+    Test that Dense layers are evaluated with NumPy.
+    """
+    def setUp(self):
+        self.path = "network_test.npz"
+        self.tearDown()
+        rand = np.random.default_rng(5)
+        sizes = [11, 120, 120, 120, 3]
+        self.layers = [ (rand.normal(scale=0.2, size=(n, m)), rand.normal(scale=0.2, size=m), "relu")
+            for n, m in zip(sizes[:-1], sizes[1:]) ]
+        self.layers[-1] = self.layers[-1][:2]+("softmax", )
+        self.states = rand.random((6, 11))
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # @unittest.skip("skipping test_forward")
+    def test_forward(self):
+        """
+        Test a batch of states gives the same outputs as working through the layers one state at a time.
+        """
+        network = DenseNetwork(self.layers)
+        self.assertEqual((network.inputs, network.outputs), (11, 3))
+        outputs = network(self.states)
+        self.assertEqual(outputs.shape, (6, 3))
+        for state, output in zip(self.states, outputs):
+            values = state
+            for weights, biases, activation in self.layers:
+                values = values @ weights + biases
+                values = np.maximum(values, 0) if activation == "relu" else np.exp(values)/np.exp(values).sum()
+            self.assertTrue(np.allclose(output, values, rtol=1e-4, atol=1e-6))
+            self.assertTrue(np.allclose(network(state), output))
+        self.assertTrue(np.allclose(outputs.sum(axis=1), 1))
+        network.save(self.path)
+        loaded = DenseNetwork.load(self.path)
+        self.assertEqual([ layer[2] for layer in loaded.layers ], ["relu", "relu", "relu", "softmax"])
+        self.assertTrue(np.array_equal(loaded(self.states), outputs))
+        with self.assertRaises(ValueError):
+            DenseNetwork([(np.ones((11, 3)), np.zeros(3), "swish")])
+
+def act_remotely(client, states, results):
+    """
+    Ask an InferenceServer in the parent process for an action per state.
+    """
+    results.put([ client.act(state) for state in states ])
+
+class TestInferenceServer(unittest.TestCase):
+    """
+    Test that moves for many games are picked in shared batches.
+    """
+    def setUp(self):
+        rand = np.random.default_rng(6)
+        sizes = [11, 32, 3]
+        self.network = DenseNetwork([ (rand.normal(size=(n, m)), rand.normal(size=m), "relu")
+            for n, m in zip(sizes[:-1], sizes[1:]) ])
+        self.data = {
+            "testing": True,
+            "height": 100,
+            "width": 100,
+            "size": 10,
+            "starting_length": 2,
+            "auto_tick": False,
+            "headless": True,
+            "reward_limit": 3,
+            "record_states": False,
+        }
+        self.shards = []
+
+    def tearDown(self):
+        for path in self.shards:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def play_alone(self, seed, steps):
+        """
+        The scores and steps of a game whose moves come straight from the network.
+        """
+        game = SnakeGame(**dict(self.data, seed=seed))
+        for _ in range(steps):
+            if game.game_over:
+                break
+            game.step((game.snake.heading+TURNS[np.argmax(self.network(game.features()))])%4)
+        return game.score, game.game_over
+
+    # @unittest.skip("skipping test_threads")
+    def test_threads(self):
+        """
+        Test games in many threads get the moves the network would pick for each of them alone, in fewer batches than moves.
+        """
+        sizes = []
+        def policy(states):
+            sizes.append(len(states))
+            return self.network(states)
+        results = {}
+        def run(seed):
+            game = SnakeGame(**dict(self.data, seed=seed, database_shard=seed))
+            steps = play_served(game, server, max_steps=40)
+            results[seed] = (game.score, game.game_over, steps)
+            del game
+        with InferenceServer(policy, max_batch=4, max_wait=0.05) as server:
+            threads = [ threading.Thread(target=run, args=(seed, )) for seed in range(8) ]
+            self.shards = [ shard_path("data.db", seed) for seed in range(8) ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(results), list(range(8)))
+        for seed, (score, over, steps) in results.items():
+            self.assertEqual(self.play_alone(seed, steps), (score, over))
+        self.assertEqual(sum(sizes), server.served)
+        self.assertEqual(sum(steps for score, over, steps in results.values()), server.served)
+        self.assertLessEqual(max(sizes), 4)
+        self.assertLess(server.batches, server.served)
+        with self.assertRaises(RuntimeError):
+            server.submit(np.zeros(11))
+
+    # @unittest.skip("skipping test_processes")
+    def test_processes(self):
+        """
+        Test games in other processes are answered through clients, and a policy's errors reach the caller.
+        """
+        states = np.random.default_rng(7).random((5, 11), dtype=np.float32)
+        results = multiprocessing.Queue()
+        with InferenceServer(self.network, max_batch=8, max_wait=0.01) as server:
+            processes = [ multiprocessing.Process(target=act_remotely, args=(server.client(), states[idx:], results))
+                for idx in range(3) ]
+            for process in processes:
+                process.start()
+            answers = sorted([ results.get(timeout=30) for _ in processes ], key=len)
+            for process in processes:
+                process.join()
+        expected = np.argmax(self.network(states), axis=1).tolist()
+        self.assertEqual(answers, [expected[2:], expected[1:], expected])
+        def broken(states):
+            raise ArithmeticError("broken")
+        with InferenceServer(broken) as server:
+            with self.assertRaises(ArithmeticError):
+                server.act(states[0])
+
+    # @unittest.skip("skipping test_close")
+    def test_close(self):
+        """
+        Test every state submitted while the server closes is answered or refused, never left waiting.
+        """
+        server = InferenceServer(self.network, max_batch=4, max_wait=0.001)
+        futures, refused = [], []
+        def submit():
+            for _ in range(200):
+                try:
+                    futures.append(server.submit(np.zeros(11)))
+                except RuntimeError:
+                    refused.append(True)
+        threads = [ threading.Thread(target=submit) for _ in range(4) ]
+        for thread in threads:
+            thread.start()
+        server.close()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(futures)+len(refused), 800)
+        for future in futures:
+            self.assertIsNone(future.exception(timeout=5))
+
+    # @unittest.skip("skipping test_max_wait")
+    def test_max_wait(self):
+        """
+        Test a state's wait is counted from when it was submitted, not from when the server got to it.
+        """
+        entered, release = threading.Event(), threading.Event()
+        def policy(states):
+            entered.set()
+            release.wait(5)
+            return self.network(states)
+        with InferenceServer(policy, max_batch=8, max_wait=0.5) as server:
+            first = server.submit(np.zeros(11))
+            self.assertTrue(entered.wait(5))
+            second = server.submit(np.ones(11))
+            time.sleep(0.6)
+            # the second state has waited longer than max_wait while the first batch ran
+            release.set()
+            first.result(5)
+            self.assertEqual(second.result(0.3), int(np.argmax(self.network(np.ones(11)))))
+
+def import_dqn():
+    """
+    Import interfaces.DQN, standing in for Keras and pandas if they aren't
+    installed; the tests give each DQN a StubModel instead of a network.
+    """
+    stubs = {}
+    try:
+        import keras
+    except ImportError:
+        for name in ["keras", "keras.optimizers", "keras.models", "keras.layers", "keras.layers.core"]:
+            stubs[name] = types.ModuleType(name)
+        stubs["keras.optimizers"].Adam = None
+        stubs["keras.models"].Sequential = None
+        stubs["keras.layers.core"].Dense = stubs["keras.layers.core"].Dropout = None
+    try:
+        import pandas
+    except ImportError:
+        stubs["pandas"] = types.ModuleType("pandas")
+        stubs["pandas"].DataFrame = dict
+    with mock.patch.dict(sys.modules, stubs):
+        from . import DQN as module
+    return module
+
+class StubLayer(object):
+    """
+    The parts of a Keras Dense layer DenseNetwork.from_keras reads.
+    """
+    def __init__(self, weights, biases, activation):
+        self.weights = [weights, biases]
+        self.activation = activation
+
+    def get_weights(self):
+        return self.weights
+
+    def get_config(self):
+        return {"activation": self.activation}
+
+class StubModel(object):
+    """
+    A one layer network that keeps every call made to it.
+    """
+    def __init__(self, seed=8):
+        rand = np.random.default_rng(seed)
+        self.layers = [StubLayer(rand.normal(size=(11, 3)), rand.normal(size=3), "linear"), StubLayer(None, None, None)]
+        self.layers[1].weights = []
+        # a Dropout layer has no weights
+        self.predicted = []
+        self.fitted = []
+
+    def predict(self, states, batch_size=None):
+        self.predicted.append(np.array(states))
+        weights, biases = self.layers[0].weights
+        return np.asarray(states)@weights+biases
+
+    def fit(self, states, targets, sample_weight=None, batch_size=None, epochs=1, verbose=0):
+        self.fitted.append((np.array(states), np.array(targets), sample_weight, batch_size))
+
+class TestDQN(unittest.TestCase):
+    """
+    Test that the DQN remembers and trains on transitions through its memory.
+    """
+    def setUp(self):
+        self.module = import_dqn()
+        self.rand = np.random.default_rng(9)
+
+    def dqn(self, **kwargs):
+        dqn = self.module.DQN(**dict(kwargs, weights=None))
+        # nothing to save the weights to when the DQN is deleted
+        dqn._model = StubModel()
+        return dqn
+
+    def remember(self, dqn, count):
+        states = self.rand.random((count+1, 11), dtype=np.float32)
+        for idx in range(count):
+            dqn.remember(states[idx], idx%3, float(idx%2), states[idx+1], idx == count-1)
+
+    # @unittest.skip("skipping test_settings")
+    def test_settings(self):
+        """
+        Test settings that aren't given take their default value, and a memory is made from them.
+        """
+        dqn = self.dqn(memory_size=50, batch_size=8)
+        self.assertEqual((dqn.gamma, dqn.learning_rate, dqn.batch_size), (0.9, 0.0005, 8))
+        self.assertIs(type(dqn.memory), ReplayMemory)
+        self.assertEqual(dqn.memory.capacity, 50)
+        self.assertEqual(self.dqn().memory.capacity, 100000)
+        memory = ReplayMemory(capacity=10)
+        self.assertIs(self.dqn(memory=memory).memory, memory)
+
+    # @unittest.skip("skipping test_train_from_memory")
+    def test_train_from_memory(self):
+        """
+        Test a training step makes one predict and one fit call, with the targets of every transition sampled.
+        """
+        dqn = self.dqn(memory_size=50, batch_size=8)
+        self.assertIsNone(dqn.train_from_memory())
+        self.remember(dqn, 20)
+        self.assertEqual(len(dqn.memory), 20)
+        errors = dqn.train_from_memory()
+        model = dqn.model
+        self.assertEqual((len(model.predicted), len(model.fitted)), (1, 1))
+        states, targets, weights, size = model.fitted[0]
+        self.assertEqual((len(states), size, len(errors)), (8, 8, 8))
+        self.assertIsNone(weights)
+        indices = [ int(np.flatnonzero((dqn.memory.states[:20] == state).all(axis=1))[0]) for state in states ]
+        batch = dqn.memory.batch(np.array(indices))
+        expected, expected_errors = td_targets(model.predict(batch.states), model.predict(batch.next_states), batch, 0.9)
+        self.assertTrue(np.allclose(targets, expected, atol=1e-5))
+        self.assertTrue(np.allclose(errors, expected_errors, atol=1e-5))
+
+    # @unittest.skip("skipping test_prioritized")
+    def test_prioritized(self):
+        """
+        Test a prioritized DQN fits with the batch's weights, and gives its transitions their TD errors as priorities.
+        """
+        dqn = self.dqn(memory_size=50, batch_size=8, prioritized=True)
+        self.assertIsInstance(dqn.memory, PrioritizedReplayMemory)
+        self.assertIs(type(self.dqn().memory), ReplayMemory)
+        self.remember(dqn, 20)
+        errors = dqn.train_from_memory()
+        states, targets, weights, size = dqn.model.fitted[0]
+        self.assertEqual(weights.shape, (8, ))
+        self.assertTrue(np.all((weights > 0) & (weights <= 1)))
+        indices = [ int(np.flatnonzero((dqn.memory.states[:20] == state).all(axis=1))[0]) for state in states ]
+        priorities = (np.abs(errors)+dqn.memory.epsilon)**dqn.memory.alpha
+        self.assertTrue(np.allclose(dqn.memory.tree[np.array(indices)], priorities))
+
+    # @unittest.skip("skipping test_choose_action")
+    def test_choose_action(self):
+        """
+        Test moves are picked by the NumPy copy of the model, one-hot over its three outputs.
+        """
+        dqn = self.dqn()
+        states = self.rand.normal(size=(200, 11)).astype(np.float32)
+        expected = np.argmax(dqn.model.predict(states), axis=1)
+        self.assertEqual(sorted(set(expected.tolist())), [0, 1, 2])
+        self.assertEqual(dqn.choose_actions(states).tolist(), expected.tolist())
+        for state, action in zip(states, expected):
+            move = dqn.choose_action(state)
+            self.assertEqual(move.tolist(), np.eye(3)[action].tolist())
+        self.assertEqual(len(dqn.model.predicted), 1)
+        # only the call above, choose_action never calls predict
+
+class TestQueryPlans(unittest.TestCase):
+    """
+    Test the Scribe reads a game back through indexes, instead of reading every row.
+    """
+    def setUp(self):
+        self.database = "plans_test.db"
+        self.tearDown()
+        with open(migration.SCHEMA, "r") as f:
+            schema = f.read()
+        connection = sqlite3.connect(self.database)
+        connection.executescript(re.sub(r'CREATE INDEX[^;]*;', '', schema))
+        # the current schema, as it was before it had indexes
+        connection.close()
+
+    def tearDown(self):
+        if os.path.exists(self.database):
+            os.remove(self.database)
+
+    # @unittest.skip("skipping test_full_scans")
+    def test_full_scans(self):
+        """
+        Test the read queries scan whole tables until the schema's indexes are added.
+        """
+        scribe = Scribe(SQLiteInterface(self.database))
+        scans = scribe.full_scans()
+        self.assertIn("states", scans)
+        # a page of states is found by its rowid, reading every later state of every game
+        self.assertIn("snakes", scans)
+        self.assertIn("commands", scans)
+        del scribe
+        created = migration.add_indexes(self.database)
+        self.assertIn("states_game", created)
+        self.assertEqual(migration.add_indexes(self.database), [])
+        scribe = Scribe(SQLiteInterface(self.database))
+        self.assertEqual(scribe.full_scans(), {})
+
+class TestSQLiteProfiles(unittest.TestCase):
+    """
+    Test the PRAGMAs a SQLiteInterface applies to its connections.
+    """
+    def setUp(self):
+        self.database = "profile_test.db"
+        self.tearDown()
+
+    def tearDown(self):
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(self.database+suffix):
+                os.remove(self.database+suffix)
+
+    def open(self, profile):
+        fixtures = os.path.join(os.path.dirname(migration.SCHEMA), "FIXTURES_data.sql")
+        return SQLiteInterface(self.database, schema=migration.SCHEMA, fixtures=fixtures, profile=profile)
+
+    # @unittest.skip("skipping test_profiles")
+    def test_profiles(self):
+        """
+        Test each profile's journal mode and synchronous setting, and that unknown settings are refused.
+        """
+        for profile, journal_mode, synchronous in [("recording", "wal", 1), ("bulk", "memory", 0)]:
+            connection = self.open(profile).connect()
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], journal_mode)
+            self.assertEqual(connection.execute("PRAGMA synchronous").fetchone()[0], synchronous)
+            connection.close()
+        with self.assertRaises(ValueError):
+            self.open("fastest")
+        with self.assertRaises(ValueError):
+            self.open({"page_size": 65536})
+
+    # @unittest.skip("skipping test_read_while_recording")
+    def test_read_while_recording(self):
+        """
+        Test the states of a game are read while a game holds a write transaction open.
+        """
+        db = self.open("recording")
+        game = SnakeGame(testing=True, height=100, width=100, size=10, auto_tick=False, headless=True,
+            seed=1, database=db, record_batch=1000)
+        for turn in [None, 8, None, 7]:
+            game.step(turn)
+        game.scribe.flush()
+        recorded = game.scribe.exc("SELECT COUNT(*) FROM states", ())[0][0]
+        writer = db.connect()
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("DELETE FROM states")
+        reader = db.connect(timeout=0)
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM states").fetchone()[0], recorded)
+        # the reader sees the last commit, instead of waiting for the writer
+        writer.rollback()
+        writer.close()
+        reader.close()
+
 class TestScribe(unittest.TestCase):
     """
     Test that the SnakeGame object behaves as 
@@ -0,0 +1,299 @@
+import numpy as np
+from objects.grid import OccupancyGrid
+from interfaces.game import default_fruits
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("Iface")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for vec_game.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+
+
+class VecSnakeGame(object):
+    """
+    Step many independent games of Snake in lockstep.
+    Boards, snake bodies, fruit and scores for every game live in stacked
+    NumPy arrays, so one call to step() advances all of them at once.
+    The rules follow a headless SnakeGame: one move per step, the tail
+    retracts before the head is checked, turning back into the body is fatal,
+    eating a fruit adds its value to the belly and the score, and staying
+    alive is rewarded on the same curve.
+    """
+    defaults = {
+        "num_envs": 16,
+        # how many games are stepped together
+        "height": 64,
+        # vertical boundaries of each game
+        "width": 64,
+        # horizontal boundaries of each game
+        "size": 1,
+        # how big a virtual pixel is/ how many pixels are in a virtual pixel
+        "starting_length": 3,
+        # how long the snake should start out as
+        "reward_limit": 5,
+        # limit how many fruit can be simultaneously created in each game
+        "safe_distance": 5,
+        # how many empty virtual pixels a snake spawns with ahead of it
+        "seed": None,
+        # seed for the random generator shared by every game
+    }
+    HEAD = 4
+    # code used to mark the head in observations, beyond the OccupancyGrid codes
+    SPAWN_ATTEMPTS = 8
+    # how many random cells are tried for a fruit before the board is searched for a free one
+    def __init__(self, *args, **kwargs):
+        super(VecSnakeGame, self).__init__()
+        for k,v in self.defaults.items():
+            # for each item in the default configuration
+            setattr(self, k, kwargs.get(k,v))
+            # try to get and use a keyword argument, else use default;
+            # set value for the attribute
+        self.fruits = kwargs.get("fruits", default_fruits())
+        # store a dict of name: function that instantiates a fruit object
+        self.rand = np.random.default_rng(self.seed)
+        self.columns = self.width//self.size
+        self.rows = self.height//self.size
+        self._stride = self.columns+2
+        # boards keep a one cell border of walls, like OccupancyGrid
+        self.capacity = self.columns*self.rows
+        # the longest a snake can possibly be
+        self._init_species()
+        self._init_geometry()
+        n = self.num_envs
+        cells = self._stride*(self.rows+2)
+        self.boards = np.empty((n, cells), dtype=np.int8)
+        # what occupies each cell of each game
+        self.values = np.zeros((n, cells), dtype=np.int32)
+        # the value of the fruit in each cell of each game
+        self.bodies = np.zeros((n, self.capacity), dtype=np.int32)
+        # ring buffers of the cells each snake occupies, from tail to head
+        self.head_slots = np.zeros(n, dtype=np.int64)
+        # where each snake's head is in its ring buffer
+        self.lengths = np.zeros(n, dtype=np.int64)
+        # how many cells each snake occupies
+        self.headings = np.zeros(n, dtype=np.int64)
+        self.bellies = np.zeros(n, dtype=np.int64)
+        self.scores = np.zeros(n, dtype=np.float64)
+        self.alive_counters = np.zeros(n, dtype=np.int64)
+        self.fruit_counts = np.zeros(n, dtype=np.int64)
+        # how many fruit are currently on each board
+        self.final_scores = np.zeros(n, dtype=np.float64)
+        self.final_lengths = np.zeros(n, dtype=np.int64)
+        # the score and length each game had when it last ended
+        self.games_played = 0
+        self.reset()
+
+    def _init_species(self):
+        """
+        Pull the value and frequency out of each fruit definition,
+        ordered from the rarest to the most common like SnakeGame.fruit_chances.
+        """
+        species = []
+        for name,fnc in self.fruits.items():
+            fruit = fnc([0,0,self.size])
+            species += [(fruit.frequency, fruit.value)]
+        species = list(sorted(species))
+        self._chances = np.array([freq for freq,val in species], dtype=np.float64)
+        self._species_values = np.array([val for freq,val in species], dtype=np.int32)
+
+    def _init_geometry(self):
+        """
+        Precompute the blank board, the cell offsets for each heading,
+        and the range of cells a head can spawn at for each heading.
+        """
+        blank = np.full((self.rows+2, self._stride), OccupancyGrid.WALL, dtype=np.int8)
+        blank[1:-1,1:-1] = OccupancyGrid.EMPTY
+        self._blank = blank.reshape(-1)
+        self._deltas = np.array([-self._stride, 1, self._stride, -1], dtype=np.int64)
+        # north, east, south, west
+        length = self.starting_length
+        safe = max(0, min(self.safe_distance, min(self.rows, self.columns)-length))
+        # shrink the safe distance on boards too small for it
+        rows, cols = self.rows, self.columns
+        self._spawn_rows = np.array([
+                [safe, rows-length],
+                # north, the body trails south of the head
+                [0, rows-1],
+                [length-1, rows-1-safe],
+                # south, the body trails north of the head
+                [0, rows-1],
+            ], dtype=np.int64)
+        self._spawn_columns = np.array([
+                [0, cols-1],
+                [length-1, cols-1-safe],
+                # east, the body trails west of the head
+                [0, cols-1],
+                [safe, cols-length],
+                # west, the body trails east of the head
+            ], dtype=np.int64)
+        if (self._spawn_rows[:,0] > self._spawn_rows[:,1]).any() or (self._spawn_columns[:,0] > self._spawn_columns[:,1]).any():
+            raise ValueError(f"A {cols}x{rows} board is too small for a snake of length {length}")
+
+    @staticmethod
+    def still_alive_reward(counter):
+        """
+        The points awarded for staying alive, on the same curve as
+        SnakeGame.get_still_alive_reward.
+        """
+        return (-1*np.arctan((counter/0.5)-1))+1.7
+
+    def _reset_envs(self, envs):
+        """
+        Clear the boards of the given games, and spawn new snakes.
+        """
+        k = len(envs)
+        if k == 0:
+            return
+        self.boards[envs] = self._blank
+        self.values[envs] = 0
+        self.bellies[envs] = 0
+        self.scores[envs] = 0
+        self.alive_counters[envs] = 0
+        self.fruit_counts[envs] = 0
+        headings = self.rand.integers(0, 4, size=k)
+        lo, hi = self._spawn_rows[headings].T
+        rows = lo+(self.rand.random(k)*(hi-lo+1)).astype(np.int64)
+        lo, hi = self._spawn_columns[headings].T
+        columns = lo+(self.rand.random(k)*(hi-lo+1)).astype(np.int64)
+        heads = (rows+1)*self._stride+(columns+1)
+        length = self.starting_length
+        for i in range(length):
+            # write the body from the head back, so the tail ends up in slot 0
+            cells = heads-i*self._deltas[headings]
+            self.bodies[envs, length-1-i] = cells
+            self.boards[envs, cells] = OccupancyGrid.BODY
+        self.headings[envs] = headings
+        self.head_slots[envs] = length-1
+        self.lengths[envs] = length
+
+    def _germinate(self):
+        """
+        Give each game a chance to spawn a fruit at a random free cell,
+        using the same odds as SnakeGame.get_fruit.
+        """
+        n = self.num_envs
+        chosen = np.full(n, -1, dtype=np.int64)
+        pending = self.fruit_counts < self.reward_limit
+        for idx,chance in enumerate(self._chances):
+            chances = np.where(self.fruit_counts <= 0, chance*10, chance)
+            # more likely to spawn when there are no rewards present
+            hits = pending & (chosen < 0) & (self.rand.random(n) <= chances)
+            chosen[hits] = idx
+        envs = np.flatnonzero(chosen >= 0)
+        if len(envs) == 0:
+            return
+        cells = np.full(len(envs), -1, dtype=np.int64)
+        todo = np.arange(len(envs))
+        for attempt in range(VecSnakeGame.SPAWN_ATTEMPTS):
+            picks = self.rand.integers(0, self.capacity, size=len(todo))
+            picks = (picks//self.columns+1)*self._stride+picks%self.columns+1
+            # a random cell inside the walls of each board
+            free = self.boards[envs[todo], picks] == OccupancyGrid.EMPTY
+            cells[todo[free]] = picks[free]
+            todo = todo[~free]
+            if len(todo) == 0:
+                break
+        for idx in todo:
+            free = np.flatnonzero(self.boards[envs[idx]] == OccupancyGrid.EMPTY)
+            # only boards too crowded to hit a free cell are searched
+            if len(free):
+                cells[idx] = free[self.rand.integers(len(free))]
+        placed = cells >= 0
+        # a full board has nowhere to put a fruit
+        envs, cells = envs[placed], cells[placed]
+        self.boards[envs, cells] = OccupancyGrid.FRUIT
+        self.values[envs, cells] = self._species_values[chosen[envs]]
+        self.fruit_counts[envs] += 1
+
+    def reset(self):
+        """
+        Start every game over, and return the observations.
+        """
+        self._reset_envs(np.arange(self.num_envs))
+        self._germinate()
+        return self.observation
+
+    @property
+    def heads(self):
+        """
+        The cell each snake's head is in.
+        """
+        return self.bodies[np.arange(self.num_envs), self.head_slots]
+
+    @property
+    def observation(self):
+        """
+        A copy of every board shaped (num_envs, rows+2, columns+2),
+        holding OccupancyGrid codes with each head marked as HEAD.
+        """
+        result = self.boards.copy()
+        result[np.arange(self.num_envs), self.heads] = VecSnakeGame.HEAD
+        return result.reshape(self.num_envs, self.rows+2, self._stride)
+
+    def step(self, actions):
+        """
+        Move every snake once in the direction given by actions (0-3 for
+        north, east, south, west). Return the observations, the points each
+        move gained, and which games ended; ended games are started over.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        envs = np.arange(self.num_envs)
+        scores = self.scores.copy()
+        lengths = self.lengths.copy()
+        reverse = actions == (self.headings+2)%4
+        # turning 180 degrees runs the head into the body
+        self.headings[:] = actions
+        # copied, so the caller's array isn't changed by later steps
+        heads = self.heads+self._deltas[actions]
+        retracts = self.bellies <= 0
+        # the tail only retracts when there is no food in the belly
+        tails = self.bodies[envs, (self.head_slots-self.lengths+1)%self.capacity]
+        self.boards[envs[retracts], tails[retracts]] = OccupancyGrid.EMPTY
+        self.bellies[~retracts] -= 1
+        self.lengths[~retracts] += 1
+        hits = self.boards[envs, heads]
+        # a single lookup for whatever each head moved into
+        dead = reverse | (hits == OccupancyGrid.WALL) | (hits == OccupancyGrid.BODY)
+        alive = ~dead
+        eaten = alive & (hits == OccupancyGrid.FRUIT)
+        values = np.where(eaten, self.values[envs, heads], 0)
+        self.scores += values
+        self.bellies += values
+        self.values[envs[eaten], heads[eaten]] = 0
+        self.fruit_counts -= eaten
+        living = envs[alive]
+        self.head_slots[living] = (self.head_slots[living]+1)%self.capacity
+        self.bodies[living, self.head_slots[living]] = heads[living]
+        self.boards[living, heads[living]] = OccupancyGrid.BODY
+        self.alive_counters[living] += 1
+        self.scores[living] += VecSnakeGame.still_alive_reward(self.alive_counters[living])
+        rewards = self.scores-scores
+        ended = envs[dead]
+        self.final_scores[ended] = self.scores[ended]
+        self.final_lengths[ended] = lengths[ended]
+        # the length each snake had before the move that ended its game
+        self.games_played += len(ended)
+        self._reset_envs(ended)
+        self._germinate()
+        return self.observation, rewards, dead
+
+    def __str__(self):
+        return f"VecSnakeGame({self.num_envs}x{self.columns}x{self.rows})"
+
+    def __repr__(self):
+        return str(self)
@@ -1,7 +1,10 @@
 from .fruit import Fruit 
 from .segment import Segment 
 from .snake import Snake
+from .cell_snake import CellSnake
 from .obstacle import Obstacle
+from .grid import OccupancyGrid
+from .rects import render_all
 from .test_objects import *
 # import test_objects
 
@@ -0,0 +1,240 @@
+from collections import deque
+from .segment import Segment
+from .snake import Snake
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("MainApp")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for cell_snake.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+finally:
+    pass
+
+class CellSnake(Snake):
+    """
+    A Snake whose body is a deque of the virtual pixels it occupies, from the
+    head to the tail, with a set of the same cells for membership checks;
+    moving, growing and checking for self intersection never walk the body.
+    The segments are a view built from the cells when they are asked for,
+    for rendering and the Scribe.
+    """
+    __steps = [(0,-1), (1,0), (0,1), (-1,0)]
+    # which way x,y change when moving north, east, south, west
+    def __init__(self, dimensions, heading, *args, **kwargs):
+        super(CellSnake, self).__init__(dimensions, heading, *args, **kwargs)
+        # the Segment created by Snake is converted into cells by the segments setter
+
+    @staticmethod
+    def _segment_cells(seg):
+        """
+        The top left point of each virtual pixel in a Segment, from its head to its tail.
+        """
+        size = seg.size
+        if seg.heading%2 == 0:
+            cells = [(seg.x, y) for y in range(seg.y, seg.y+seg.h, size)]
+        else:
+            cells = [(x, seg.y) for x in range(seg.x, seg.x+seg.w, size)]
+        if seg.heading in [1,2]:
+            # headed east or south, the head is the right or bottom most virtual pixel
+            cells.reverse()
+        return cells
+
+    @property
+    def segments(self):
+        """
+        The Segments the cells make up, from the head to the tail;
+        a run of cells entered in the same direction is one Segment.
+        """
+        if self._segments is None:
+            self._segments = self._build_segments()
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments):
+        """
+        Replace the body with the cells covered by a list of Segments.
+        """
+        cells = []
+        for seg in segments:
+            cells += CellSnake._segment_cells(seg)
+        self._cells = deque(cells)
+        self._occupied = set(cells)
+        self._segments = None
+
+    def _build_segments(self):
+        """
+        Group the cells into Segments.
+        """
+        cells = self._cells
+        if len(cells) == 0:
+            return []
+        size = self.size
+        headings = []
+        previous = None
+        for x,y in cells:
+            if previous is not None:
+                # the direction the snake moved to get from this cell to the one before it
+                step = ((previous[0]-x)//size, (previous[1]-y)//size)
+                headings += [CellSnake.__steps.index(step) if step in CellSnake.__steps else self.heading]
+            previous = (x, y)
+        headings = headings+headings[-1:] if len(cells) > 1 else [self.heading]
+        # each cell belongs to the direction it was entered from,
+        # the tail belongs to the direction it is left by
+        segments = []
+        start = 0
+        for idx in range(1, len(cells)+1):
+            if idx == len(cells) or headings[idx] != headings[start]:
+                run = [cells[i] for i in range(start, idx)]
+                xs = [x for x,y in run]
+                ys = [y for x,y in run]
+                segments += [Segment([min(xs), min(ys), max(xs)-min(xs)+size, max(ys)-min(ys)+size], headings[start])]
+                start = idx
+        return segments
+
+    @property
+    def cells(self):
+        """
+        The top left point of each virtual pixel the Snake occupies, from the head to the tail.
+        """
+        return self._cells
+
+    def occupies(self, x, y):
+        """
+        Whether the virtual pixel at x,y is part of the Snake.
+        """
+        return (x, y) in self._occupied
+
+    @property
+    def length(self):
+        """
+        The sum of the lengths of all the Snake's segments.
+        """
+        return len(self._cells)*self.size
+
+    @property
+    def head_origin(self):
+        """
+        The top left point of the virtual pixel at the front of the Snake.
+        """
+        return list(self._cells[0])
+
+    @property
+    def tail_origin(self):
+        """
+        The top left point of the virtual pixel at the end of the Snake.
+        """
+        return list(self._cells[-1])
+
+    @property
+    def is_alive(self):
+        """
+        Returns a boolean for whether the Snake is still alive.
+        """
+        return len(self._cells) > 0
+
+    @property
+    def self_intersects(self):
+        """
+        Determine if the head intersects any of the other cells;
+        a cell the body occupies twice is only counted once in the set.
+        """
+        return len(self._cells) != len(self._occupied)
+
+    def _ahead(self, direction):
+        """
+        The virtual pixel in front of the head, in "direction".
+        """
+        dx, dy = CellSnake.__steps[direction]
+        x, y = self._cells[0]
+        return (x+dx*self.size, y+dy*self.size)
+
+    def _advance(self, head):
+        """
+        Make the virtual pixel at "head" the new head; running into the body
+        leaves the cell in the deque twice, but in the set once.
+        """
+        self._cells.appendleft(head)
+        self._occupied.add(head)
+        self._segments = None
+
+    def grow(self):
+        """
+        A condition has occured to cause the head to increment by one.
+        """
+        self._advance(self._ahead(self.heading))
+
+    def _decrement_whole(self):
+        """
+        We've moved, and need to subtract for the tail or belly.
+        """
+        if self.belly <= 0:
+            # if no food in the belly
+            self._occupied.discard(self._cells.pop())
+            # decrease the tail
+            self._segments = None
+        else:
+            # still have food in the belly, decrement it instead
+            self.belly = self.belly - 1
+
+    def move(self, direction, self_check=True):
+        """
+        Move the snake, shrink the tail (if necessary), and grow the head.
+        When self_check is False, the caller is responsible for
+        determining whether the head ran into the rest of the body,
+        and for killing the snake when it has.
+        """
+        if len(self._cells) <= 0:
+            raise RuntimeError("Snake has no body parts to move!")
+        if direction not in [0,1,2,3]:
+            raise ValueError("Direction should be a number between 0-3, not {}".format(direction))
+        if (direction+2)%4 == self.heading:
+            # if we're moving in the direct opposite way of the original heading
+            self._decrement_whole()
+            self.die()
+            # die because the head turned 180 degrees and ran into the body
+            return
+        head = self._ahead(direction)
+        self.heading = direction
+        self._decrement_whole()
+        # the tail retracts first, so the head can follow directly behind it
+        self._advance(head)
+        if self_check and self.self_intersects:
+            # determine if the snake currently is self intersecting
+            debug("snake self_intersects")
+            self.die()
+
+    def snapshot(self):
+        """
+        An immutable copy of the Snake's heading, belly and cells.
+        """
+        return (self.heading, self.size, self.belly, tuple(self._cells))
+
+    @classmethod
+    def restore(cls, snapshot):
+        """
+        Create a CellSnake from a snapshot.
+        """
+        heading, size, belly, cells = snapshot
+        snake = cls.__new__(cls)
+        snake.heading = heading
+        snake.size = size
+        snake._cells = deque(cells)
+        snake._occupied = set(cells)
+        snake._segments = None
+        snake.belly = belly
+        return snake
@@ -9,6 +9,7 @@ class Fruit(object):
     """
     Provides a reward to the Snake.
     """
+    __slots__ = ("_dimensions", "_name", "_value", "_color", "_frequency", "id")
     def __init__(self, name, dimensions, value, *args, **kwargs):
         super(Fruit, self).__init__()
         self.name = name
@@ -18,11 +19,16 @@ class Fruit(object):
         self.frequency = kwargs.get("frequency", )
         self.id = None
 
-    def render(self):
+    def render(self, rect=None):
         """
-        Return a rectangle to display in a Surface.
+        Return a rectangle to display in a Surface;
+        when given a Rect, update it in place instead of creating one.
         """
-        return Rect(self.x, self.y, self.w, self.h)
+        x, y, size = self._dimensions
+        if rect is None:
+            return Rect(x, y, size, size)
+        rect.update(x, y, size, size)
+        return rect
 
     @property
     def dimensions(self):
@@ -45,37 +51,37 @@ class Fruit(object):
         """
         Getter for the horizontal position.
         """
-        return self.dimensions[0]
+        return self._dimensions[0]
     @property
     def y(self):
         """
         Getter for the vertical position.
         """
-        return self.dimensions[1]
+        return self._dimensions[1]
     @property
     def origin(self):
         """
         Getter for the x,y position.
         """
-        return self.dimensions[0], self.dimensions[1]
+        return self._dimensions[0], self._dimensions[1]
     @property
     def size(self):
         """
         How many pixels this virtual pixel occupies
         """
-        return self.dimensions[2]
+        return self._dimensions[2]
     @property
     def w(self):
         """
         The width of the fruit in pixels.
         """
-        return self.size
+        return self._dimensions[2]
     @property
     def h(self):
         """
         The height of the fruit in pixels.
         """
-        return self.size
+        return self._dimensions[2]
 
     @property
     def name(self):
@@ -0,0 +1,226 @@
+#!/usr/bin/python3.7
+
+class OccupancyGrid(object):
+    """
+    Track what occupies each virtual pixel of a game board, so that
+    collisions can be found with a single lookup instead of comparing
+    the Snake against every Obstacle, Fruit and Segment.
+    The grid keeps a one virtual pixel border around the board,
+    where the walls surrounding the board are placed.
+    Free virtual pixels on the board are indexed, so a random free
+    one can be picked with a single draw.
+    """
+    EMPTY = 0
+    # nothing is in the virtual pixel
+    WALL = 1
+    # an Obstacle is in the virtual pixel
+    BODY = 2
+    # a part of a Snake is in the virtual pixel
+    FRUIT = 3
+    # a Fruit is in the virtual pixel
+    def __init__(self, width, height, size, edge=0):
+        super(OccupancyGrid, self).__init__()
+        self.size = size
+        self.columns = width//size
+        # how many virtual pixels across the board is
+        self.rows = height//size
+        # how many virtual pixels down the board is
+        self._stride = self.columns+2
+        # how many cells are in one row, including the border on either side
+        self.cells = bytearray(self._stride*(self.rows+2))
+        # one byte per virtual pixel, holding what occupies it
+        self.fruits = {}
+        # a dict mapping cell indexes to the Fruit object in that cell
+        self.edge = edge
+        # how many virtual pixels along the north and west sides of the
+        # board are never handed out as free
+        self._free = [
+                row*self._stride+column
+                for row in range(1+edge, self.rows+1)
+                for column in range(1+edge, self.columns+1)
+            ]
+        # the indexes of every free cell, in no particular order
+        self._slots = [-1]*len(self.cells)
+        # where each cell is in _free, or -1 when it is not free
+        for slot,idx in enumerate(self._free):
+            self._slots[idx] = slot
+
+    def _indexed(self, idx):
+        """
+        Whether a cell is on the part of the board that free cells are picked from.
+        """
+        column = idx%self._stride
+        row = idx//self._stride
+        return (self.edge < column <= self.columns) and (self.edge < row <= self.rows)
+
+    def _set(self, idx, value):
+        """
+        Set what occupies a cell, keeping the index of free cells up to date.
+        """
+        self.cells[idx] = value
+        slot = self._slots[idx]
+        if value != OccupancyGrid.EMPTY and slot != -1:
+            # the cell is no longer free; swap the last free cell into its slot
+            last = self._free.pop()
+            if last != idx:
+                self._free[slot] = last
+                self._slots[last] = slot
+            self._slots[idx] = -1
+        elif value == OccupancyGrid.EMPTY and slot == -1 and self._indexed(idx):
+            # the cell has been freed
+            self._slots[idx] = len(self._free)
+            self._free.append(idx)
+
+    def _index(self, x, y):
+        """
+        Convert a pixel position into the index of its cell,
+        or None if the position is beyond the border of the grid.
+        """
+        column = x//self.size+1
+        row = y//self.size+1
+        # shift by one to make room for the border
+        if column < 0 or row < 0 or column >= self._stride or row >= self.rows+2:
+            return None
+        return row*self._stride+column
+
+    def get(self, x, y):
+        """
+        What occupies the virtual pixel at x,y;
+        everything beyond the border is treated as a wall.
+        """
+        idx = self._index(x, y)
+        if idx is None:
+            return OccupancyGrid.WALL
+        return self.cells[idx]
+
+    def is_free(self, x, y):
+        """
+        Whether nothing occupies the virtual pixel at x,y.
+        """
+        return self.get(x, y) == OccupancyGrid.EMPTY
+
+    def _fill(self, dimensions, value, overwrite=True):
+        """
+        Set every cell covered by the x,y,w,h rectangle to value.
+        """
+        x, y, w, h = dimensions[0], dimensions[1], dimensions[2], dimensions[3]
+        for cy in range(y, y+h, self.size):
+            for cx in range(x, x+w, self.size):
+                idx = self._index(cx, cy)
+                if idx is None:
+                    # the rectangle extends beyond the border
+                    continue
+                if overwrite or self.cells[idx] == OccupancyGrid.EMPTY:
+                    self._set(idx, value)
+
+    def place_obstacle(self, obstacle):
+        """
+        Mark the virtual pixels an Obstacle covers as walls.
+        """
+        self._fill(obstacle.dimensions, OccupancyGrid.WALL)
+
+    def place_segment(self, segment):
+        """
+        Mark the virtual pixels a Segment covers as part of a body;
+        walls are never overwritten.
+        """
+        self._fill(segment.dimensions, OccupancyGrid.BODY, overwrite=False)
+
+    def place_snake(self, snake):
+        """
+        Mark the virtual pixels of every Segment in a Snake as part of a body.
+        """
+        for seg in snake.segments:
+            self.place_segment(seg)
+
+    def place_fruit(self, fruit):
+        """
+        Mark the virtual pixel a Fruit is in, and remember the Fruit.
+        """
+        idx = self._index(fruit.x, fruit.y)
+        if idx is not None:
+            self._set(idx, OccupancyGrid.FRUIT)
+            self.fruits[idx] = fruit
+
+    def remove_fruit(self, fruit):
+        """
+        Clear the virtual pixel a Fruit was in.
+        """
+        idx = self._index(fruit.x, fruit.y)
+        if idx is not None and self.fruits.get(idx) is fruit:
+            del self.fruits[idx]
+            self._set(idx, OccupancyGrid.EMPTY)
+
+    def fruit_at(self, x, y):
+        """
+        The Fruit in the virtual pixel at x,y; or None.
+        """
+        idx = self._index(x, y)
+        return self.fruits.get(idx)
+
+    def occupy(self, x, y):
+        """
+        A Snake's head has advanced into the virtual pixel at x,y.
+        """
+        idx = self._index(x, y)
+        if idx is not None:
+            self._set(idx, OccupancyGrid.BODY)
+
+    def release(self, x, y):
+        """
+        A Snake's tail has retracted out of the virtual pixel at x,y.
+        """
+        idx = self._index(x, y)
+        if idx is not None and self.cells[idx] == OccupancyGrid.BODY:
+            self._set(idx, OccupancyGrid.EMPTY)
+
+    @property
+    def free_count(self):
+        """
+        How many free virtual pixels are left to pick from.
+        """
+        return len(self._free)
+
+    def random_free(self, rand):
+        """
+        Use the random.Random object 'rand' to pick a free virtual pixel,
+        and return its top left point; or None if the board is full.
+        """
+        if len(self._free) == 0:
+            return None
+        idx = self._free[rand.randrange(len(self._free))]
+        return [(idx%self._stride-1)*self.size, (idx//self._stride-1)*self.size]
+
+    def snapshot(self):
+        """
+        An immutable copy of what occupies each cell, and of the index of free
+        cells; the order of the index is kept, so random_free picks the same
+        cells after a restore. Where each cell is in the index is rebuilt
+        from it by restore, rather than copied.
+        """
+        return (bytes(self.cells), tuple(self._free))
+
+    def restore(self, snapshot, fruits=()):
+        """
+        Return the grid to a snapshot, remembering 'fruits' as the
+        Fruit objects in the cells they are in.
+        """
+        cells, free = snapshot
+        if len(cells) != len(self.cells):
+            raise ValueError(f"The snapshot is of a different sized grid than {self}")
+        self.cells[:] = cells
+        self._free = list(free)
+        self._slots = [-1]*len(self.cells)
+        for slot,idx in enumerate(self._free):
+            self._slots[idx] = slot
+        self.fruits = {}
+        for fruit in fruits:
+            idx = self._index(fruit.x, fruit.y)
+            if idx is not None:
+                self.fruits[idx] = fruit
+
+    def __str__(self):
+        return f"OccupancyGrid({self.columns}x{self.rows})"
+
+    def __repr__(self):
+        return str(self)
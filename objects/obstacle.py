@@ -10,7 +10,9 @@ class Obstacle(object):
     """
     Something that is not part of the snake,
     but will still trigger death if the snake intersects it.
+    Its size and heading are cached whenever its dimensions change.
     """
+    __slots__ = ("_dimensions", "_size", "_heading", "id")
     def __init__(self, *dimensions):
         super(Obstacle, self).__init__()
         if len(dimensions) == 1:
@@ -24,11 +26,15 @@ class Obstacle(object):
             self.dimensions = dimensions
             # otherwise, assume we've gotten the 4 arguments
         self.id = None
-    def render(self):
+    def render(self, rect=None):
         """
-        Return a rectangle to display in a Surface.
+        Return a rectangle to display in a Surface;
+        when given a Rect, update it in place instead of creating one.
         """
-        return Rect(*self.dimensions)
+        if rect is None:
+            return Rect(*self._dimensions)
+        rect.update(*self._dimensions)
+        return rect
         # return Rect(self.x, self.y, self.w, self.h)
 
     def draw(self,surface,color):
@@ -57,16 +63,14 @@ class Obstacle(object):
         # height and width cannot be negative
         if self.w == max(self.w,self.h):
             # if the width is the longest
-            # self._size = self.h
-            self._size = 3
-            # set size to return the dimension at index 3 (height)
+            self._size = self._dimensions[3]
+            # size is the height
             self._heading = 1
             # the obstacle is pointed EW (odd)
         else:
             # if the height is the longest
-            # self._size = self.w
-            self._size = 2
-            # set size to return the dimension at index 2 (width)
+            self._size = self._dimensions[2]
+            # size is the width
             self._heading = 0
             # the obstacle is pointed NS (even)
 
@@ -75,28 +79,28 @@ class Obstacle(object):
         """
         Getter for the horizontal position.
         """
-        return self.dimensions[0]
+        return self._dimensions[0]
 
     @property
     def y(self):
         """
         Getter for the vertical position.
         """
-        return self.dimensions[1]
+        return self._dimensions[1]
 
     @property
     def w(self):
         """
         Getter for the width.
         """
-        return self.dimensions[2]
+        return self._dimensions[2]
 
     @property
     def h(self):
         """
         Getter for the height.
         """
-        return self.dimensions[3]
+        return self._dimensions[3]
 
     @property
     def heading(self):
@@ -113,7 +117,7 @@ class Obstacle(object):
         Size returns the virtual pixel value (how many pixels, 
         it's one virtual pixel occupies)
         """
-        return self.dimensions[self._size]
+        return self._size
     def __str__(self):
         # return "Obstacle<{}>".format(self.dimensions)
         return f"Obstacle({self.dimensions})"
@@ -0,0 +1,41 @@
+import logging
+
+try:
+    if "logr" not in globals():
+        logr = logging.getLogger("MainApp")
+        # get a logger
+        log = logr.log
+        crit = logr.critical
+        error = logr.error
+        warn = logr.warning
+        info = logr.info
+        debug = logr.debug
+        # take the logger methods that record messages and
+        # convert them into simple one word functions
+        assert debug == getattr(logr,"debug"), "Something went wrong with getting logging functions..."
+        # the logger method called "debug", should now be the same as our function debug()
+except Exception as err:
+    logging.critical("Failed to configure logging for rects.py")
+    logging.exception(err)
+    # print the message to the root logger
+    raise err
+finally:
+    pass
+
+def render_all(items, rects=None):
+    """
+    Render every Segment, Obstacle or Fruit in 'items' into the list 'rects',
+    updating the Rects already in it instead of creating new ones;
+    the list grows or shrinks to match, and is returned.
+    """
+    if rects is None:
+        rects = []
+    count = 0
+    for item in items:
+        if count < len(rects):
+            item.render(rects[count])
+        else:
+            rects.append(item.render())
+        count += 1
+    del rects[count:]
+    return rects
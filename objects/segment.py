@@ -33,7 +33,9 @@ class Segment(object):
     A Segment represents a single rectangle in a Snake.
     A Snake can have many segments, and segments can occupy
     many virtual pixels.
+    Its size and length are cached whenever its dimensions or heading change.
     """
+    __slots__ = ("_dimensions", "_heading", "_size", "_length", "id")
     def __init__(self, *args, **kwargs):
         super(Segment, self).__init__()
         if len(args) == 1:
@@ -43,8 +45,8 @@ class Segment(object):
         else:
             dimensions, heading = args
             # otherwise, assume its iterable with length of 2
+        self._heading = heading
         self.dimensions = dimensions
-        self.heading = heading
         if self.w > self.h:
             # if the width is longer than the height
             assert (self.heading%2 == 1), "Heading does not match up with the longest dimension"
@@ -55,27 +57,35 @@ class Segment(object):
             # heading should be an even number to indicate north or south
         self.id = None
 
-    def render(self):
+    def render(self, rect=None):
         """
-        Return a rectangle to display in a Surface.
+        Return a rectangle to display in a Surface;
+        when given a Rect, update it in place instead of creating one.
         """
-        return Rect(*self.dimensions)
-        # return Rect(self.x, self.y, self.w, self.h)
+        if rect is None:
+            return Rect(*self._dimensions)
+        rect.update(*self._dimensions)
+        return rect
+
+    def _refresh(self):
+        """
+        Cache the size and length, after the dimensions or heading change.
+        """
+        dimensions = self._dimensions
+        self._size = min(dimensions[2], dimensions[3])
+        if self._heading%2 == 0:
+            # if pointed north/south, the length is the height
+            self._length = dimensions[3]
+        else:
+            # if pointed east/west, the length is the width
+            self._length = dimensions[2]
 
     @property
     def length(self):
         """
         Return the longest dimension of the segment.
         """
-        # return max(self.h, self.w)
-        if self.heading%2 == 0:
-            # if pointed north/south
-            return self.h
-            # return height
-        else:
-            # if pointed east/west
-            return self.w
-            # return width
+        return self._length
 
     @property
     def dimensions(self):
@@ -92,87 +102,105 @@ class Segment(object):
         self._dimensions = [value[0], value[1], max(value[2], 0), max(value[3], 0)]
         # set _dimensions so that x,y,w,h getters work;
         # height and width cannot be negative
-        if self.w == max(self.w,self.h):
-            # if the width is the longest
-            # self._size = self.h
-            self._size = 3
-            # set size to return the dimension at index 3 (height)
-        else:
-            # if the height is the longest
-            # self._size = self.w
-            self._size = 2
-            # set size to return the dimension at index 2 (width)
+        self._refresh()
 
     @property
     def x(self):
         """
         Getter for the horizontal position.
         """
-        return self.dimensions[0]
+        return self._dimensions[0]
     
     @x.setter
     def x(self, value):
         """
         Setter for the horizontal position.
         """
-        self.dimensions[0] = value
+        self._dimensions[0] = value
 
     @property
     def y(self):
         """
         Getter for the vertical position.
         """
-        return self.dimensions[1]
+        return self._dimensions[1]
     
     @y.setter
     def y(self, value):
         """
         Setter for the vertical position.
         """
-        self.dimensions[1] = value
+        self._dimensions[1] = value
 
     @property
     def w(self):
         """
         Getter for the width.
         """
-        return self.dimensions[2]
+        return self._dimensions[2]
     
     @w.setter
     def w(self, value):
         """
         Setter for the width.
         """
-        self.dimensions[2] = max(value, 0)
+        self._dimensions[2] = max(value, 0)
+        self._refresh()
 
     @property
     def h(self):
         """
         Getter for the height.
         """
-        return self.dimensions[3]
+        return self._dimensions[3]
     
     @h.setter
     def h(self, value):
         """
         Setter for the height.
         """
-        self.dimensions[3] = max(value, 0)
+        self._dimensions[3] = max(value, 0)
+        self._refresh()
 
     @property
     def size(self):
         """
         How many pixels this segment occupies
         """
-        # return self.dimensions[self._size]
-        return min(self.dimensions[2],self.dimensions[3])
+        return self._size
 
     @property
     def origin(self):
         """
         Getter top left point of this rectangle.
         """
-        return [self.x,self.y]
+        return [self._dimensions[0], self._dimensions[1]]
+
+    @property
+    def head_origin(self):
+        """
+        Getter for the top left point of the virtual pixel at the head end.
+        """
+        if self.heading == 1:
+            # headed east, the head is the right most virtual pixel
+            return [self.x+self.w-self.size, self.y]
+        elif self.heading == 2:
+            # headed south, the head is the bottom most virtual pixel
+            return [self.x, self.y+self.h-self.size]
+        return [self.x, self.y]
+
+    @property
+    def tail_origin(self):
+        """
+        Getter for the top left point of the virtual pixel at the tail end.
+        """
+        if self.heading == 0:
+            # headed north, the tail is the bottom most virtual pixel
+            return [self.x, self.y+self.h-self.size]
+        elif self.heading == 3:
+            # headed west, the tail is the right most virtual pixel
+            return [self.x+self.w-self.size, self.y]
+        return [self.x, self.y]
 
     @property
     def heading(self):
@@ -187,6 +215,7 @@ class Segment(object):
         Setter for the direction this segment is pointed toward.
         """
         self._heading = value
+        self._refresh()
 
     @property
     def head_heading(self):
@@ -206,49 +235,53 @@ class Segment(object):
         """
         Append a virtual pixel to the head
         """
-        # debug("increment{}".format(id(self)))
-        if self.heading == 0:
+        dimensions = self._dimensions
+        size = self._size
+        if self._heading == 0:
             # headed north
-            self.y -= self.size
-            self.h += self.size
+            dimensions[1] -= size
+            dimensions[3] += size
             # move top left corner & incr height
-        elif self.heading == 1:
+        elif self._heading == 1:
             # headed east
-            self.w += self.size
+            dimensions[2] += size
             # keep top left corner & incr width
-        elif self.heading == 2:
+        elif self._heading == 2:
             # headed south
-            self.h += self.size
+            dimensions[3] += size
             # keep top left corner & incr height
-        elif self.heading == 3:
+        elif self._heading == 3:
             # headed west
-            self.x -= self.size
-            self.w += self.size
+            dimensions[0] -= size
+            dimensions[2] += size
             # move top left corner & incr width
+        self._refresh()
 
     def decrement(self):
         """
         Remove a virtual pixel to the tail
         """
-        # debug("decrement{}".format(id(self)))
-        if self.heading == 0:
+        dimensions = self._dimensions
+        size = self._size
+        if self._heading == 0:
             # headed north
-            self.h -= self.size
+            dimensions[3] = max(dimensions[3]-size, 0)
             # keep top left corner & decr height
-        elif self.heading == 1:
+        elif self._heading == 1:
             # headed east
-            self.x += self.size
-            self.w -= self.size
+            dimensions[0] += size
+            dimensions[2] = max(dimensions[2]-size, 0)
             # move top left corner & decr width
-        elif self.heading == 2:
+        elif self._heading == 2:
             # headed south
-            self.y += self.size
-            self.h -= self.size
+            dimensions[1] += size
+            dimensions[3] = max(dimensions[3]-size, 0)
             # move top left corner & decr height
-        elif self.heading == 3:
+        elif self._heading == 3:
             # headed west
-            self.w -= self.size
+            dimensions[2] = max(dimensions[2]-size, 0)
             # keep top left corner & decr width
+        self._refresh()
 
     def __str__(self):
         # return "Seg<{},{},{},{}|{}|{}|{}>".format(self.x,self.y,self.w,self.h,self.dimensions,self.heading,self.length)
@@ -8,6 +8,7 @@ del contextlib
 from .fruit import Fruit
 from .obstacle import Obstacle
 from .segment import Segment
+from .rects import render_all
 import logging
 
 try:
@@ -35,6 +36,8 @@ class Snake(object):
     """
     The object a human or computer controls as they move about the game space.
     """
+    _rects = None
+    # the Rects draw() reuses from one frame to the next
     def __init__(self, dimensions, heading, *args, **kwargs):
         super(Snake, self).__init__()
         self.heading = heading
@@ -43,6 +46,27 @@ class Snake(object):
         # initialize the array of Segments that compose it's body
         self.size = head.size
 
+    def snapshot(self):
+        """
+        An immutable copy of the Snake's heading, belly and segments.
+        """
+        segments = tuple([(tuple(seg.dimensions), seg.heading) for seg in self.segments])
+        return (self.heading, self.size, self.belly, segments)
+
+    @classmethod
+    def restore(cls, snapshot):
+        """
+        Create a Snake from a snapshot.
+        """
+        heading, size, belly, segments = snapshot
+        snake = cls.__new__(cls)
+        snake.heading = heading
+        snake.size = size
+        snake.segments = [Segment(list(dimensions), hdg) for dimensions,hdg in segments]
+        # a dead snake has no segments
+        snake.belly = belly
+        return snake
+
     def _render(self):
         """
         Generate a series of Rectangles representing this Snake's segments.
@@ -67,9 +91,10 @@ class Snake(object):
             # the color should start bright green, and decrease 
             # in intensity with each segment
             return val
-        for i, seg in enumerate(self._render()):
+        self._rects = render_all(self.segments, self._rects)
+        for i, seg in enumerate(self._rects):
             # get an index and a Rectangle representing a Segment
-            fraction = i/len(self.segments)
+            fraction = i/len(self._rects)
             color = (0, get_green(fraction), 0)
             # get the color we want to use on this Segment
             draw_rect(surface, color, seg)
@@ -117,6 +142,20 @@ class Snake(object):
         """
         return self.segments[-1]
 
+    @property
+    def head_origin(self):
+        """
+        The top left point of the virtual pixel at the front of the Snake.
+        """
+        return self.head.head_origin
+
+    @property
+    def tail_origin(self):
+        """
+        The top left point of the virtual pixel at the end of the Snake.
+        """
+        return self.tail.tail_origin
+
     @property
     def is_alive(self):
         """
@@ -357,10 +396,12 @@ class Snake(object):
             self.segments.remove(self.tail)
             # remove the Segment from the list of segments that the snake is using
 
-    def move(self, direction):
+    def move(self, direction, self_check=True):
         """
         Move the snake, interact with objects, 
         grow the head, and shrink the tail (if necessary).
+        When self_check is False, the caller is responsible for 
+        determining whether the head ran into the rest of the body.
         """
         # debug(f"Moving segments {self.segments}")
         if len(self.segments) <= 0:
@@ -421,7 +462,7 @@ class Snake(object):
             # debug(self.segments)
             # create a new segment to be the new head
             self._decrement_whole()
-        if self.is_alive and self.self_intersects:
+        if self_check and self.is_alive and self.self_intersects:
             # determine if the snake currently is self intersecting
             debug("snake self_intersects")
             self.die()
@@ -7,7 +7,10 @@ del contextlib
 from .fruit import Fruit 
 from .segment import Segment 
 from .snake import Snake
+from .cell_snake import CellSnake
 from .obstacle import Obstacle
+from .grid import OccupancyGrid
+from .rects import render_all
 
 class TestFruitObject(unittest.TestCase):
     """
@@ -62,6 +65,41 @@ class TestSegmentObject(unittest.TestCase):
         seg_drawn = seg.render()
         self.assertIsInstance( seg_drawn, Rect)
 
+    # @unittest.skip("skipping test_geometry")
+    def test_geometry(self):
+        """
+        Test the cached size and length follow the Segment as it changes.
+        """
+        seg = Segment([0, 50, 5, 25], 2)
+        # pointed SOUTH
+        self.assertFalse(hasattr(seg, "__dict__"))
+        self.assertEqual((seg.size, seg.length), (5, 25))
+        seg.increment()
+        self.assertEqual(seg.dimensions, [0, 50, 5, 30])
+        self.assertEqual(seg.length, 30)
+        seg.decrement()
+        seg.decrement()
+        self.assertEqual(seg.dimensions, [0, 60, 5, 20])
+        self.assertEqual(seg.length, 20)
+        seg.dimensions = [0, 0, 15, 5]
+        seg.heading = 1
+        # pointed EAST
+        self.assertEqual((seg.size, seg.length), (5, 15))
+
+    # @unittest.skip("skipping test_render_all")
+    def test_render_all(self):
+        """
+        Test rendering reuses the Rects it is given.
+        """
+        rects = render_all([Segment([0, 0, 5, 25], 0), Obstacle(0, 0, 50, 5), Fruit("apple", [5, 5, 5], 1)])
+        self.assertEqual([tuple(rect) for rect in rects], [(0, 0, 5, 25), (0, 0, 50, 5), (5, 5, 5, 5)])
+        first = rects[0]
+        result = render_all([Segment([10, 10, 5, 5], 1)], rects)
+        self.assertIs(result, rects)
+        self.assertIs(rects[0], first)
+        self.assertEqual(len(rects), 1)
+        self.assertEqual(tuple(first), (10, 10, 5, 5))
+
 class TestObstacleObject(unittest.TestCase):
     """
     Test that the Obstacle object behaves as expected.
@@ -297,5 +335,171 @@ class TestSnakeMethods(unittest.TestCase):
         self.assertFalse(self.snake.is_alive)
         self.assertEqual(len(self.snake.segments), 0)
 
+class TestCellSnakeMethods(TestSnakeMethods):
+    """
+    Test that the CellSnake object behaves like a Snake.
+    """
+
+    def setUp(self):
+        position = [42, 14]
+        size = 7
+        length = 28
+        dimensions = [ position[0], position[1], size, length ]
+        heading = 0
+        # pointed North
+        self.snake = CellSnake(dimensions, heading)
+
+    # @unittest.skip("skipping test_cells")
+    def test_cells(self):
+        """
+        Test the cells run from the head to the tail, and the segments follow them.
+        """
+        self.assertEqual(list(self.snake.cells), [(42, 14), (42, 21), (42, 28), (42, 35)])
+        self.snake.move(1)
+        self.snake.move(1)
+        # turn east, and keep going
+        self.assertEqual(list(self.snake.cells), [(56, 14), (49, 14), (42, 14), (42, 21)])
+        snake = Snake([42, 14, 7, 28], 0)
+        snake.move(1)
+        snake.move(1)
+        self.assertEqual([seg.dimensions for seg in self.snake.segments], [seg.dimensions for seg in snake.segments])
+        self.assertEqual([seg.heading for seg in self.snake.segments], [1, 0])
+        # the same segments a Snake would have
+        self.assertEqual(self.snake.head_origin, [56, 14])
+        self.assertEqual(self.snake.tail_origin, [42, 21])
+        self.assertTrue(self.snake.occupies(49, 14))
+        self.assertFalse(self.snake.occupies(42, 28))
+
+    # @unittest.skip("skipping test_move_into_self")
+    def test_move_into_self(self):
+        """
+        Test the head dies running into the body, but may follow the tail.
+        """
+        self.snake.move(1)
+        self.snake.move(2)
+        self.snake.move(3)
+        # loop back around onto the cell the tail just left
+        self.assertTrue(self.snake.is_alive)
+        self.snake.belly = 1
+        self.snake.move(0)
+        # the tail stays put while the belly is full
+        self.assertFalse(self.snake.is_alive)
+
+    # @unittest.skip("skipping test_snapshot")
+    def test_snapshot(self):
+        """
+        Test a restored CellSnake continues from where the snapshot was taken.
+        """
+        self.snake.move(1)
+        self.snake.belly = 2
+        snapshot = self.snake.snapshot()
+        self.snake.move(2)
+        restored = CellSnake.restore(snapshot)
+        self.assertEqual(restored.belly, 2)
+        self.assertEqual(restored.heading, 1)
+        restored.move(2)
+        self.assertEqual(restored.cells, self.snake.cells)
+
+class TestOccupancyGrid(unittest.TestCase):
+    """
+    Test that the OccupancyGrid object tracks what is in each virtual pixel.
+    """
+    def setUp(self):
+        self.size = 10
+        self.grid = OccupancyGrid(100, 100, self.size)
+        self.grid.place_obstacle(Obstacle(0, -self.size, 100, self.size))
+        # north wall
+        self.snake = Snake([ 50, 20, self.size, 30 ], 0)
+        # pointed North
+        self.grid.place_snake(self.snake)
+
+    # @unittest.skip("skipping test_place")
+    def test_place(self):
+        """
+        Test walls, snakes, and fruit are found with a single lookup.
+        """
+        self.assertEqual(self.grid.get(50, -10), OccupancyGrid.WALL)
+        self.assertEqual(self.grid.get(50, 20), OccupancyGrid.BODY)
+        self.assertEqual(self.grid.get(50, 40), OccupancyGrid.BODY)
+        self.assertEqual(self.grid.get(50, 50), OccupancyGrid.EMPTY)
+        self.assertEqual(self.grid.get(500, 500), OccupancyGrid.WALL)
+        # everything beyond the border is a wall
+        apple = Fruit("apple", [ 20, 20, self.size ], 1)
+        self.grid.place_fruit(apple)
+        self.assertEqual(self.grid.get(20, 20), OccupancyGrid.FRUIT)
+        self.assertIs(self.grid.fruit_at(20, 20), apple)
+        self.grid.remove_fruit(apple)
+        self.assertTrue(self.grid.is_free(20, 20))
+        self.assertIsNone(self.grid.fruit_at(20, 20))
+
+    # @unittest.skip("skipping test_move")
+    def test_move(self):
+        """
+        Test the grid follows the snake as the head advances and the tail retracts.
+        """
+        self.assertEqual(self.snake.head_origin, [50, 20])
+        self.assertEqual(self.snake.tail_origin, [50, 40])
+        tail = self.snake.tail_origin
+        self.snake.move(1, self_check=False)
+        # turn east
+        self.grid.release(*tail)
+        self.grid.occupy(*self.snake.head_origin)
+        self.assertEqual(self.snake.head_origin, [60, 20])
+        self.assertEqual(self.grid.get(60, 20), OccupancyGrid.BODY)
+        self.assertTrue(self.grid.is_free(50, 40))
+        self.assertEqual(self.snake.tail_origin, [50, 30])
+        self.grid.release(0, -10)
+        # releasing a wall does nothing
+        self.assertEqual(self.grid.get(0, -10), OccupancyGrid.WALL)
+
+    # @unittest.skip("skipping test_random_free")
+    def test_random_free(self):
+        """
+        Test a free point is found with one draw, even on a nearly full board.
+        """
+        import random
+        rand = random.Random(1)
+        self.assertEqual(self.grid.free_count, 100-3)
+        for x in range(100):
+            point = self.grid.random_free(rand)
+            self.assertTrue(self.grid.is_free(*point))
+        for cy in range(0, 100, self.size):
+            for cx in range(0, 100, self.size):
+                if [cx, cy] != [90, 90]:
+                    self.grid.occupy(cx, cy)
+        # fill every virtual pixel but one
+        self.assertEqual(self.grid.free_count, 1)
+        self.assertEqual(self.grid.random_free(rand), [90, 90])
+        self.grid.occupy(90, 90)
+        self.assertIsNone(self.grid.random_free(rand))
+        self.grid.release(50, 50)
+        self.assertEqual(self.grid.random_free(rand), [50, 50])
+
+    # @unittest.skip("skipping test_snapshot")
+    def test_snapshot(self):
+        """
+        Test a restored grid picks the same free points as when it was snapshot.
+        """
+        import random
+        apple = Fruit("apple", [ 20, 20, self.size ], 1)
+        self.grid.place_fruit(apple)
+        snapshot = self.grid.snapshot()
+        picks = [self.grid.random_free(random.Random(1)) for x in range(3)]
+        self.grid.remove_fruit(apple)
+        self.grid.occupy(70, 70)
+        self.grid.release(50, 20)
+        self.grid.restore(snapshot, [apple])
+        self.assertIs(self.grid.fruit_at(20, 20), apple)
+        self.assertEqual(self.grid.get(70, 70), OccupancyGrid.EMPTY)
+        self.assertEqual(self.grid.get(50, 20), OccupancyGrid.BODY)
+        self.assertEqual([self.grid.random_free(random.Random(1)) for x in range(3)], picks)
+        free = self.grid.free_count
+        self.grid.occupy(70, 70)
+        self.grid.release(50, 20)
+        self.assertEqual(self.grid.free_count, free)
+        self.assertEqual(self.grid.snapshot()[1].count(self.grid._index(70, 70)), 0)
+        # the rebuilt index is kept up to date as cells are taken and freed
+        self.assertRaises(ValueError, OccupancyGrid(50, 50, self.size).restore, snapshot)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file